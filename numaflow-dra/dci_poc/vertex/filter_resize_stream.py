@@ -10,11 +10,13 @@ from pynumaflow import setup_logging
 from pynumaflow.mapstreamer import Datum, MapStreamAsyncServer, MapStreamer, Message
 from turbojpeg import TJPF_RGB, TurboJPEG
 
+from lib.envelope import read_payload, write_payload
+from lib.latency import stamp
 from lib.log import (
     add_new_filehandler,
     set_logger_log_level,
 )
-from lib.vertex_key_io import VertexKeyIO
+from lib.vertex_key_io import FRAME_SCHEMA
 
 
 class FilterResize(MapStreamer):
@@ -25,6 +27,7 @@ class FilterResize(MapStreamer):
         self.fr_output_width = int(os.getenv('FR_OUTPUT_WIDTH', '416'))
         self.fr_output_height = int(os.getenv('FR_OUTPUT_HEIGHT', '416'))
         self.jpeg_quality = int(os.getenv('JPEG_QUALITY', '90'))
+        self.latency_stamps = os.getenv('LATENCY_STAMPS', 'false').lower() == 'true'
 
         # setup PyTurboJPEG
         self.jpeg = TurboJPEG()
@@ -39,13 +42,13 @@ class FilterResize(MapStreamer):
 
     def _decompress_frame_np(
         self,
-        data: bytes,
-        original_height: int,
-        original_width: int,
+        data: bytes | memoryview,
+        height: int,
+        width: int,
     ) -> np.ndarray:
         # switch scaling factor based on frame size in order to accelerate decode
-        ratio_height = float(self.fr_output_height) / original_height
-        ratio_width = float(self.fr_output_width) / original_width
+        ratio_height = float(self.fr_output_height) / height
+        ratio_width = float(self.fr_output_width) / width
         # do not scale down to smaller than output target
         ratio = max(ratio_height, ratio_width)
         # there are other scaling factors supported (such as 1/8, 3/8, or 3/4)
@@ -66,15 +69,30 @@ class FilterResize(MapStreamer):
         return buf.tobytes()
 
     async def handler(self, _: list[str], datum: Datum) -> AsyncIterable[Message]:
-        compressed_frame = datum.value
-        vk_io = VertexKeyIO(datum.keys)
+        vk_io, compressed_frame, payload_format = read_payload(
+            datum.keys, datum.value, schema=FRAME_SCHEMA
+        )
+        if self.latency_stamps:
+            stamp(vk_io, 'filter_resize_in')
         frame_idx = vk_io['frame_idx']
-        original_height = vk_io['org_height']
-        original_width = vk_io['org_width']
 
         self.logger.info(f'frame_index: {frame_idx}')
-        frame = self._decompress_frame_np(compressed_frame, original_height, original_width)
-        resized_frame = cv2.resize(frame, (self.fr_output_width, self.fr_output_height))
+        # the Source may have resized the frame already (SOURCE_RESIZE_MODE),
+        # so the size of the JPEG is used rather than org_height/org_width
+        width, height, _, _ = self.jpeg.decode_header(compressed_frame)
+        if (width, height) == (self.fr_output_width, self.fr_output_height):
+            if self.latency_stamps:
+                stamp(vk_io, 'filter_resize_out')
+            keys, value = write_payload(vk_io, compressed_frame, payload_format)
+            yield Message(value=value, keys=keys)
+            return
+
+        frame = self._decompress_frame_np(compressed_frame, height, width)
+        # INTER_AREA, as the Source uses with SOURCE_RESIZE_MODE, so a frame is scaled the
+        # same wherever it is resized
+        resized_frame = cv2.resize(
+            frame, (self.fr_output_width, self.fr_output_height), interpolation=cv2.INTER_AREA
+        )
         _ = datum.event_time
         _ = datum.watermark
 
@@ -84,9 +102,13 @@ class FilterResize(MapStreamer):
 
         self.logger.debug(f'resized_frame: {resized_frame}')
 
+        output_frame = self._compress_frame_np(resized_frame)
+        if self.latency_stamps:
+            stamp(vk_io, 'filter_resize_out')
+        keys, value = write_payload(vk_io, output_frame, payload_format)
         yield Message(
-            value=self._compress_frame_np(resized_frame),
-            keys=vk_io.keys_list,
+            value=value,
+            keys=keys,
         )
 
 
@@ -2,8 +2,8 @@ import json
 import logging
 import os
 import sys
+import time
 from collections.abc import AsyncIterable, Callable
-from dataclasses import dataclass
 from pathlib import Path
 
 import cv2
@@ -13,23 +13,21 @@ from dotenv import load_dotenv
 from pynumaflow import setup_logging
 from pynumaflow.sinker import Datum, Response, Responses, SinkAsyncServer, Sinker
 
+from lib.envelope import read_payload
+from lib.latency import LatencyRecorder, serve_metrics, stamp
 from lib.log import (
     add_new_filehandler,
     set_logger_log_level,
 )
 from lib.vertex_key_io import (
+    BOX_COLUMNS,
+    BOXES_KEY,
+    DETECTIONS_SCHEMA,
     VertexKeyIO,
 )
 
-
-@dataclass
-class BBox:
-    confidence: np.float32
-    class_id: np.int64 | str
-    LeftUpX: np.float32
-    LeftUpY: np.float32
-    RightDownX: np.float32
-    RightDownY: np.float32
+# seconds between logs of the latency percentiles
+LATENCY_LOG_INTERVAL = 10.0
 
 
 class FrameForVideoReceiver:
@@ -38,7 +36,20 @@ class FrameForVideoReceiver:
         self._frame_idx = vk_io['frame_idx']
         self._input: np.ndarray = input_frame
         self._output: np.ndarray | None = None
-        self._bboxes: list[BBox] = []
+        # One row per bbox
+        # _confidences: (N,), _class_ids: N class indices
+        # _coords: (N, 4) of LeftUpX, LeftUpY, RightDownX, RightDownY
+        self._confidences: np.ndarray = np.empty(0, dtype=np.float64)
+        self._class_ids: list[int] = []
+        self._coords: np.ndarray = np.empty((0, 4), dtype=np.float64)
+        # where the received image is in the captured frame: the SOURCE_ROI crop
+        # (x, y, width, height), else the whole frame, and the letterbox padding
+        self._cropped = 'crop_x' in vk_io
+        if self._cropped:
+            self._crop = tuple(vk_io[k] for k in ('crop_x', 'crop_y', 'crop_width', 'crop_height'))
+        else:
+            self._crop = (0, 0, vk_io.get('org_width'), vk_io.get('org_height'))
+        self._pad = (vk_io['pad_top'], vk_io['pad_left']) if 'pad_top' in vk_io else None
 
         self.set_bboxes(vk_io)
 
@@ -47,32 +58,109 @@ class FrameForVideoReceiver:
         return self._output
 
     def set_bboxes(self, vk_io: VertexKeyIO) -> None:
-        self._bboxes = [
-            BBox(
-                confidence=vk_io[f'box_{i}_confidence'],
-                class_id=vk_io[f'box_{i}_class_id'],
-                LeftUpX=vk_io[f'box_{i}_LeftUpX'],
-                LeftUpY=vk_io[f'box_{i}_LeftUpY'],
-                RightDownX=vk_io[f'box_{i}_RightDownX'],
-                RightDownY=vk_io[f'box_{i}_RightDownY'],
-            )
-            for i in range(vk_io['box_len'])
-        ]
+        """
+        Read bboxes from the packed BOXES_KEY table if present, else from box_{i}_* keys.
+        """
+        if BOXES_KEY in vk_io:
+            self.set_bbox_table(vk_io[BOXES_KEY])
+            return
+
+        box_len = vk_io['box_len']
+        self._confidences = np.array(
+            [vk_io[f'box_{i}_confidence'] for i in range(box_len)], dtype=np.float64
+        )
+        self._class_ids = [vk_io[f'box_{i}_class_id'] for i in range(box_len)]
+        self._coords = np.array(
+            [
+                (
+                    vk_io[f'box_{i}_LeftUpX'],
+                    vk_io[f'box_{i}_LeftUpY'],
+                    vk_io[f'box_{i}_RightDownX'],
+                    vk_io[f'box_{i}_RightDownY'],
+                )
+                for i in range(box_len)
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 4)
+
+    def set_bbox_table(self, table: np.ndarray) -> None:
+        """
+        table is (N, 6) with columns in BOX_COLUMNS order
+        """
+        if table.ndim != 2 or table.shape[1] != len(BOX_COLUMNS):
+            msg = f'bbox table must be (N, {len(BOX_COLUMNS)}), got {table.shape}'
+            raise ValueError(msg)
+        table = table.astype(np.float64, copy=False)
+        self._confidences = table[:, 0]
+        self._class_ids = table[:, 1].astype(np.int64).tolist()
+        self._coords = table[:, 2:6]
 
     def log_input(self) -> None:
         self.logger.debug(f'input_frame: {self._input}')
 
+    def _pixel_coords(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Box coordinates in pixels of the received image, not clipped, and whether each
+        box was normalized.
+        """
+        h, w = self._input.shape[:2]
+        # Allow tiny epsilon because normalized outputs can slightly under/overflow [0,1].
+        coords = self._coords
+        eps = 1e-3
+        is_normalized = np.all((coords >= -eps) & (coords <= 1.0 + eps), axis=1)
+
+        # Normalized: clip into [0,1] then scale to pixels. Otherwise: pixel coordinates
+        scale = np.array([w, h, w, h], dtype=np.float64)
+        pixels = np.where(
+            is_normalized[:, np.newaxis],
+            np.round(np.clip(coords, 0.0, 1.0) * scale),
+            np.round(coords),
+        )
+        return pixels, is_normalized
+
+    def full_frame_coords(self) -> np.ndarray | None:
+        """
+        Box coordinates (N, 4) in pixels of the captured frame, undoing the resize (and
+        letterbox padding) of the received image and the SOURCE_ROI crop.
+        None when the size of the captured frame is unknown.
+        """
+        crop_x, crop_y, crop_width, crop_height = self._crop
+        if crop_width is None or crop_height is None:
+            return None
+        h, w = self._input.shape[:2]
+        pixels, _ = self._pixel_coords()
+        if self._pad is None:
+            scale_x, scale_y = crop_width / w, crop_height / h
+            pad_top = pad_left = 0
+        else:
+            # the crop was scaled by the same factor on both axes, see letterbox_layout()
+            scale_x = scale_y = 1.0 / min(h / crop_height, w / crop_width)
+            pad_top, pad_left = self._pad
+        offset = np.array([pad_left, pad_top, pad_left, pad_top], dtype=np.float64)
+        scale = np.array([scale_x, scale_y, scale_x, scale_y])
+        origin = np.array([crop_x, crop_y, crop_x, crop_y], dtype=np.float64)
+        return (pixels - offset) * scale + origin
+
     def log_bbox(self) -> None:
-        for i, bbox in enumerate(self._bboxes):
+        full_coords = self.full_frame_coords() if self._cropped else None
+        for i, (confidence, class_id, coords) in enumerate(
+            zip(self._confidences, self._class_ids, self._coords, strict=True)
+        ):
             self.logger.info(
                 f'frame_index: {self._frame_idx}, bbox num: {i}-line1, '
-                f'confidence: {bbox.confidence}, class_id: {bbox.class_id}'
+                f'confidence: {confidence}, class_id: {class_id}'
             )
             self.logger.info(
                 f'frame_index: {self._frame_idx}, bbox num: {i}-line2, '
-                f'LeftUp: ({bbox.LeftUpX}, {bbox.LeftUpY}), '
-                f'RightDown: ({bbox.RightDownX}, {bbox.RightDownY})'
+                f'LeftUp: ({coords[0]}, {coords[1]}), '
+                f'RightDown: ({coords[2]}, {coords[3]})'
             )
+            if full_coords is not None:
+                x1, y1, x2, y2 = full_coords[i].round().astype(int).tolist()
+                self.logger.info(
+                    f'frame_index: {self._frame_idx}, bbox num: {i}-line3, '
+                    f'full frame LeftUp: ({x1}, {y1}), RightDown: ({x2}, {y2})'
+                )
 
     def bboxes_fusion(self):
         if self._input.ndim == 3 and self._input.shape[2] == 3:
@@ -87,46 +175,26 @@ class FrameForVideoReceiver:
         # draw box
         h, w = self._input.shape[:2]
         thickness = max(1, int(min(h, w) / 200))
-        for _, bbox in enumerate(self._bboxes):
-            # Allow tiny epsilon because normalized outputs can slightly under/overflow [0,1].
-            vals = [bbox.LeftUpX, bbox.LeftUpY, bbox.RightDownX, bbox.RightDownY]
-            eps = 1e-3
-            is_normalized = all(-eps <= float(v) <= 1.0 + eps for v in vals)
-
-            if is_normalized:
-                # Clip normalized values into [0,1] then scale to pixels
-                lu_x = round(float(np.clip(bbox.LeftUpX, 0.0, 1.0)) * w)
-                lu_y = round(float(np.clip(bbox.LeftUpY, 0.0, 1.0)) * h)
-                rd_x = round(float(np.clip(bbox.RightDownX, 0.0, 1.0)) * w)
-                rd_y = round(float(np.clip(bbox.RightDownY, 0.0, 1.0)) * h)
-            else:
-                # Treat as pixel coordinates
-                lu_x = round(float(bbox.LeftUpX))
-                lu_y = round(float(bbox.LeftUpY))
-                rd_x = round(float(bbox.RightDownX))
-                rd_y = round(float(bbox.RightDownY))
-
-            # Final clipping to image bounds
-            lu_x = max(0, min(w - 1, int(lu_x)))
-            lu_y = max(0, min(h - 1, int(lu_y)))
-            rd_x = max(0, min(w - 1, int(rd_x)))
-            rd_y = max(0, min(h - 1, int(rd_y)))
-
-            # Sanity check: skip invalid or degenerate boxes
-            if rd_x <= lu_x or rd_y <= lu_y:
-                self.logger.warning(
-                    'Skipping invalid bbox (frame_index=%s): '
-                    '[(%s,%s) -> (%s,%s)] from vals=%r is_normalized=%s',
-                    self._frame_idx,
-                    lu_x,
-                    lu_y,
-                    rd_x,
-                    rd_y,
-                    vals,
-                    is_normalized,
-                )
-                continue
+        coords = self._coords
+        pixels, is_normalized = self._pixel_coords()
+        scale = np.array([w, h, w, h], dtype=np.float64)
+
+        # Final clipping to image bounds
+        pixels = np.clip(pixels, 0, scale - 1).astype(np.int64)
+
+        # Sanity check: skip invalid or degenerate boxes
+        valid = (pixels[:, 2] > pixels[:, 0]) & (pixels[:, 3] > pixels[:, 1])
+        for i in np.flatnonzero(~valid):
+            self.logger.warning(
+                'Skipping invalid bbox (frame_index=%s): '
+                '[(%s,%s) -> (%s,%s)] from vals=%r is_normalized=%s',
+                self._frame_idx,
+                *pixels[i],
+                coords[i].tolist(),
+                bool(is_normalized[i]),
+            )
 
+        for lu_x, lu_y, rd_x, rd_y in pixels[valid].tolist():
             cv2.rectangle(
                 self._output,
                 (lu_x, lu_y),
@@ -158,6 +226,32 @@ class AsyncSink(Sinker):
             self.logger.error('environment variable RECEIVER_URL not set')
             sys.exit(1)
 
+        # latency histograms of the frames, see lib/latency.py
+        self.latency_stamps = os.getenv('LATENCY_STAMPS', 'false').lower() == 'true'
+        self.latency = LatencyRecorder(int(os.getenv('SINK_LATENCY_WINDOW', '1000')))
+        self.latency_logged_at = time.monotonic()
+        self.metrics_server = self._serve_metrics()
+
+    def _serve_metrics(self):
+        port = int(os.getenv('SINK_METRICS_PORT', '0'))
+        if port <= 0:
+            return None
+        host = os.getenv('SINK_METRICS_HOST', '0.0.0.0')  # noqa: S104
+        # metrics are not worth stopping the Sink for, e.g. a second Sink in one process
+        try:
+            server = serve_metrics(self.latency, host, port)
+        except OSError as e:
+            self.logger.warning(f'latency metrics are not served on {host}:{port}: {e}')
+            return None
+        self.logger.info(f'latency metrics at http://{host}:{port}/metrics')
+        return server
+
+    def _log_latency(self) -> None:
+        now = time.monotonic()
+        if now - self.latency_logged_at >= LATENCY_LOG_INTERVAL:
+            self.latency_logged_at = now
+            self.logger.info(f'latency (ms): {self.latency.summary()}')
+
     def send_frame_to_video_receiver(self, frame_bgr: np.ndarray, frame_idx: int) -> None:
         frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
 
@@ -184,8 +278,12 @@ class AsyncSink(Sinker):
     async def handler(self, datums: AsyncIterable[Datum]) -> Responses:
         responses = Responses()
         async for msg in datums:
-            resized_frame = cv2.imdecode(np.frombuffer(msg.value, np.uint8), cv2.IMREAD_UNCHANGED)
-            vk_io = VertexKeyIO(msg.keys)
+            vk_io, image, _ = read_payload(
+                msg.keys, msg.value, lazy=False, schema=DETECTIONS_SCHEMA
+            )
+            if self.latency_stamps:
+                stamp(vk_io, 'sink_in')
+            resized_frame = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_UNCHANGED)
 
             self.logger.info(f'{vk_io.items()}')
 
@@ -207,7 +305,12 @@ class AsyncSink(Sinker):
                 self.logger.error('Request failed: %s', resp.status_code)
                 sys.exit(1)
 
+            if self.latency_stamps:
+                stamp(vk_io, 'sink_out')
+                self.latency.observe(vk_io)
+
             responses.append(Response.as_success(msg.id))
+        self._log_latency()
         # if we are not able to write to sink and if we have a fallback sink configured
         # we can use Response.as_fallback(msg.id)) to write the message to fallback sink
         return responses
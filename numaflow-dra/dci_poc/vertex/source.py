@@ -1,11 +1,17 @@
+import abc
+import asyncio
 import logging
 import os
+import random
 import sys
 import time
 import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from fractions import Fraction
+from itertools import pairwise
 from pathlib import Path
-from queue import Empty, Full, Queue
 from threading import Event, Thread
 
 import cv2
@@ -26,31 +32,453 @@ from pynumaflow.sourcer import (
     get_default_partitions,
 )
 
+try:
+    import av
+except ImportError:  # optional, only SOURCE_DECODER=pyav needs it
+    av = None
+
+from lib.envelope import PAYLOAD_FORMATS, PAYLOAD_KEYS, write_payload
+from lib.frame_queue import POLICIES, POLICY_LATEST, FrameQueue, FrameQueueStats
+from lib.latency import CAPTURE, EMIT, ENQUEUE, stamp
 from lib.log import (
     add_new_filehandler,
     set_logger_log_level,
 )
 from lib.vertex_key_io import (
+    CODECS,
+    FRAME_SCHEMA,
     VertexKeyIO,
 )
 
+# seconds between logs of the frame counters
+STATS_LOG_INTERVAL = 10.0
+# frames encoded ahead per encode worker
+ENCODE_AHEAD = 2
+# a higher stream fps is a clock rather than a frame rate (e.g. 90000 of RTP)
+MAX_STREAM_FPS = 240.0
+
+# SOURCE_RESIZE_MODE: size of the frames the source encodes
+# none     : the captured size
+# resize   : FR_OUTPUT_WIDTH x FR_OUTPUT_HEIGHT, stretched like FilterResize does
+# letterbox: FR_OUTPUT_WIDTH x FR_OUTPUT_HEIGHT, scaled keeping the aspect ratio and padded.
+#            pad_top/pad_left keys tell where the scaled frame is
+RESIZE_NONE = 'none'
+RESIZE_STRETCH = 'resize'
+RESIZE_LETTERBOX = 'letterbox'
+RESIZE_MODES = (RESIZE_NONE, RESIZE_STRETCH, RESIZE_LETTERBOX)
+LETTERBOX_COLOR = (114, 114, 114)  # padding color of YOLO
+
+# SOURCE_FILE_PACING: rate of frames read from a file
+# native     : CAP_PROP_FPS of the file
+# fixed:N    : N frames per second
+# unthrottled: as fast as the pipeline takes them
+PACING_NATIVE = 'native'
+PACING_FIXED = 'fixed'
+PACING_UNTHROTTLED = 'unthrottled'
+# Set the value to 15 fps or higher, ensuring it is visually perceivable
+# When the value is 20, the actual FPS on the video receiving server is around 10
+DEFAULT_FILE_PACING = f'{PACING_FIXED}:20'
+DEFAULT_FILE_FPS = 20.0  # native pacing of a file without CAP_PROP_FPS
+
+# SOURCE_ROI: regions of the frame encoded and sent instead of the whole frame
+Roi = tuple[int, int, int, int]  # x, y, width, height in pixels of the captured frame
+# (index in SOURCE_ROI, region clipped to the frame, JPEG), the region is None for the
+# whole frame
+Crop = tuple[int, Roi | None, bytes]
+
+# SOURCE_DECODER: library that reads and decodes the video
+# opencv: cv2.VideoCapture
+# pyav  : PyAV (FFmpeg libraries) with SOURCE_DECODE_THREADS and SOURCE_SKIP_FRAME
+DECODER_OPENCV = 'opencv'
+DECODER_PYAV = 'pyav'
+DECODERS = (DECODER_OPENCV, DECODER_PYAV)
+# SOURCE_SKIP_FRAME: frames the pyav decoder drops without decoding them
+# default: none, nonref: non-reference frames, bidir: B-frames, nokey: all but keyframes
+SKIP_FRAME_MODES = {'default': 'DEFAULT', 'nonref': 'NONREF', 'bidir': 'BIDIR', 'nokey': 'NONKEY'}
+
+
+def parse_pacing(spec: str) -> float | None:
+    """
+    Frames per second of a SOURCE_FILE_PACING value. 0 is unthrottled, None is native.
+    Raise ValueError on a bad value.
+    """
+    if spec == PACING_NATIVE:
+        return None
+    if spec == PACING_UNTHROTTLED:
+        return 0.0
+    mode, _, fps = spec.partition(':')
+    if mode == PACING_FIXED and fps:
+        value = float(fps)
+        if value > 0:
+            return value
+    msg = f'pacing must be {PACING_NATIVE}, {PACING_FIXED}:N or {PACING_UNTHROTTLED}, got {spec!r}'
+    raise ValueError(msg)
+
+
+def file_segments(video_src: str, shards: int) -> list[tuple[int, int]]:
+    """
+    Split the frames of a file into shards ranges [start, end) of nearly equal length.
+    Raise ValueError when the frame count of the file is unknown.
+    """
+    cap = cv2.VideoCapture(video_src)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    finally:
+        cap.release()
+    if frame_count <= 0:
+        msg = f'frame count of {video_src} is unknown'
+        raise ValueError(msg)
+    bounds = [frame_count * i // shards for i in range(shards + 1)]
+    return [(start, end) for start, end in pairwise(bounds) if end > start]
+
+
+def parse_rois(spec: str, stream_count: int) -> list[list[Roi]]:
+    """
+    Regions of each stream of a SOURCE_ROI value. Entries of the streams are separated
+    by ';', a single entry applies to every stream. An entry is a space separated list
+    of 'x,y,width,height' regions, empty for the whole frame.
+    Raise ValueError on a bad value.
+    """
+    entries = spec.split(';')
+    if len(entries) == 1:
+        entries *= stream_count
+    if len(entries) != stream_count:
+        msg = f'{len(entries)} entries for {stream_count} video sources'
+        raise ValueError(msg)
+    rois = []
+    for entry in entries:
+        regions = []
+        for region in entry.split():
+            try:
+                x, y, width, height = (int(v) for v in region.split(','))
+            except ValueError as e:
+                msg = f'region must be x,y,width,height, got {region!r}'
+                raise ValueError(msg) from e
+            if x < 0 or y < 0 or width <= 0 or height <= 0:
+                msg = f'region must be inside the frame and not empty, got {region!r}'
+                raise ValueError(msg)
+            regions.append((x, y, width, height))
+        rois.append(regions)
+    return rois
+
+
+def clip_roi(roi: Roi, height: int, width: int) -> Roi | None:
+    """The part of roi inside a frame of height x width, None when there is none"""
+    x, y, roi_width, roi_height = roi
+    right, bottom = min(x + roi_width, width), min(y + roi_height, height)
+    if right <= x or bottom <= y:
+        return None
+    return x, y, right - x, bottom - y
+
+
+def letterbox_layout(height: int, width: int, out_height: int, out_width: int) -> tuple[int, ...]:
+    """(scaled height, scaled width, pad top, pad left) of a letterboxed frame"""
+    scale = min(out_height / height, out_width / width)
+    scaled_height, scaled_width = round(height * scale), round(width * scale)
+    return (
+        scaled_height,
+        scaled_width,
+        (out_height - scaled_height) // 2,
+        (out_width - scaled_width) // 2,
+    )
+
+
+def letterbox(frame: np.ndarray, out_height: int, out_width: int) -> np.ndarray:
+    scaled_height, scaled_width, top, left = letterbox_layout(
+        frame.shape[0], frame.shape[1], out_height, out_width
+    )
+    scaled = cv2.resize(frame, (scaled_width, scaled_height), interpolation=cv2.INTER_AREA)
+    return cv2.copyMakeBorder(
+        scaled,
+        top,
+        out_height - scaled_height - top,
+        left,
+        out_width - scaled_width - left,
+        cv2.BORDER_CONSTANT,
+        value=LETTERBOX_COLOR,
+    )
+
+
+class VideoDecoder(abc.ABC):
+    """
+    Reads and decodes the frames of a file or stream into BGR arrays, the input of the
+    JPEG encoder. A decoder is used by one capture thread. frame_count() and fps() are 0
+    when unknown.
+    """
+
+    # read() decodes into the image it is given, so the capture thread pools frames
+    reuses_image = True
+
+    def __init__(self, video_src: str, *, is_stream: bool = False, timeout_ms: int = 5000):
+        self.video_src = video_src
+        self.is_stream = is_stream
+        # bound the time a dead camera can hold the capture thread
+        self.timeout_ms = timeout_ms
+
+    @abc.abstractmethod
+    def open(self) -> bool: ...
+
+    @abc.abstractmethod
+    def is_opened(self) -> bool: ...
+
+    @abc.abstractmethod
+    def read(self, image: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        """The next frame, decoded into image when the decoder can reuse it"""
+
+    @abc.abstractmethod
+    def seek(self, frame: int) -> None:
+        """Make the frame at index frame the next one read (files only)"""
+
+    @abc.abstractmethod
+    def frame_count(self) -> int: ...
+
+    @abc.abstractmethod
+    def fps(self) -> float: ...
+
+    @abc.abstractmethod
+    def release(self) -> None: ...
+
+
+class OpenCVDecoder(VideoDecoder):
+    """cv2.VideoCapture, decoding on a single thread"""
+
+    cap: cv2.VideoCapture | None = None
+
+    def open(self) -> bool:
+        self.release()
+        if self.is_stream:
+            self.cap = cv2.VideoCapture(
+                self.video_src,
+                cv2.CAP_FFMPEG,
+                [
+                    cv2.CAP_PROP_OPEN_TIMEOUT_MSEC,
+                    self.timeout_ms,
+                    cv2.CAP_PROP_READ_TIMEOUT_MSEC,
+                    self.timeout_ms,
+                ],
+            )
+        else:
+            self.cap = cv2.VideoCapture(self.video_src)
+        return self.cap.isOpened()
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self, image: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        ret, frame = self.cap.read(image=image)
+        return ret and frame is not None, frame
+
+    def seek(self, frame: int) -> None:
+        # FFmpeg seeks to the keyframe before frame and decodes up to it
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+
+    def frame_count(self) -> int:
+        return max(0, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+
+    def fps(self) -> float:
+        return max(0.0, self.cap.get(cv2.CAP_PROP_FPS))
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def frame_pts(
+    frame: int, rate: Fraction | None, time_base: Fraction | None, start_time: int | None
+) -> int | None:
+    """pts of the frame at index frame, None when the stream has no rate or time base"""
+    if not rate or not time_base:
+        return None
+    return (start_time or 0) + round(frame / rate / time_base)
+
+
+class PyAVDecoder(VideoDecoder):
+    """
+    PyAV, decoding on `threads` threads (0 lets FFmpeg pick by CPU count), skipping the
+    frames of skip_frame (a SKIP_FRAME_MODES value) before decode. Frames are converted
+    by FFmpeg straight to BGR, so there is no separate conversion step.
+    With skip_frame, frame indices count only the decoded frames.
+    """
+
+    reuses_image = False
+
+    def __init__(self, video_src: str, *, threads: int = 0, skip_frame: str = 'DEFAULT', **kw):
+        super().__init__(video_src, **kw)
+        self.threads = threads
+        self.skip_frame = skip_frame
+        self.container = None
+        self.stream = None
+        self.frames = None  # iterator of decoded frames, None after a decode error
+        self.skip_until_pts = None  # frames before it are decoded and dropped after seek()
+        self.skip_count = 0  # frames decoded and dropped after seek() without a frame rate
+
+    def open(self) -> bool:
+        self.release()
+        timeout = self.timeout_ms / 1000 if self.is_stream else None
+        try:
+            self.container = av.open(self.video_src, timeout=timeout)
+        except av.error.FFmpegError:
+            return False
+        if not self.container.streams.video:
+            self.release()
+            return False
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'  # frame and slice threads
+        self.stream.thread_count = self.threads
+        self.stream.codec_context.skip_frame = self.skip_frame
+        self.frames = self.container.decode(self.stream)
+        return True
+
+    def is_opened(self) -> bool:
+        return self.frames is not None
+
+    def read(self, image: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        # image is not reused, FFmpeg converts into a buffer of its own
+        del image
+        if self.frames is None:
+            return False, None
+        try:
+            for frame in self.frames:
+                if self.skip_count > 0:
+                    self.skip_count -= 1
+                    continue
+                if (
+                    self.skip_until_pts is not None
+                    and frame.pts is not None
+                    and frame.pts < self.skip_until_pts
+                ):
+                    continue
+                self.skip_until_pts = None
+                return True, frame.to_ndarray(format='bgr24')
+        except av.error.FFmpegError:
+            self.frames = None  # the decode generator cannot continue after an error
+        return False, None
+
+    def seek(self, frame: int) -> None:
+        pts = frame_pts(
+            frame,
+            self.stream.average_rate or self.stream.guessed_rate,
+            self.stream.time_base,
+            self.stream.start_time,
+        )
+        self.skip_until_pts = pts
+        self.skip_count = 0
+        if pts is None:
+            # no frame rate to find the frame by, decode from the start and count frames
+            self.container.seek(0)
+            self.skip_count = frame
+        else:
+            self.container.seek(pts, stream=self.stream, backward=True)
+        self.frames = self.container.decode(self.stream)
+
+    def frame_count(self) -> int:
+        return max(0, self.stream.frames)
+
+    def fps(self) -> float:
+        return float(self.stream.average_rate or 0)
+
+    def release(self) -> None:
+        if self.container is not None:
+            self.container.close()
+        self.container = self.stream = self.frames = None
+
+
+class FrameBufferPool:
+    """
+    Reuse the arrays that cap.read() decodes into, instead of allocating a new frame per
+    read. Used by the capture thread only, so it is not locked.
+    """
+
+    def __init__(self, size: int):
+        self.size = size  # free buffers kept at most
+        self.free: list[np.ndarray] = []
+
+    def acquire(self) -> np.ndarray | None:
+        """A free buffer, or None to let cap.read() allocate one"""
+        return self.free.pop() if self.free else None
+
+    def release(self, buf: np.ndarray | None) -> None:
+        # cap.read() allocates again when the frame size changes, then the old buffer
+        # is let go when the pool is full
+        if buf is not None and len(self.free) < self.size:
+            self.free.append(buf)
+
 
 class FrameForInput:
-    def __init__(self, np_frame: np.ndarray, compressed_frame: bytes):
-        self.np_frame = np_frame
-        self.compressed_frame = compressed_frame
+    """
+    The encoded crops of a frame (the whole frame without SOURCE_ROI) and the size of
+    the raw frame. The raw frame goes back to the buffer pool after encoding, keep_raw
+    keeps a copy of it (for debugging).
+    captured_ns and enqueued_ns are the wall-clock times of capture and of the put in
+    the frame buffer, see lib/latency.py.
+    """
+
+    def __init__(
+        self,
+        np_frame: np.ndarray,
+        crops: list[Crop],
+        index: int | None = None,
+        *,
+        keep_raw: bool = False,
+        captured_ns: int = 0,
+    ):
+        self.np_frame = np_frame.copy() if keep_raw else None
+        self.shape = np_frame.shape
+        self.crops = crops
+        # position in the file when the file is read in segments, else set when taken
+        self.index = index
+        self.captured_ns = captured_ns
+        self.enqueued_ns = 0
 
-    def as_raw_frame(self) -> np.ndarray:
+    def as_raw_frame(self) -> np.ndarray | None:
         return self.np_frame
 
-    def as_compressed_frame(self) -> bytes:
-        return self.compressed_frame
+    def as_crops(self) -> list[Crop]:
+        return self.crops
 
     def height(self) -> int:
-        return self.np_frame.shape[0]
+        return self.shape[0]
 
     def width(self) -> int:
-        return self.np_frame.shape[1]
+        return self.shape[1]
+
+
+class MotionGate:
+    """
+    Admit a frame only when it differs from the last admitted one, or when keepalive
+    seconds have passed since then (keepalive <= 0 never forces a frame).
+    The change score is the mean absolute difference of tiny grayscale copies (0-255).
+    """
+
+    def __init__(self, threshold: float, keepalive: float, size: tuple[int, int] = (64, 36)):
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.size = size  # (width, height) of the copies
+        self.reference = None
+        self.admitted_at = 0.0
+        self.admitted = 0
+        self.skipped = 0
+
+    def score(self, small: np.ndarray) -> float:
+        return cv2.norm(small, self.reference, cv2.NORM_L1) / small.size
+
+    def admit(self, frame: np.ndarray) -> bool:
+        # striding first keeps the resize of a 4K frame cheap
+        step = max(1, min(frame.shape[0] // self.size[1], frame.shape[1] // self.size[0]) // 2)
+        small = cv2.resize(frame[::step, ::step], self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        now = time.monotonic()
+        keepalive_due = self.keepalive > 0 and now - self.admitted_at >= self.keepalive
+        if self.reference is not None and not keepalive_due and self.score(small) < self.threshold:
+            self.skipped += 1
+            return False
+        self.reference = small
+        self.admitted_at = now
+        self.admitted += 1
+        return True
 
 
 class AsyncVideoReader(Thread):
@@ -58,18 +486,29 @@ class AsyncVideoReader(Thread):
     AsyncFileVideoReader load video from source and
     slice a loaded source video into frames with OpenCV.
     Then this Class encode each of them into JPEG and put it in queue.
-    It uses a worker thread to read frames asynchronously,
-    and a queue to let the caller safely access encoded frames across threads.
+    It uses a worker thread to read frames asynchronously, a pool of encode threads
+    when SOURCE_ENCODE_WORKERS > 1 (cv2.imencode releases the GIL),
+    and a FrameQueue to let an asyncio caller await encoded frames without blocking its loop.
+    The FrameQueue policy decides what happens to frames the caller does not take in time.
     """
 
-    def __init__(self, logger: logging.Logger, failed_read_threshold=30, reconnect_threshold=5):
-        Thread.__init__(self)
+    def __init__(
+        self,
+        logger: logging.Logger,
+        failed_read_threshold=30,
+        stream_id=0,
+        segment: tuple[int, int] | None = None,
+        segment_index: int = 0,
+    ):
+        # names the threads and log lines of the reader, 'stream.segment' for a segment
+        self.label = str(stream_id) if segment is None else f'{stream_id}.{segment_index}'
+        Thread.__init__(self, name=f'video-reader-{self.label}')
 
         self.logger = logger
-        self.next_frame_queue = Queue(maxsize=1)
-        self.cap = None
+        self.stream_id = stream_id
+        # frames [start, end) of a file read in segments, None reads all of it
+        self.segment = segment
         self.failed_read_threshold = failed_read_threshold
-        self.reconnect_threshold = reconnect_threshold
         self.is_stream = False
         self.stopped = Event()
 
@@ -77,19 +516,123 @@ class AsyncVideoReader(Thread):
         load_dotenv(str(Path(__file__).parent / '../../app.env'))
         self.input_type = os.getenv('SOURCE_INPUT_TYPE')
         self.jpeg_quality = int(os.getenv('JPEG_QUALITY', '90'))
+        buffer_policy = os.getenv('SOURCE_BUFFER_POLICY', POLICY_LATEST)
+        buffer_size = int(os.getenv('SOURCE_BUFFER_SIZE', '1'))
+        if buffer_policy not in POLICIES or buffer_size < 1:
+            self.logger.error(
+                f'SOURCE_BUFFER_POLICY must be one of {POLICIES} and SOURCE_BUFFER_SIZE >= 1'
+            )
+            sys.exit(1)
+        self.next_frame_queue = FrameQueue(buffer_policy, buffer_size)
+        self.logger.info(f'frame buffer: {buffer_policy}, size {self.next_frame_queue.size}')
+        self._setup_encode()
+        self._load_video_src()
+        self._load_input_options()
+        self.cap = self._create_decoder()
+        # raw frames in use at once: one being read and the ones being encoded. Nothing is
+        # pooled when the decoder allocates every frame itself
+        pool_size = ENCODE_AHEAD * self.encode_workers + 2 if self.cap.reuses_image else 0
+        self.buffer_pool = FrameBufferPool(pool_size)
+
+        # capture progress for pending(). frame_count and fps are 0 when unknown
+        self.frame_count = 0
+        self.fps = 0.0
+        self.opened_at = 0.0
+        self.frames_read = 0  # since the capture was opened
+
+    def _setup_encode(self) -> None:
+        self.encode_workers = int(os.getenv('SOURCE_ENCODE_WORKERS', '1'))
+        if self.encode_workers < 1:
+            self.logger.error('SOURCE_ENCODE_WORKERS must be >= 1')
+            sys.exit(1)
+        # frames being encoded in capture order, at most ENCODE_AHEAD per worker
+        self.encode_pool = None
+        self.encoding: deque[tuple[np.ndarray, Future[list[Crop]], int | None, int]] = deque()
+        if self.encode_workers > 1:
+            self.encode_pool = ThreadPoolExecutor(
+                self.encode_workers, thread_name_prefix=f'jpeg-encode-{self.label}'
+            )
+        # frames are encoded at the input size of inference instead of FilterResize resizing them
+        self.resize_mode = os.getenv('SOURCE_RESIZE_MODE', RESIZE_NONE)
+        self.output_width = int(os.getenv('FR_OUTPUT_WIDTH', '416'))
+        self.output_height = int(os.getenv('FR_OUTPUT_HEIGHT', '416'))
+        if self.resize_mode not in RESIZE_MODES:
+            self.logger.error(f'SOURCE_RESIZE_MODE must be one of {RESIZE_MODES}')
+            sys.exit(1)
+        # frames of a static scene are skipped before encode. 0 admits every frame
+        motion_threshold = float(os.getenv('SOURCE_MOTION_THRESHOLD', '0'))
+        motion_keepalive = float(os.getenv('SOURCE_MOTION_KEEPALIVE', '1.0'))
+        self.motion_gate = None
+        if motion_threshold > 0:
+            self.motion_gate = MotionGate(motion_threshold, motion_keepalive)
+
+    def _load_input_options(self) -> None:
+        # regions encoded instead of the whole frame, empty for the whole frame
+        try:
+            self.rois = parse_rois(os.getenv('SOURCE_ROI', ''), self.stream_count)[self.stream_id]
+        except ValueError as e:
+            self.logger.error(f'SOURCE_ROI: {e}')
+            sys.exit(1)
+        if self.rois:
+            self.logger.info(f'stream {self.stream_id} regions: {self.rois}')
+
+        # file input only: frame rate and replay from the start at end of file
+        try:
+            self.pacing_fps = parse_pacing(os.getenv('SOURCE_FILE_PACING', DEFAULT_FILE_PACING))
+        except ValueError as e:
+            self.logger.error(f'SOURCE_FILE_PACING: {e}')
+            sys.exit(1)
+        self.file_loop = os.getenv('SOURCE_FILE_LOOP', 'false').lower() == 'true'
+
+        # stream input only: reconnect with jittered exponential backoff, never give up
+        self.reconnect_backoff = float(os.getenv('SOURCE_RECONNECT_BACKOFF', '0.5'))
+        self.reconnect_max_backoff = float(os.getenv('SOURCE_RECONNECT_MAX_BACKOFF', '30'))
+        self.stream_timeout_ms = int(os.getenv('SOURCE_STREAM_TIMEOUT_MS', '5000'))
+        if not 0 < self.reconnect_backoff <= self.reconnect_max_backoff:
+            self.logger.error(
+                'SOURCE_RECONNECT_BACKOFF must be > 0 and <= SOURCE_RECONNECT_MAX_BACKOFF'
+            )
+            sys.exit(1)
+        self.connected = False
+        self.reconnects = 0
+        self.disconnected_at = time.monotonic()
+
+    def _create_decoder(self) -> VideoDecoder:
+        decoder = os.getenv('SOURCE_DECODER', DECODER_OPENCV)
+        options = {'is_stream': self.input_type == 'stream', 'timeout_ms': self.stream_timeout_ms}
+        if decoder == DECODER_OPENCV:
+            return OpenCVDecoder(self.video_src, **options)
+        if decoder != DECODER_PYAV:
+            self.logger.error(f'SOURCE_DECODER must be one of {DECODERS}')
+            sys.exit(1)
+        if av is None:
+            self.logger.error('SOURCE_DECODER=pyav needs the av package, poetry install -E pyav')
+            sys.exit(1)
+        threads = int(os.getenv('SOURCE_DECODE_THREADS', '0'))
+        skip_frame = os.getenv('SOURCE_SKIP_FRAME', 'default')
+        if threads < 0 or skip_frame not in SKIP_FRAME_MODES:
+            self.logger.error(
+                f'SOURCE_DECODE_THREADS must be >= 0 and SOURCE_SKIP_FRAME one of '
+                f'{tuple(SKIP_FRAME_MODES)}'
+            )
+            sys.exit(1)
+        self.logger.info(f'decoder: pyav, threads: {threads or "auto"}, skip_frame: {skip_frame}')
+        return PyAVDecoder(
+            self.video_src, threads=threads, skip_frame=SKIP_FRAME_MODES[skip_frame], **options
+        )
+
+    def _load_video_src(self) -> None:
         if self.input_type is None:
             self.logger.error('environment variable SOURCE_INPUT_TYPE not set')
             sys.exit(1)
 
         if self.input_type == 'stream':
             self.video_src = os.getenv('VIDEO_STREAM_SRC')
-            self.logger.info(f'video_stream_src: {self.video_src}')
             if self.video_src is None:
                 self.logger.error('environment variable VIDEO_STREAM_SRC not set')
                 sys.exit(1)
         elif self.input_type == 'file':
             self.video_src = os.getenv('VIDEO_FILE_SRC')
-            self.logger.info(f'video_file_src: {self.video_src}')
             if self.video_src is None:
                 self.logger.error('environment variable VIDEO_FILE_SRC not set')
                 sys.exit(1)
@@ -97,15 +640,25 @@ class AsyncVideoReader(Thread):
             self.logger.error('environment variable SOURCE_INPUT_TYPE is a file or stream')
             sys.exit(1)
 
-    def run(self) -> None:
-        self._open_capture_video()
+        # a comma separated list gives one stream per camera or file, stream_id picks one
+        video_srcs = [src.strip() for src in self.video_src.split(',')]
+        self.stream_count = len(video_srcs)
+        if self.stream_id >= self.stream_count:
+            self.logger.error(
+                f'stream_id {self.stream_id} is out of {self.stream_count} video sources'
+            )
+            sys.exit(1)
+        self.video_src = video_srcs[self.stream_id]
+        self.logger.info(f'video_{self.input_type}_src[{self.stream_id}]: {self.video_src}')
 
+    def run(self) -> None:
         if self.input_type == 'stream':
-            # assume stream file is infinite
+            # assume stream file is infinite. _run_stream() opens it
             self.logger.info('AsyncVideoReader: run stream')
             self._run_stream()
         elif self.input_type == 'file':
             # assume video_src is mp4 file
+            self._open_capture_video()
             self.logger.info('AsyncVideoReader: run file')
             self._run_file()
         else:
@@ -113,73 +666,83 @@ class AsyncVideoReader(Thread):
             sys.exit(1)
 
     def _run_stream(self):
-        _reconnect_count = 0
-        _failed_read_count = 0
+        failed_read_count = 0
 
         try:
             while not self.stopped.is_set():
-                if self.cap and not self.cap.isOpened():
-                    self.logger.error("OpenCV couldn't src file")
-                    sys.exit(1)
+                if not self.connected:
+                    self._reconnect()
+                    failed_read_count = 0
+                    continue
 
-                ret, raw_frame = self.cap.read()
+                ret, raw_frame = self._read_frame()
 
-                if not ret or raw_frame is None:
+                if not ret:
                     self.logger.info('Failed to read frame')
-                    _failed_read_count += 1
-
-                    if _failed_read_count > self.failed_read_threshold:
-                        _reconnect_count += 1
-
-                        if _reconnect_count > self.reconnect_threshold:
-                            self.logger.error('Reconnect count is over threshold')
-                            sys.exit(1)
-
-                        self.logger.info('Trying to reconnect src')
-                        self._open_capture_video()
-                        self.read_false_count = 0
-                else:
-                    self.read_false_count = 0
+                    failed_read_count += 1
+                    if failed_read_count > self.failed_read_threshold or not self.cap.is_opened():
+                        self._disconnect()
+                    continue
 
+                failed_read_count = 0
+                self.frames_read += 1
                 self.logger.info('Read rightly')
-                compressed_frame = self._compress_frame(raw_frame)
-                self._put_latest(FrameForInput(raw_frame, compressed_frame))
+                self._process_frame(raw_frame)
         finally:
-            self.logger.info('_run_stream close')
+            self.logger.info(
+                f'_run_stream close, frames: {self.stats()}, motion: {self.motion_stats()}'
+            )
+            self._shutdown_encode()
             self._cap_release()
 
     def _run_file(self):
         self._show_frame_num()
-        # Set the value to 15 fps or higher, ensuring it is visually perceivable
-        # # When the value is 20, the actual FPS on the video receiving server is around 10
-        fps = 20.0
-        frame_period = 1.0 / fps
-        t_start = time.monotonic()
+        fps = self.pacing_fps
+        if fps is None:
+            fps = self.fps or DEFAULT_FILE_FPS
+        pacing = f'{fps} fps' if fps > 0 else PACING_UNTHROTTLED
+        self.logger.info(f'file pacing: {pacing}, loop: {self.file_loop}')
+        frame_period = 1.0 / fps if fps > 0 else 0.0
+        deadline = time.monotonic()
 
         try:
             while not self.stopped.is_set():
-                ret, raw_frame = self.cap.read()
+                ret, raw_frame = self._read_frame()
+                if ret and self.segment is not None and self.frames_read >= self.frame_count:
+                    self.buffer_pool.release(raw_frame)
+                    ret = False  # end of segment
+                if not ret and self.file_loop and self.frames_read > 0:
+                    self.logger.info('File has ended, replay from the start')
+                    self._seek_start()
+                    self.frames_read = 0
+                    continue
                 if not ret:
                     self.logger.info('File has ended')
-                    # a None means end of file (queue.Queue can accept None)
-                    self.next_frame_queue.put(None)
+                    self._flush_encode()
+                    # get_next_frame() returns None at end of file
+                    self.next_frame_queue.close()
                     return
 
+                self.frames_read += 1
                 self.logger.info('Read rightly')
-                compressed_frame = self._compress_frame(raw_frame)
-
-                # Add sleep process to prevent the video from
-                # playing too fast to be visually perceivable
-                t_process = time.monotonic()
-                t_wait = frame_period - (t_process - t_start)
-                if t_wait > 0.0:
-                    time.sleep(t_wait)
 
-                self._put_latest(FrameForInput(raw_frame, compressed_frame))
+                # Frames are put at absolute deadlines frame_period apart, so time spent in
+                # read and encode does not add up. A capture late by over a period
+                # (e.g. blocked on a full buffer) restarts the schedule instead of bursting
+                if frame_period > 0.0:
+                    deadline += frame_period
+                    t_wait = deadline - time.monotonic()
+                    if t_wait > 0.0:
+                        self.stopped.wait(t_wait)
+                    elif t_wait < -frame_period:
+                        deadline = time.monotonic()
 
-                t_start = time.monotonic()
+                self._process_frame(raw_frame, self._frame_index())
         finally:
-            self.logger.info('_run_file close')
+            self.logger.info(
+                f'_run_file close, frames: {self.stats()}, motion: {self.motion_stats()}'
+            )
+            self._shutdown_encode()
             self._cap_release()
 
     # The stop method is never called because the Sourcer class start method blocks internally
@@ -187,28 +750,135 @@ class AsyncVideoReader(Thread):
     # but there's no opportunity to do so due to the blocking nature of Sourcer start()
     def stop(self):
         self.stopped.set()
+        self.next_frame_queue.close()  # wakes a put() waiting for room
 
-    def get_next_frame(self) -> FrameForInput | None:
-        # Automatically wait in get() until data is put into the queue
-        return self.next_frame_queue.get()
+    async def get_next_frame(self) -> FrameForInput | None:
+        """
+        Wait for the next frame without blocking the event loop.
+        Return None at end of file.
+        """
+        return await self.next_frame_queue.get()
 
-    def _open_capture_video(self) -> None:
-        self.logger.debug('_open_capture_video')
+    def poll_frame(self) -> FrameForInput | None:
+        """
+        Take the next frame if one is ready. Return None at end of file.
+        Raise asyncio.QueueEmpty when no frame is ready yet.
+        """
+        return self.next_frame_queue.get_nowait()
 
-        # Release previous object
-        self._cap_release()
+    async def wait_frame(self) -> None:
+        """Wait until poll_frame() has a frame or the end of file"""
+        await self.next_frame_queue.wait()
+
+    def stats(self) -> FrameQueueStats:
+        """Counters of captured, dropped and served frames"""
+        return self.next_frame_queue.stats()
+
+    def pending(self) -> int:
+        """
+        Frames not sent yet: buffered and being encoded, plus for a file the frames not
+        read yet, and for a stream the frames the capture is behind the live fps (when
+        the stream has a valid fps).
+        """
+        if self.next_frame_queue.closed:
+            return self.next_frame_queue.stats().buffered
+        queued = self.next_frame_queue.stats().buffered + len(self.encoding)
+        if self.input_type == 'file':
+            return queued + max(0, self.frame_count - self.frames_read)
+        if not self.connected or self.fps <= 0:
+            return queued  # the lag is unknown during an outage or without fps
+        expected = int((time.monotonic() - self.opened_at) * self.fps)
+        return queued + max(0, expected - self.frames_read)
+
+    def health(self) -> dict[str, object]:
+        """Whether the stream is connected, reconnects so far and the current outage"""
+        outage = 0.0 if self.connected else time.monotonic() - self.disconnected_at
+        return {
+            'connected': self.connected,
+            'reconnects': self.reconnects,
+            'outage_seconds': round(outage, 1),
+        }
+
+    def motion_stats(self) -> dict[str, int]:
+        """Counters of admitted and skipped frames, empty when the motion gate is off"""
+        if self.motion_gate is None:
+            return {}
+        return {'admitted': self.motion_gate.admitted, 'skipped': self.motion_gate.skipped}
+
+    def _reconnect(self) -> None:
+        """
+        Open the stream, retrying until it succeeds or the reader stops. Attempts wait
+        between half and all of a delay that doubles up to reconnect_max_backoff, so
+        readers of the same camera server do not retry in lockstep.
+        """
+        delay = self.reconnect_backoff
+        while not self.stopped.is_set():
+            if self._try_open_capture_video():
+                outage = time.monotonic() - self.disconnected_at
+                self.logger.info(f'stream connected after {outage:.1f}s: {self.video_src}')
+                return
+            wait = delay / 2 + random.uniform(0, delay / 2)  # noqa: S311
+            self.logger.warning(f'Failed to open stream, retry in {wait:.2f}s: {self.video_src}')
+            self.stopped.wait(wait)
+            delay = min(delay * 2, self.reconnect_max_backoff)
 
-        self.cap = cv2.VideoCapture(self.video_src)
+    def _disconnect(self) -> None:
+        self.logger.warning(f'stream lost, reconnecting: {self.video_src}')
+        self._cap_release()
+        self.connected = False
+        self.reconnects += 1
+        self.disconnected_at = time.monotonic()
 
-        if not self.cap.isOpened():
+    def _open_capture_video(self) -> None:
+        if not self._try_open_capture_video():
             self.logger.error(f'Failed to open video file: {self.video_src}')
             sys.exit(1)
 
+    def _try_open_capture_video(self) -> bool:
+        self.logger.debug('_open_capture_video')
+
+        # open() releases the previous capture
+        if not self.cap.open():
+            return False
+
+        self.frame_count = self.cap.frame_count()
+        self.fps = self.cap.fps()
+        if self.input_type == 'stream' and not 0 < self.fps <= MAX_STREAM_FPS:
+            self.logger.warning(f'stream fps {self.fps} is not a frame rate, lag not reported')
+            self.fps = 0.0
+        if self.segment is not None:
+            self.frame_count = self.segment[1] - self.segment[0]
+            self._seek_start()
+        self.opened_at = time.monotonic()
+        self.frames_read = 0
+        # a file is connected once opened, it has no outage
+        self.connected = True
+        return True
+
+    def _seek_start(self) -> None:
+        # the decoder seeks to the keyframe before start and decodes up to it,
+        # so the first frame read is the frame at start
+        start = 0 if self.segment is None else self.segment[0]
+        self.cap.seek(start)
+        if self.segment is not None:
+            self.logger.info(f'segment {self.label} {self.segment}: start at frame {start}')
+
+    def _frame_index(self) -> int | None:
+        # position in the file of the frame read last, when reading a segment
+        if self.segment is None:
+            return None
+        return self.segment[0] + self.frames_read - 1
+
     def _show_frame_num(self) -> None:
-        frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.logger.info(f'Total frame: {frame_count}')
+        self.logger.info(f'Total frame: {self.cap.frame_count()}')
 
     def _compress_frame(self, frame: np.array) -> bytes:
+        if self.resize_mode == RESIZE_STRETCH:
+            frame = cv2.resize(
+                frame, (self.output_width, self.output_height), interpolation=cv2.INTER_AREA
+            )
+        elif self.resize_mode == RESIZE_LETTERBOX:
+            frame = letterbox(frame, self.output_height, self.output_width)
         ret, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
         if not ret:
             self.logger.error('Failed to compress frame to jpg')
@@ -216,22 +886,90 @@ class AsyncVideoReader(Thread):
 
         return buf.tobytes()
 
-    def _put_latest(self, item: FrameForInput):
-        try:
-            self.next_frame_queue.put_nowait(item)
-        except Full:
-            try:  # noqa: SIM105
-                self.next_frame_queue.get_nowait()  # drop a queued frame
-            except Empty:
-                pass
-            try:  # noqa: SIM105
-                self.next_frame_queue.put_nowait(item)
-            except Full:
-                pass
+    def _compress_crops(self, frame: np.ndarray) -> list[Crop]:
+        if not self.rois:
+            return [(0, None, self._compress_frame(frame))]
+        crops = []
+        for roi_id, roi in enumerate(self.rois):
+            clipped = clip_roi(roi, frame.shape[0], frame.shape[1])
+            if clipped is None:
+                continue
+            x, y, width, height = clipped
+            crops.append(
+                (roi_id, clipped, self._compress_frame(frame[y : y + height, x : x + width]))
+            )
+        return crops
+
+    def _admit(self, raw_frame: np.ndarray) -> bool:
+        return self.motion_gate is None or self.motion_gate.admit(raw_frame)
+
+    def _read_frame(self) -> tuple[bool, np.ndarray | None]:
+        """cap.read() into a pooled buffer. The buffer goes back to the pool on failure."""
+        buf = self.buffer_pool.acquire()
+        ret, raw_frame = self.cap.read(buf)
+        if not ret:
+            self.buffer_pool.release(buf)
+            return False, None
+        return True, raw_frame
+
+    def _process_frame(self, raw_frame: np.ndarray, index: int | None = None) -> None:
+        # a file frame is captured when pacing releases it, right before this call
+        captured_ns = time.time_ns()
+        if self._admit(raw_frame):
+            self._encode_frame(raw_frame, index, captured_ns)
+        else:
+            self.buffer_pool.release(raw_frame)
+
+    def _encode_frame(
+        self, raw_frame: np.ndarray, index: int | None = None, captured_ns: int = 0
+    ) -> None:
+        """
+        Encode raw_frame and put it in the queue. Frames are put in capture order.
+        raw_frame goes back to the buffer pool once encoded.
+        """
+        if self.encode_pool is None:
+            crops = self._compress_crops(raw_frame)
+            self._put_frame(FrameForInput(raw_frame, crops, index, captured_ns=captured_ns))
+            self.buffer_pool.release(raw_frame)
+            return
+
+        future = self.encode_pool.submit(self._compress_crops, raw_frame)
+        self.encoding.append((raw_frame, future, index, captured_ns))
+        # put every finished frame at the head, wait for the oldest when too many are pending
+        while self.encoding and (
+            self.encoding[0][1].done() or len(self.encoding) > ENCODE_AHEAD * self.encode_workers
+        ):
+            self._put_encoded()
+
+    def _flush_encode(self) -> None:
+        while self.encoding:
+            self._put_encoded()
+
+    def _put_encoded(self) -> None:
+        raw_frame, future, index, captured_ns = self.encoding.popleft()
+        self._put_frame(FrameForInput(raw_frame, future.result(), index, captured_ns=captured_ns))
+        self.buffer_pool.release(raw_frame)
+
+    def _shutdown_encode(self) -> None:
+        if self.encode_pool is not None:
+            self.encode_pool.shutdown(cancel_futures=True)
+        self.encoding.clear()
+
+    def _put_frame(self, item: FrameForInput):
+        if not item.crops:
+            self.logger.debug('no region is inside the frame, the frame is skipped')
+            return
+        item.enqueued_ns = time.time_ns()
+        if not self.next_frame_queue.put(item):
+            self.logger.debug('frame buffer full, a frame was dropped')
 
     def _cap_release(self):
-        if self.cap:
-            self.cap.release()
+        self.cap.release()
+
+    def close(self) -> None:
+        """Release the encode threads and the decoder of a reader that is never started"""
+        self._shutdown_encode()
+        self._cap_release()
 
 
 class AsyncSourceSendFrame(Sourcer):
@@ -248,69 +986,258 @@ class AsyncSourceSendFrame(Sourcer):
         set_logger_log_level(self.logger)
         self.logger.info('Source init')
 
-        self.async_video_reader = AsyncVideoReader(self.logger)
-        self.async_video_reader.start()
+        # setup ENV
+        self.vertex_key_codec = os.getenv('VERTEX_KEY_CODEC', 'text')
+        self.payload_format = os.getenv('VERTEX_PAYLOAD_FORMAT', PAYLOAD_KEYS)
+        self.latency_stamps = os.getenv('LATENCY_STAMPS', 'false').lower() == 'true'
+        if self.vertex_key_codec not in CODECS:
+            self.logger.error(f'VERTEX_KEY_CODEC must be one of {CODECS}')
+            sys.exit(1)
+        if self.payload_format not in PAYLOAD_FORMATS:
+            self.logger.error(f'VERTEX_PAYLOAD_FORMAT must be one of {PAYLOAD_FORMATS}')
+            sys.exit(1)
+        # in-flight window: reads stop while this many offsets (or payload bytes) wait for ack.
+        # 0 bytes means no byte limit
+        self.max_inflight = int(os.getenv('SOURCE_MAX_INFLIGHT', '32'))
+        self.max_inflight_bytes = int(os.getenv('SOURCE_MAX_INFLIGHT_BYTES', '0'))
+        if self.max_inflight < 1 or self.max_inflight_bytes < 0:
+            self.logger.error('SOURCE_MAX_INFLIGHT must be >= 1 and SOURCE_MAX_INFLIGHT_BYTES >= 0')
+            sys.exit(1)
+
+        # partition of each reader
+        self.partition_of = self._create_readers()
+        self.async_video_readers = list(self.partition_of)
+        for reader in self.async_video_readers:
+            reader.start()
+        # readers not at end of file, served round-robin from next_reader
+        self.active_readers = list(self.async_video_readers)
+        self.next_reader = 0
+        # crops of the last frame taken that are not sent yet, (reader, frame, crop)
+        self.crops_left: deque[tuple[AsyncVideoReader, FrameForInput, Crop]] = deque()
 
         """
-        to_ack_set: Set to maintain a track of the offsets yet to be acknowledged
-        read_idx : the offset idx till where the messages have been read.
-                   use this field as frame_index.
+        to_ack: (partition, offset) yet to be acknowledged, with the payload size of each
+        inflight_bytes: total payload size of to_ack
+        read_idx : per stream, the offset idx till where the messages have been read.
+        frame_idx: per stream, the number of the next frame taken. The crops of a frame
+                   share it, without SOURCE_ROI it equals read_idx.
         """
-        self.to_ack_set = set()
-        self.read_idx = 0
+        self.to_ack: dict[tuple[int, str], int] = {}
+        self.inflight_bytes = 0
+        self.read_idx = dict.fromkeys(self.async_video_readers, 0)
+        self.frame_idx = dict.fromkeys(self.async_video_readers, 0)
+        self.stats_logged_at = time.monotonic()
 
     async def read_handler(self, datum: ReadRequest, output: NonBlockingIterator):
         """read_handler is used to read the data from the source and send the data forward
         for each read request we process num_records and increment the read_idx to indicate that
-        the message has been read and the same is added to the ack set
+        the message has been read and the same is added to the ack set.
+        Streams take turns, and reading stops early when the in-flight window is full
         """
-        if self.to_ack_set:
-            return
+
+        # frames ready by the request timeout are sent as a partial batch.
+        # timeout_in_ms <= 0 means no timeout
+        deadline = None
+        if datum.timeout_in_ms > 0:
+            deadline = asyncio.get_running_loop().time() + datum.timeout_in_ms / 1000
 
         # self.logger.debug('datum.num_records: %d', datum.num_records)
-        for _x in range(datum.num_records):
+        for i in range(datum.num_records):
+            if self._window_full():
+                self.logger.debug(
+                    'in-flight window full, sent %d of %d records', i, datum.num_records
+                )
+                break
             headers = {'x-txn-id': str(uuid.uuid4())}
 
-            vk_io = VertexKeyIO()
-            frame = self.async_video_reader.get_next_frame()
-            if frame is None:
-                self.logger.info('A None frame was passed. src_file has ended')
-                self.async_video_reader.join()
+            vk_io = VertexKeyIO(codec=self.vertex_key_codec, schema=FRAME_SCHEMA)
+            try:
+                async with asyncio.timeout_at(deadline):
+                    next_crop = await self._next_crop()
+            except TimeoutError:
+                self.logger.debug('read timeout, sent %d of %d records', i, datum.num_records)
+                break
+            if next_crop is None:
+                self.logger.info('All video sources have ended')
                 await output.put(STREAM_EOF)
                 break
+            reader, frame, (roi_id, roi, compressed_frame) = next_crop
+            read_idx = self.read_idx[reader]
 
             # self._debug_frame_info(frame.as_raw_frame())
 
-            vk_io.add('frame_idx', self.read_idx)
+            # a segment of a file is numbered by the position in the file, other frames
+            # in the order taken (see _next_crop)
+            vk_io.add('frame_idx', frame.index)
             vk_io.add('org_height', frame.height())
             vk_io.add('org_width', frame.width())
+            vk_io.add('stream_id', reader.stream_id)
+            # size of the encoded image before resize
+            height, width = frame.height(), frame.width()
+            if roi is not None:
+                # the crop in the captured frame, for the Sink to map boxes back to it
+                crop_x, crop_y, width, height = roi
+                vk_io.update(
+                    roi_id=roi_id,
+                    crop_x=crop_x,
+                    crop_y=crop_y,
+                    crop_width=width,
+                    crop_height=height,
+                )
+            if reader.resize_mode == RESIZE_LETTERBOX:
+                _, _, pad_top, pad_left = letterbox_layout(
+                    height,
+                    width,
+                    reader.output_height,
+                    reader.output_width,
+                )
+                vk_io.add('pad_top', pad_top)
+                vk_io.add('pad_left', pad_left)
+            if self.latency_stamps:
+                stamp(vk_io, CAPTURE, frame.captured_ns)
+                stamp(vk_io, ENQUEUE, frame.enqueued_ns)
+                stamp(vk_io, EMIT)
+            keys, payload = write_payload(vk_io, compressed_frame, self.payload_format)
 
+            partition = self.partition_of[reader]
             await output.put(
                 Message(
-                    payload=frame.as_compressed_frame(),
-                    offset=Offset.offset_with_default_partition_id(str(self.read_idx).encode()),
+                    payload=payload,
+                    offset=Offset(offset=str(read_idx).encode(), partition_id=partition),
                     event_time=datetime.now(),
-                    keys=vk_io.keys_list,
+                    keys=keys,
                     headers=headers,
                 ),
             )
-            self.to_ack_set.add(str(self.read_idx))
-            self.read_idx += 1
+            self.to_ack[partition, str(read_idx)] = len(payload)
+            self.inflight_bytes += len(payload)
+            self.read_idx[reader] += 1
+
+        self._log_stats()
 
     async def ack_handler(self, ack_request: AckRequest):
         """The ack handler is used acknowledge the offsets that have been read, and remove them
-        from the to_ack_set
+        from to_ack, which opens the in-flight window for the next reads
         """
         for req in ack_request.offsets:
-            self.to_ack_set.remove(str(req.offset, 'utf-8'))
+            offset = str(req.offset, 'utf-8')
+            size = self.to_ack.pop((req.partition_id, offset), None)
+            if size is None:
+                self.logger.warning(f'ack of unknown offset {offset} of {req.partition_id}')
+                continue
+            self.inflight_bytes -= size
 
     async def pending_handler(self) -> PendingResponse:
-        """The simple source always returns zero to indicate there is no pending record."""
-        return PendingResponse(count=0)
+        """Frames not read yet over all streams, see AsyncVideoReader.pending()"""
+        pending = sum(reader.pending() for reader in self.active_readers)
+        return PendingResponse(count=pending + len(self.crops_left))
 
     async def partitions_handler(self) -> PartitionsResponse:
-        """The simple source always returns default partitions."""
-        return PartitionsResponse(partitions=get_default_partitions())
+        """One partition per video source"""
+        return PartitionsResponse(partitions=list(self.partition_of.values()))
+
+    def _create_readers(self) -> dict[AsyncVideoReader, int]:
+        """
+        One reader per video source. stream_id is the index of the source.
+        Each reader has a partition of its own. Partitions of replicas do not overlap,
+        and a single stream keeps the default partition.
+        With SOURCE_FILE_SHARDS > 1, a single file is split into segments instead.
+        Replicas take the segments whose index modulo SOURCE_FILE_SHARD_REPLICAS is their
+        replica index, and a segment's partition is its index.
+        """
+        reader = AsyncVideoReader(self.logger)
+        replica = get_default_partitions()[0]
+        shards = int(os.getenv('SOURCE_FILE_SHARDS', '1'))
+        if shards <= 1:
+            readers = [reader] + [
+                AsyncVideoReader(self.logger, stream_id=i) for i in range(1, reader.stream_count)
+            ]
+            base = replica * len(readers)
+            return {reader: base + i for i, reader in enumerate(readers)}
+
+        replicas = int(os.getenv('SOURCE_FILE_SHARD_REPLICAS', '1'))
+        if reader.input_type != 'file' or reader.stream_count != 1 or replicas < 1:
+            self.logger.error(
+                'SOURCE_FILE_SHARDS needs a single VIDEO_FILE_SRC '
+                'and SOURCE_FILE_SHARD_REPLICAS >= 1'
+            )
+            sys.exit(1)
+        try:
+            segments = file_segments(reader.video_src, shards)
+        except ValueError as e:
+            self.logger.error(f'SOURCE_FILE_SHARDS: {e}')
+            sys.exit(1)
+        reader.close()  # the first reader only read the configuration
+        own = {i: s for i, s in enumerate(segments) if i % replicas == replica % replicas}
+        self.logger.info(f'replica {replica} reads segments {own} of {len(segments)}')
+        return {
+            AsyncVideoReader(self.logger, segment=s, segment_index=i): i for i, s in own.items()
+        }
+
+    async def _next_crop(self) -> tuple[AsyncVideoReader, FrameForInput, Crop] | None:
+        """
+        The next crop to send, of the last frame taken or else of the next frame.
+        A frame of a whole file or a stream gets its number as index here.
+        Return (reader, frame, crop), or None once every stream has ended.
+        """
+        if not self.crops_left:
+            next_frame = await self._next_frame()
+            if next_frame is None:
+                return None
+            reader, frame = next_frame
+            if frame.index is None:
+                frame.index = self.frame_idx[reader]
+                self.frame_idx[reader] += 1
+            self.crops_left.extend((reader, frame, crop) for crop in frame.as_crops())
+        return self.crops_left.popleft()
+
+    async def _next_frame(self) -> tuple[AsyncVideoReader, FrameForInput] | None:
+        """
+        Wait for a frame of any stream. Streams with a ready frame take turns.
+        Return (reader, frame), or None once every stream has ended.
+        """
+        while self.active_readers:
+            for _ in range(len(self.active_readers)):
+                self.next_reader %= len(self.active_readers)
+                reader = self.active_readers[self.next_reader]
+                try:
+                    frame = reader.poll_frame()
+                except asyncio.QueueEmpty:
+                    self.next_reader += 1
+                    continue
+                if frame is None:
+                    self.logger.info(f'stream {reader.label}: src_file has ended')
+                    self.active_readers.remove(reader)
+                    await asyncio.to_thread(reader.join)
+                    break
+                self.next_reader += 1
+                return reader, frame
+            else:
+                await self._wait_any_frame()
+        return None
+
+    async def _wait_any_frame(self) -> None:
+        tasks = [asyncio.ensure_future(reader.wait_frame()) for reader in self.active_readers]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if now - self.stats_logged_at >= STATS_LOG_INTERVAL:
+            self.stats_logged_at = now
+            for reader in self.async_video_readers:
+                self.logger.info(
+                    f'stream {reader.label} frames: {reader.stats()}, '
+                    f'motion: {reader.motion_stats()}, health: {reader.health()}'
+                )
+
+    def _window_full(self) -> bool:
+        if len(self.to_ack) >= self.max_inflight:
+            return True
+        return 0 < self.max_inflight_bytes <= self.inflight_bytes
 
     def _debug_frame_info(self, frame: np.ndarray) -> None:
         height, width, channels = frame.shape
@@ -328,7 +1255,8 @@ class AsyncSourceSendFrame(Sourcer):
         )
 
     def stop_reader(self):
-        self.async_video_reader.stop()
+        for reader in self.async_video_readers:
+            reader.stop()
 
 
 if __name__ == '__main__':
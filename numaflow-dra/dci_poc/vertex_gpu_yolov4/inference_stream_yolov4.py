@@ -18,12 +18,18 @@ from models import Yolov4
 from tool.torch_utils import do_detect
 from tool.utils import load_class_names
 
+from lib.envelope import read_payload, write_payload
+from lib.latency import stamp
 from lib.log import (
     add_new_filehandler,
     set_logger_log_level,
 )
 from lib.vertex_key_io import (
-    VertexKeyIO,
+    BOX_COLUMNS,
+    BOX_LAYOUT_PACKED,
+    BOXES_KEY,
+    DETECTIONS_SCHEMA,
+    FRAME_SCHEMA,
 )
 
 
@@ -39,6 +45,10 @@ class Infer(MapStreamer):
         set_logger_log_level(self.logger)
         self.logger.info('Infer init')
 
+        # setup ENV
+        self.box_layout = os.getenv('VERTEX_KEY_BOX_LAYOUT', 'keys')
+        self.latency_stamps = os.getenv('LATENCY_STAMPS', 'false').lower() == 'true'
+
         self.check_gpu_info()
 
         # setup yolov4
@@ -103,7 +113,7 @@ class Infer(MapStreamer):
             self.logger.error(f'Encountered exception: {e} in infer()', exc_info=True)
             return None
 
-    def _decompress_frame_np(self, value: bytes) -> np.ndarray:
+    def _decompress_frame_np(self, value: bytes | memoryview) -> np.ndarray:
         if not value:
             self.logger.error('Empty payload received')
             return None
@@ -117,13 +127,14 @@ class Infer(MapStreamer):
         return img
 
     async def handler(self, _keys: list[str], datum: Datum) -> AsyncIterable[Message]:
-        resized_frame = self._decompress_frame_np(datum.value)
+        vk_io, image, payload_format = read_payload(datum.keys, datum.value, schema=FRAME_SCHEMA)
+        if self.latency_stamps:
+            stamp(vk_io, 'inference_in')
+        resized_frame = self._decompress_frame_np(image)
 
         _ = datum.event_time
         _ = datum.watermark
 
-        vk_io = VertexKeyIO(datum.keys)
-
         # inference data on GPU
         frame_idx = vk_io['frame_idx']
         self.logger.info(f'frame_index: {frame_idx}')
@@ -137,17 +148,30 @@ class Infer(MapStreamer):
             yield Message.to_drop()
             return
 
+        # keys sent to the sink
+        vk_io.set_schema(DETECTIONS_SCHEMA)
         vk_io.add('box_len', len(bboxes))
-        # fmt: off
-        for i, box in enumerate(bboxes):
-            vk_io.add(f'box_{i}_confidence',   box[i][4])
-            vk_io.add(f'box_{i}_class_id',     box[i][6])
-            vk_io.add(f'box_{i}_LeftUpX',      box[i][0])
-            vk_io.add(f'box_{i}_LeftUpY',      box[i][1])
-            vk_io.add(f'box_{i}_RightDownX',   box[i][2])
-            vk_io.add(f'box_{i}_RightDownY',   box[i][3])
+        if self.box_layout == BOX_LAYOUT_PACKED:
+            # a single (N, 6) float32 table. columns are in BOX_COLUMNS order
+            table = np.array(
+                [
+                    (box[i][4], box[i][6], box[i][0], box[i][1], box[i][2], box[i][3])
+                    for i, box in enumerate(bboxes)
+                ],
+                dtype=np.float32,
+            ).reshape(-1, len(BOX_COLUMNS))
+            vk_io.add(BOXES_KEY, table)
+        else:
+            # fmt: off
+            for i, box in enumerate(bboxes):
+                vk_io.add(f'box_{i}_confidence',   box[i][4])
+                vk_io.add(f'box_{i}_class_id',     box[i][6])
+                vk_io.add(f'box_{i}_LeftUpX',      box[i][0])
+                vk_io.add(f'box_{i}_LeftUpY',      box[i][1])
+                vk_io.add(f'box_{i}_RightDownX',   box[i][2])
+                vk_io.add(f'box_{i}_RightDownY',   box[i][3])
+            # fmt: on
         self.logger.debug(f'{vk_io.items()}')
-        # fmt: on
 
         # str_size = 0
         # for s in vk_io.keys_list:
@@ -156,9 +180,12 @@ class Infer(MapStreamer):
         # self.logger.debug(f'{sys.getsizeof(pickle.dumps(resized_frame))}')
         # self.logger.debug(f'{str_size}')
 
+        if self.latency_stamps:
+            stamp(vk_io, 'inference_out')
+        keys, value = write_payload(vk_io, image, payload_format)
         yield Message(
-            value=datum.value,
-            keys=vk_io.keys_list,
+            value=value,
+            keys=keys,
         )
 
 
@@ -17,12 +17,18 @@ from models.experimental import attempt_load
 from utils.datasets import letterbox
 from utils.general import check_img_size, non_max_suppression, scale_coords
 
+from lib.envelope import read_payload, write_payload
+from lib.latency import stamp
 from lib.log import (
     add_new_filehandler,
     set_logger_log_level,
 )
 from lib.vertex_key_io import (
-    VertexKeyIO,
+    BOX_COLUMNS,
+    BOX_LAYOUT_PACKED,
+    BOXES_KEY,
+    DETECTIONS_SCHEMA,
+    FRAME_SCHEMA,
 )
 
 
@@ -38,6 +44,10 @@ class Infer(MapStreamer):
         set_logger_log_level(self.logger)
         self.logger.info('Infer init')
 
+        # setup ENV
+        self.box_layout = os.getenv('VERTEX_KEY_BOX_LAYOUT', 'keys')
+        self.latency_stamps = os.getenv('LATENCY_STAMPS', 'false').lower() == 'true'
+
         self.check_gpu_info()
 
         # setup yolov7
@@ -163,6 +173,7 @@ class Infer(MapStreamer):
                             'bbox': [float(e) for e in xyxy],  # x1, y1, x2, y2
                             'conf': float(conf),
                             'class': self.names[int(cls)],
+                            'class_id': int(cls),
                         }
                     )
             self.logger.info(f'results: {results}')
@@ -171,7 +182,7 @@ class Infer(MapStreamer):
         except Exception as e:
             self.logger.error(f'Encountered exception: {e} in infer()', exc_info=True)
 
-    def _decompress_frame_np(self, value: bytes) -> np.ndarray:
+    def _decompress_frame_np(self, value: bytes | memoryview) -> np.ndarray:
         if not value:
             self.logger.error('Empty payload received')
             return None
@@ -185,13 +196,14 @@ class Infer(MapStreamer):
         return img
 
     async def handler(self, _keys: list[str], datum: Datum) -> AsyncIterable[Message]:
-        resized_frame = self._decompress_frame_np(datum.value)
+        vk_io, image, payload_format = read_payload(datum.keys, datum.value, schema=FRAME_SCHEMA)
+        if self.latency_stamps:
+            stamp(vk_io, 'inference_in')
+        resized_frame = self._decompress_frame_np(image)
 
         _ = datum.event_time
         _ = datum.watermark
 
-        vk_io = VertexKeyIO(datum.keys)
-
         # inference data on GPU
         frame_idx = vk_io['frame_idx']
         self.logger.info(f'frame_index: {frame_idx}')
@@ -206,17 +218,27 @@ class Infer(MapStreamer):
             yield Message.to_drop()
             return
 
+        # keys sent to the sink
+        vk_io.set_schema(DETECTIONS_SCHEMA)
         vk_io.add('box_len', len(res))
-        # fmt: off
-        for i, r in enumerate(res):
-            vk_io.add(f'box_{i}_confidence',   r['conf'])
-            vk_io.add(f'box_{i}_class_id',     r['class'])
-            vk_io.add(f'box_{i}_LeftUpX',      r['bbox'][0])
-            vk_io.add(f'box_{i}_LeftUpY',      r['bbox'][1])
-            vk_io.add(f'box_{i}_RightDownX',   r['bbox'][2])
-            vk_io.add(f'box_{i}_RightDownY',   r['bbox'][3])
+        if self.box_layout == BOX_LAYOUT_PACKED:
+            # a single (N, 6) float32 table. columns are in BOX_COLUMNS order.
+            table = np.array(
+                [(r['conf'], r['class_id'], *r['bbox']) for r in res],
+                dtype=np.float32,
+            ).reshape(-1, len(BOX_COLUMNS))
+            vk_io.add(BOXES_KEY, table)
+        else:
+            # fmt: off
+            for i, r in enumerate(res):
+                vk_io.add(f'box_{i}_confidence',   r['conf'])
+                vk_io.add(f'box_{i}_class_id',     r['class_id'])
+                vk_io.add(f'box_{i}_LeftUpX',      r['bbox'][0])
+                vk_io.add(f'box_{i}_LeftUpY',      r['bbox'][1])
+                vk_io.add(f'box_{i}_RightDownX',   r['bbox'][2])
+                vk_io.add(f'box_{i}_RightDownY',   r['bbox'][3])
+            # fmt: on
         self.logger.debug(f'{vk_io.items()}')
-        # fmt: on
 
         # str_size = 0
         # for s in vk_io.keys_list:
@@ -225,9 +247,12 @@ class Infer(MapStreamer):
         # self.logger.debug(f'{sys.getsizeof(pickle.dumps(resized_frame))}')
         # self.logger.debug(f'{str_size}')
 
+        if self.latency_stamps:
+            stamp(vk_io, 'inference_out')
+        keys, value = write_payload(vk_io, image, payload_format)
         yield Message(
-            value=datum.value,
-            keys=vk_io.keys_list,
+            value=value,
+            keys=keys,
         )
 
 
@@ -0,0 +1,136 @@
+"""
+Payload envelope: frame metadata and image in the value of one message.
+
+By default metadata rides in the Numaflow keys and the image in the value. An envelope
+carries both in the value, so keys stay free for routing keys and metadata is read in
+place instead of through a list of strings.
+
+Layout (little-endian):
+  header : magic(4s) version(u8) meta_kind(u8) header_size(u16)
+           meta_offset(u32) meta_len(u32) image_offset(u32) image_len(u32)
+  meta   : VertexKeyIO packed with the binary codec (META_BINARY) or the schema codec
+           (META_SCHEMA), without marker and base64
+  image  : encoded image (JPEG) as is
+
+Parsing does not copy: metadata is read lazily from a memoryview and the image is
+returned as a memoryview of the value.
+"""
+
+import struct
+from collections.abc import Sequence
+
+from lib.vertex_key_io import CODEC_SCHEMA, Schema, VertexKeyIO
+
+ENVELOPE_MAGIC = b'VKEN'
+ENVELOPE_VERSION = 1
+
+META_BINARY = 0
+META_SCHEMA = 1
+
+# VERTEX_PAYLOAD_FORMAT: where a vertex writes frame metadata
+PAYLOAD_KEYS = 'keys'
+PAYLOAD_ENVELOPE = 'envelope'
+PAYLOAD_FORMATS = (PAYLOAD_KEYS, PAYLOAD_ENVELOPE)
+
+_HEADER = struct.Struct('<4sBBHIIII')
+
+
+def is_envelope(value: bytes | bytearray | memoryview) -> bool:
+    """True if value starts with ENVELOPE_MAGIC"""
+    return bytes(value[: len(ENVELOPE_MAGIC)]) == ENVELOPE_MAGIC
+
+
+def pack_envelope(vk_io: VertexKeyIO, image: bytes | bytearray | memoryview) -> bytes:
+    """
+    Pack metadata and image into one envelope. Metadata uses the schema codec when
+    vk_io is written with it, else the binary codec.
+    """
+    if vk_io.codec == CODEC_SCHEMA:
+        meta_kind, meta = META_SCHEMA, vk_io.to_schema_bytes()
+    else:
+        meta_kind, meta = META_BINARY, vk_io.to_bytes()
+    image_offset = _HEADER.size + len(meta)
+    header = _HEADER.pack(
+        ENVELOPE_MAGIC,
+        ENVELOPE_VERSION,
+        meta_kind,
+        _HEADER.size,
+        _HEADER.size,
+        len(meta),
+        image_offset,
+        len(image),
+    )
+    return b''.join((header, meta, image))
+
+
+def unpack_envelope(
+    value: bytes | bytearray | memoryview,
+    *,
+    lazy: bool = True,
+    schema: Schema | None = None,
+) -> tuple[VertexKeyIO, memoryview]:
+    """
+    Parse an envelope. Return (metadata, image). Both refer to value without copying,
+    so value must not be modified while they are used.
+    """
+    buf = memoryview(value)
+    try:
+        magic, version, meta_kind, _, meta_offset, meta_len, image_offset, image_len = (
+            _HEADER.unpack_from(buf, 0)
+        )
+    except struct.error as e:
+        msg = 'envelope is truncated'
+        raise ValueError(msg) from e
+    if magic != ENVELOPE_MAGIC:
+        msg = f'not an envelope (magic {magic!r})'
+        raise ValueError(msg)
+    if version != ENVELOPE_VERSION:
+        msg = f'unsupported envelope version {version}, expected {ENVELOPE_VERSION}'
+        raise ValueError(msg)
+    if meta_offset + meta_len > len(buf) or image_offset + image_len > len(buf):
+        msg = f'envelope offsets are out of range of {len(buf)} bytes'
+        raise ValueError(msg)
+
+    meta = buf[meta_offset : meta_offset + meta_len]
+    vk_io = VertexKeyIO(lazy=lazy, schema=schema)
+    if meta_kind == META_SCHEMA:
+        vk_io.set_schema_bytes(meta)
+    elif meta_kind == META_BINARY:
+        vk_io.set_bytes(meta)
+    else:
+        msg = f'unknown envelope metadata kind {meta_kind}'
+        raise ValueError(msg)
+    return vk_io, buf[image_offset : image_offset + image_len]
+
+
+def read_payload(
+    keys: Sequence[str],
+    value: bytes | bytearray | memoryview,
+    *,
+    lazy: bool = True,
+    schema: Schema | None = None,
+) -> tuple[VertexKeyIO, bytes | memoryview, str]:
+    """
+    Read the metadata and image of a message in either PAYLOAD_FORMATS.
+    Return (metadata, image, payload format), the format to write the next message in.
+    """
+    if is_envelope(value):
+        vk_io, image = unpack_envelope(value, lazy=lazy, schema=schema)
+        return vk_io, image, PAYLOAD_ENVELOPE
+    return VertexKeyIO(keys, lazy=lazy, schema=schema), value, PAYLOAD_KEYS
+
+
+def write_payload(
+    vk_io: VertexKeyIO,
+    image: bytes | bytearray | memoryview,
+    payload_format: str,
+) -> tuple[list[str], bytes]:
+    """
+    Return (keys, value) of a message in payload_format.
+    """
+    if payload_format == PAYLOAD_ENVELOPE:
+        return [], pack_envelope(vk_io, image)
+    if payload_format == PAYLOAD_KEYS:
+        return vk_io.keys_list, bytes(image)
+    msg = f'payload format must be one of {PAYLOAD_FORMATS}, got {payload_format!r}'
+    raise ValueError(msg)
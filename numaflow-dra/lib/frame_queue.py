@@ -0,0 +1,145 @@
+"""
+Handoff of frames from a capture thread to an asyncio consumer.
+
+The capture thread calls put() and close(), the event loop awaits get(). A consumer
+waiting on get() does not block the event loop, so other handlers (ack, pending) keep
+running while no frame is ready.
+"""
+
+import asyncio
+import contextlib
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+
+# ---------- Buffer policies ----------
+# latest: keep only the newest frame, put() replaces a frame not taken yet
+# keep  : keep the newest `size` frames, put() drops the oldest when full
+# block : keep `size` frames, put() waits for room (no frame is lost, e.g. file input)
+POLICY_LATEST = 'latest'
+POLICY_KEEP = 'keep'
+POLICY_BLOCK = 'block'
+POLICIES = (POLICY_LATEST, POLICY_KEEP, POLICY_BLOCK)
+
+
+@dataclass
+class FrameQueueStats:
+    captured: int = 0  # frames given to put()
+    dropped: int = 0  # frames lost to a full buffer or put() after close()
+    served: int = 0  # frames taken by get()
+    buffered: int = 0  # frames waiting now
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class FrameQueue:
+    """
+    Ring buffer of frames with one of POLICIES.
+    After close(), get() returns the remaining frames and then None.
+    """
+
+    def __init__(self, policy: str = POLICY_LATEST, size: int = 1):
+        if policy not in POLICIES:
+            msg = f'policy must be one of {POLICIES}, got {policy!r}'
+            raise ValueError(msg)
+        if size < 1:
+            msg = f'size must be >= 1, got {size}'
+            raise ValueError(msg)
+        self.policy = policy
+        self.size = 1 if policy == POLICY_LATEST else size
+        self._items: deque[object] = deque()
+        self._not_full = threading.Condition()
+        self._closed = False
+        self._stats = FrameQueueStats()
+        # bound to the loop of the first get()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ready: asyncio.Event | None = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, item: object) -> bool:
+        """
+        Put item from any thread. Return False when item or an older frame was dropped.
+        With POLICY_BLOCK, wait for room until a get() or close().
+        """
+        with self._not_full:
+            self._stats.captured += 1
+            if self.policy == POLICY_BLOCK:
+                while len(self._items) >= self.size and not self._closed:
+                    self._not_full.wait()
+            lost = self._closed or len(self._items) >= self.size
+            if lost:
+                self._stats.dropped += 1
+            if not self._closed:
+                if len(self._items) >= self.size:
+                    self._items.popleft()
+                self._items.append(item)
+        self._notify()
+        return not lost
+
+    def close(self) -> None:
+        """Mark the end of frames. Waiting and later get() return None once drained."""
+        with self._not_full:
+            self._closed = True
+            self._not_full.notify_all()
+        self._notify()
+
+    def get_nowait(self) -> object | None:
+        """
+        Take the oldest frame. Return None when the queue is closed and drained.
+        Raise asyncio.QueueEmpty when no frame is ready yet.
+        """
+        with self._not_full:
+            if self._items:
+                self._stats.served += 1
+                self._not_full.notify()
+                return self._items.popleft()
+            if self._closed:
+                return None
+        raise asyncio.QueueEmpty
+
+    async def get(self) -> object | None:
+        """
+        Wait for a frame. Return None when the queue is closed and drained.
+        Use asyncio.timeout() to bound the wait.
+        """
+        while True:
+            await self.wait()
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                continue
+
+    async def wait(self) -> None:
+        """Wait until get_nowait() has a frame or the queue is closed, without taking it"""
+        ready = self._bind()
+        while True:
+            ready.clear()
+            with self._not_full:
+                if self._items or self._closed:
+                    return
+            await ready.wait()
+
+    def stats(self) -> FrameQueueStats:
+        """A snapshot of the frame counters"""
+        with self._not_full:
+            self._stats.buffered = len(self._items)
+            return FrameQueueStats(**self._stats.as_dict())
+
+    def _bind(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        with self._not_full:
+            if self._loop is not loop:
+                self._loop, self._ready = loop, asyncio.Event()
+            return self._ready
+
+    def _notify(self) -> None:
+        with self._not_full:
+            loop, ready = self._loop, self._ready
+        if loop is None:
+            return  # nobody waits yet, the next get() finds the item
+        with contextlib.suppress(RuntimeError):  # loop closed
+            loop.call_soon_threadsafe(ready.set)
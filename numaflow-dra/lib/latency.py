@@ -0,0 +1,175 @@
+"""
+End-to-end latency of frames.
+
+Vertices stamp the frame metadata with the wall-clock time (int nanoseconds) a frame
+passes a point of the pipeline, in a 'ts_<point>' key. Stamps are added in pipeline
+order: capture, enqueue and emit in the Source, then '<vertex>_in' and '<vertex>_out'
+in every vertex. The Sink turns each pair of consecutive stamps into the latency of
+one hop (e.g. 'emit-filter_resize_in' is the transport to FilterResize), keeps them
+in histograms and serves them on a Prometheus endpoint.
+
+Stamps of different pods are only as comparable as their clocks, keep nodes in sync.
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import pairwise
+
+import numpy as np
+
+from lib.vertex_key_io import VertexKeyIO
+
+STAMP_PREFIX = 'ts_'
+
+# points stamped by the Source
+CAPTURE = 'capture'  # frame read from the camera or file
+ENQUEUE = 'enqueue'  # frame encoded and put in the frame buffer
+EMIT = 'emit'  # frame handed to Numaflow by read_handler
+
+# stage of the first to the last stamp
+END_TO_END = 'end_to_end'
+
+# upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = 'frame_latency_seconds'
+
+
+def stamp(vk_io: VertexKeyIO, point: str, ts_ns: int | None = None) -> None:
+    """Add the stamp of point, now unless ts_ns is given"""
+    vk_io.add(STAMP_PREFIX + point, time.time_ns() if ts_ns is None else ts_ns)
+
+
+def stamps(vk_io: VertexKeyIO) -> list[tuple[str, int]]:
+    """(point, time in ns) of every stamp of vk_io, in the order they were added"""
+    return [
+        (key[len(STAMP_PREFIX) :], int(val))
+        for key, val in vk_io.items()
+        if key.startswith(STAMP_PREFIX)
+    ]
+
+
+def stage_latencies(vk_io: VertexKeyIO) -> dict[str, float]:
+    """
+    Seconds between consecutive stamps, keyed '<point>-<next point>', and END_TO_END.
+    Empty when vk_io has less than 2 stamps.
+    """
+    points = stamps(vk_io)
+    if len(points) < 2:
+        return {}
+    latencies = {f'{a}-{b}': (b_ns - a_ns) / 1e9 for (a, a_ns), (b, b_ns) in pairwise(points)}
+    latencies[END_TO_END] = (points[-1][1] - points[0][1]) / 1e9
+    return latencies
+
+
+class LatencyHistogram:
+    """
+    Cumulative-bucket histogram of latencies in seconds (Prometheus style), and the
+    last `window` samples for exact quantiles of recent frames.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def quantiles(self) -> dict[float, float]:
+        """QUANTILES of the recent samples. Empty before the first sample."""
+        if not self.recent:
+            return {}
+        values = np.quantile(np.fromiter(self.recent, dtype=np.float64), QUANTILES)
+        return dict(zip(QUANTILES, values.tolist(), strict=True))
+
+
+class LatencyRecorder:
+    """
+    Latency histograms per stage. observe() and render() may run in different threads.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, vk_io: VertexKeyIO) -> dict[str, float]:
+        """Add the stage latencies of a frame. Return them."""
+        latencies = stage_latencies(vk_io)
+        with self._lock:
+            for stage, seconds in latencies.items():
+                histogram = self._histograms.get(stage)
+                if histogram is None:
+                    histogram = self._histograms[stage] = LatencyHistogram(self.window)
+                histogram.observe(seconds)
+        return latencies
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Per stage, count and p50/p95/p99 in milliseconds"""
+        with self._lock:
+            result = {}
+            for stage, histogram in self._histograms.items():
+                row = {'count': histogram.count}
+                for q, seconds in histogram.quantiles().items():
+                    row[f'p{round(q * 100)}'] = round(seconds * 1000, 2)
+                result[stage] = row
+            return result
+
+    def render(self) -> str:
+        """The histograms, and quantiles as a gauge, in the Prometheus text format"""
+        lines = [
+            f'# HELP {METRIC_NAME} Latency of frames between two points of the pipeline.',
+            f'# TYPE {METRIC_NAME} histogram',
+        ]
+        quantile_lines = [
+            f'# HELP {METRIC_NAME}_quantile Quantiles of the last frames.',
+            f'# TYPE {METRIC_NAME}_quantile gauge',
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                label = f'stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, '+Inf'), histogram.counts, strict=True):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{{label}}} {histogram.sum}')
+                lines.append(f'{METRIC_NAME}_count{{{label}}} {histogram.count}')
+                quantile_lines.extend(
+                    f'{METRIC_NAME}_quantile{{{label},quantile="{q}"}} {seconds}'
+                    for q, seconds in histogram.quantiles().items()
+                )
+        return '\n'.join(lines + quantile_lines) + '\n'
+
+
+def serve_metrics(recorder: LatencyRecorder, host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serve recorder.render() at http://host:port/metrics from a daemon thread.
+    Raise OSError when the port cannot be bound. Call shutdown() on the result to stop.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = recorder.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args) -> None:
+            pass  # no line per scrape
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='latency-metrics', daemon=True).start()
+    return server
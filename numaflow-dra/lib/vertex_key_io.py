@@ -1,4 +1,12 @@
-from collections.abc import Iterable
+import binascii
+import math
+import re
+import struct
+import zlib
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Self
 
 # Support for Numpy
@@ -8,40 +16,704 @@ try:
     HAS_NUMPY = True
     NP_INTEGER = np.integer
     NP_FLOATING = np.floating
+    NP_NDARRAY = np.ndarray
 except Exception:
     HAS_NUMPY = False
     NP_INTEGER = int
     NP_FLOATING = float
+    NP_NDARRAY = list
 
-Numeric = int | float | NP_INTEGER | NP_FLOATING
+Numeric = int | float | NP_INTEGER | NP_FLOATING | NP_NDARRAY
 
+# ---------- Detections ----------
+# Inference vertices attach detections either as 6 scalar keys per box
+# ('box_{i}_confidence', ...) or as one packed (N, 6) float32 array under BOXES_KEY.
+BOX_LAYOUT_KEYS = 'keys'
+BOX_LAYOUT_PACKED = 'packed'
+BOX_LAYOUTS = (BOX_LAYOUT_KEYS, BOX_LAYOUT_PACKED)
+BOXES_KEY = 'boxes'
+BOX_COLUMNS = ('confidence', 'class_id', 'LeftUpX', 'LeftUpY', 'RightDownX', 'RightDownY')
 
-def _build_type_maps():
+# ---------- Wire codecs ----------
+# text  : one 'key=(type)value' string per field (legacy format)
+# binary: a single item, BINARY_MARKER + base64(packed fields).
+#         Numaflow keys are protobuf strings, so the packed bytes are base64 encoded
+#         to keep every item valid UTF-8.
+# schema: a single item, SCHEMA_MARKER + base64(fields of a Schema by position, then
+#         the other fields as in the binary codec).
+CODEC_TEXT = 'text'
+CODEC_BINARY = 'binary'
+CODEC_SCHEMA = 'schema'
+CODECS = (CODEC_TEXT, CODEC_BINARY, CODEC_SCHEMA)
+
+BINARY_MARKER = '#vkio:'
+SCHEMA_MARKER = '#vks:'
+BINARY_VERSION = 1
+
+# Binary layout (little-endian):
+#   header : version(u8) field_count(u16)
+#   field  : key_len(u8) key(utf-8) type_tag(u8) value
+#   value  : fixed-size struct for numeric types, len(u32) + bytes for variable-size types
+_HEADER = struct.Struct('<BH')
+_KEY_LEN = struct.Struct('<B')
+_TAG_LEN = struct.Struct('<BI')
+_MAX_KEY_BYTES = 0xFF
+_MAX_FIELDS = 0xFFFF
+
+
+# ---------- Type registry ----------
+@dataclass(frozen=True)
+class TypeCodec:
+    """
+    How values of one exact type are written by the text and binary codecs.
+
+    - name  : type name in the text codec, e.g. 'np.int32' in 'key=(np.int32)3'
+    - tag   : type tag (u8) in the binary codec
+    - dump  : value -> str_val,            load  : str_val -> value
+    - pack  : value -> tag + packed value, unpack: (buf, pos of tag) -> (value, next pos)
+    - size  : size of tag + packed value, or None if it is variable
+    - skip  : (buf, pos of tag) -> next pos, for variable size. None means len(u32) prefixed.
+    """
+
+    typ: type
+    name: str
+    tag: int
+    dump: Callable[[Any], str]
+    load: Callable[[str], Any]
+    pack: Callable[[Any], bytes]
+    unpack: Callable[[memoryview, int], tuple[Any, int]]
+    size: int | None = None
+    skip: Callable[[memoryview, int], int] | None = None
+
+
+# exact type -> codec. Subclasses of registered types are added on first use.
+TYPE_CODECS: dict[type, TypeCodec] = {}
+# type name -> codec, binary tag -> codec (also holds the decode-only variants)
+NAME_CODECS: dict[str, TypeCodec] = {}
+TAG_CODECS: dict[int, TypeCodec] = {}
+# kept for compatibility: type -> type name, type name -> type
+TYPE_TO_NAME: dict[type, str] = {}
+NAME_TO_CTOR: dict[str, Any] = {}
+
+
+def register_type(codec: TypeCodec, *, decode_only: bool = False) -> None:
+    """
+    Register a TypeCodec. decode_only registers only its binary tag, which is used
+    for alternative encodings of a type (e.g. a narrower struct for small ints).
+    """
+    current = TAG_CODECS.get(codec.tag)
+    if current is not None and current.name != codec.name:
+        msg = f'binary tag {codec.tag} is already used by {current.name!r}'
+        raise ValueError(msg)
+    TAG_CODECS[codec.tag] = codec
+    if decode_only:
+        return
+    NAME_CODECS[codec.name] = codec
+    NAME_TO_CTOR[codec.name] = codec.typ
+    # Some numpy types are aliases of each other on some platforms
+    # (e.g. np.longdouble is np.float64). The first registration wins.
+    if codec.typ not in TYPE_CODECS:
+        TYPE_CODECS[codec.typ] = codec
+        TYPE_TO_NAME[codec.typ] = codec.name
+    _SUBCLASS_CODECS.clear()
+    _text_field.cache_clear()
+
+
+# subclass -> codec of its first registered base, filled by codec_for()
+_SUBCLASS_CODECS: dict[type, TypeCodec] = {}
+
+
+def codec_for(value: object) -> TypeCodec:
     """
-    Define bidirectional map between type and type name
+    Get the TypeCodec of a value by its exact type. Instances of a subclass of a
+    registered type (e.g. IntEnum) use the codec of the first registered base.
+    """
+    return codec_for_type(type(value))
+
+
+def codec_for_type(typ: type) -> TypeCodec:
+    """Same as codec_for, by type"""
+    codec = TYPE_CODECS.get(typ) or _SUBCLASS_CODECS.get(typ)
+    if codec is not None:
+        return codec
+    for registered, codec in TYPE_CODECS.items():
+        if issubclass(typ, registered):
+            _SUBCLASS_CODECS[typ] = codec
+            return codec
+
+    msg = f'value must be one of {tuple(TYPE_CODECS)}, got {typ!r}'
+    raise TypeError(msg)
+
+
+# ---------- Text codec caches ----------
+# Frames of a stream share their key names and types, so the 'key=(type)' prefixes
+# of registered types are cached and only the values are formatted/parsed.
+# int, float and str are formatted inline, which is faster than any lookup.
+_TEXT_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_TEXT_CACHE_SIZE)
+def _text_field(key: str, typ: type) -> tuple[str, Callable[[Any], str]]:
+    """('key=(type)' prefix, value -> str_val) of the text codec"""
+    codec = codec_for_type(typ)
+    return f'{key}=({codec.name})', codec.dump
+
+
+# input 'key=(type)' prefix -> (key, type_name), for items already validated once
+_TEXT_PREFIXES: dict[str, tuple[str, str]] = {}
+
+
+def _read_bytes(buf: memoryview, pos: int, size: int) -> bytes:
+    end = pos + size
+    if end > len(buf):
+        raise IndexError(pos)
+    return bytes(buf[pos:end])
+
+
+def _struct_io(
+    tag: int,
+    fmt: str,
+    from_raw: Callable[..., Any],
+    to_raw: Callable[[Any], tuple] | None = None,
+) -> tuple[Callable[[Any], bytes], Callable[[memoryview, int], tuple[Any, int]], int]:
     """
-    type_to_name: dict[type, str] = {
-        int: 'int',
-        float: 'float',
-        str: 'str',
-    }
-    if HAS_NUMPY:
-        # LHS is a class object, e.g. <class 'numpy.int64'>
-        type_to_name.update(
-            {
-                np.int64: 'np.int64',
-                np.float16: 'np.float16',
-                np.float32: 'np.float32',
-                np.float64: 'np.float64',
-                np.longdouble: 'np.longdouble',
-            }
+    (pack, unpack, size) of TypeCodec for a value packed as a fixed-size struct.
+    fmt is without byte order. to_raw/from_raw convert between the value and the
+    struct fields (default: the value is the only field).
+    """
+    st = struct.Struct('<B' + fmt)
+
+    if to_raw is None:
+
+        def pack(value: Any) -> bytes:
+            return st.pack(tag, value)
+
+        def unpack(buf: memoryview, pos: int) -> tuple[Any, int]:
+            return from_raw(st.unpack_from(buf, pos)[1]), pos + st.size
+    else:
+
+        def pack(value: Any) -> bytes:
+            return st.pack(tag, *to_raw(value))
+
+        def unpack(buf: memoryview, pos: int) -> tuple[Any, int]:
+            return from_raw(*st.unpack_from(buf, pos)[1:]), pos + st.size
+
+    return pack, unpack, st.size
+
+
+def _prefixed_io(
+    tag: int,
+    encode: Callable[[Any], bytes],
+    decode: Callable[[bytes], Any],
+) -> tuple[Callable[[Any], bytes], Callable[[memoryview, int], tuple[Any, int]]]:
+    """
+    (pack, unpack) of TypeCodec for a value packed as len(u32) + bytes.
+    """
+
+    def pack(value: Any) -> bytes:
+        data = encode(value)
+        return _TAG_LEN.pack(tag, len(data)) + data
+
+    def unpack(buf: memoryview, pos: int) -> tuple[Any, int]:
+        _, val_len = _TAG_LEN.unpack_from(buf, pos)
+        pos += _TAG_LEN.size
+        return decode(_read_bytes(buf, pos, val_len)), pos + val_len
+
+    return pack, unpack
+
+
+def _dump_float(value: Any) -> str:
+    # Use repr(float(...)) for float / np.floatXX for a stable string
+    return repr(float(value))
+
+
+def _load_bool(str_val: str) -> bool:
+    if str_val == 'True':
+        return True
+    if str_val == 'False':
+        return False
+    msg = f'bool must be True or False, got {str_val!r}'
+    raise ValueError(msg)
+
+
+# ---------- int / float / str / bool ----------
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+# Python ints that do not fit in int64 are sent as a decimal string
+_TAG_BIG_INT = 0xFF
+# float that round-trips through float32 without loss
+_TAG_FLOAT_AS_F32 = 12
+_F32 = struct.Struct('<f')
+
+_INT64 = TypeCodec(int, 'int', 1, str, int, *_struct_io(1, 'q', int))
+_BIG_INT = TypeCodec(
+    int, 'int', _TAG_BIG_INT, str, int, *_prefixed_io(_TAG_BIG_INT, lambda v: b'%d' % v, int)
+)
+# Python int/float are packed into the narrowest struct that keeps the value.
+# (min, max, codec), checked in order.
+_INT_WIDTHS: tuple[tuple[int, int, TypeCodec], ...] = (
+    (-(2**7), 2**7 - 1, TypeCodec(int, 'int', 9, str, int, *_struct_io(9, 'b', int))),
+    (-(2**15), 2**15 - 1, TypeCodec(int, 'int', 10, str, int, *_struct_io(10, 'h', int))),
+    (-(2**31), 2**31 - 1, TypeCodec(int, 'int', 11, str, int, *_struct_io(11, 'i', int))),
+)
+_FLOAT64 = TypeCodec(float, 'float', 2, _dump_float, float, *_struct_io(2, 'd', float))
+_FLOAT_AS_F32 = TypeCodec(
+    float,
+    'float',
+    _TAG_FLOAT_AS_F32,
+    _dump_float,
+    float,
+    *_struct_io(_TAG_FLOAT_AS_F32, 'f', float),
+)
+
+
+def _pack_int(value: int) -> bytes:
+    for lo, hi, codec in _INT_WIDTHS:
+        if lo <= value <= hi:
+            return codec.pack(value)
+    if _INT64_MIN <= value <= _INT64_MAX:
+        return _INT64.pack(value)
+    return _BIG_INT.pack(value)
+
+
+def _pack_float(value: float) -> bytes:
+    try:
+        if _F32.unpack(_F32.pack(value))[0] == value:
+            return _FLOAT_AS_F32.pack(value)
+    except OverflowError:
+        pass
+    return _FLOAT64.pack(value)
+
+
+# ---------- NumPy scalars ----------
+if HAS_NUMPY:
+    # (type, name, tag, struct format). Tags 4-8 keep the values of the first release.
+    _NUMPY_SCALARS: tuple[tuple[type, str, int, str], ...] = (
+        (np.int64, 'np.int64', 4, 'q'),
+        (np.float16, 'np.float16', 5, 'e'),
+        (np.float32, 'np.float32', 6, 'f'),
+        (np.float64, 'np.float64', 7, 'd'),
+        # struct has no extended precision format. The text codec also goes
+        # through float, so both codecs carry the same value.
+        (np.longdouble, 'np.longdouble', 8, 'd'),
+        (np.int8, 'np.int8', 16, 'b'),
+        (np.int16, 'np.int16', 17, 'h'),
+        (np.int32, 'np.int32', 18, 'i'),
+        (np.uint8, 'np.uint8', 19, 'B'),
+        (np.uint16, 'np.uint16', 20, 'H'),
+        (np.uint32, 'np.uint32', 21, 'I'),
+        (np.uint64, 'np.uint64', 22, 'Q'),
+    )
+
+
+def _register_builtin_types() -> None:
+    # int/float pick the narrowest tag when packing, any of their tags can be unpacked
+    register_type(TypeCodec(int, 'int', 1, str, int, _pack_int, _INT64.unpack, _INT64.size))
+    for _, _, codec in _INT_WIDTHS:
+        register_type(codec, decode_only=True)
+    register_type(_BIG_INT, decode_only=True)
+
+    register_type(
+        TypeCodec(
+            float, 'float', 2, _dump_float, float, _pack_float, _FLOAT64.unpack, _FLOAT64.size
         )
-    # reverse mapping
-    name_to_ctor: dict[str, Any] = {name: typ for typ, name in type_to_name.items()}
-    return type_to_name, name_to_ctor
+    )
+    register_type(_FLOAT_AS_F32, decode_only=True)
 
+    register_type(TypeCodec(str, 'str', 3, str, str, *_prefixed_io(3, str.encode, bytes.decode)))
+    register_type(TypeCodec(bool, 'bool', 14, str, _load_bool, *_struct_io(14, '?', bool)))
+    if not HAS_NUMPY:
+        return
 
-TYPE_TO_NAME, NAME_TO_CTOR = _build_type_maps()
+    for typ, name, tag, fmt in _NUMPY_SCALARS:
+        dump = str if issubclass(typ, np.integer) else _dump_float
+        register_type(TypeCodec(typ, name, tag, dump, typ, *_struct_io(tag, fmt, typ)))
+
+    register_type(
+        TypeCodec(
+            np.bool_,
+            'np.bool_',
+            15,
+            str,
+            lambda v: np.bool_(_load_bool(v)),
+            *_struct_io(15, '?', np.bool_),
+        )
+    )
+    for typ, name, tag, fmt in (
+        (np.complex64, 'np.complex64', 23, 'ff'),
+        (np.complex128, 'np.complex128', 24, 'dd'),
+    ):
+        register_type(
+            TypeCodec(
+                typ,
+                name,
+                tag,
+                lambda v: repr(complex(v)),
+                lambda v, typ=typ: typ(complex(v)),
+                *_struct_io(
+                    tag,
+                    fmt,
+                    lambda re, im, typ=typ: typ(complex(re, im)),
+                    lambda v: (v.real, v.imag),
+                ),
+            )
+        )
+
+
+_register_builtin_types()
+
+
+# ---------- NumPy arrays ----------
+# ndarray: tag(u8) dtype_len(u8) dtype(ascii, e.g. '<f4') ndim(u8) dims(u32 * ndim)
+#          nbytes(u32) raw C-order buffer
+_TAG_NDARRAY = 13
+_NDARRAY_HEAD = struct.Struct('<BB')
+_NDIM = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+# Only plain numeric dtypes can be rebuilt from their raw buffer
+_NDARRAY_KINDS = 'biufc'
+
+
+def _check_ndarray(arr: NP_NDARRAY) -> None:
+    if arr.dtype.kind not in _NDARRAY_KINDS:
+        msg = f'ndarray dtype must be bool or numeric, got {arr.dtype}'
+        raise TypeError(msg)
+
+
+def _ndarray_to_text(arr: NP_NDARRAY) -> str:
+    """
+    ndarray -> 'dtype:shape:base64', e.g. '<f4:2x6:AAAA...'.
+    The base64 padding is stripped because '=' separates key and value in keys_list.
+    """
+    _check_ndarray(arr)
+    shape = 'x'.join(str(d) for d in arr.shape)
+    raw = binascii.b2a_base64(arr.tobytes(order='C'), newline=False).decode('ascii').rstrip('=')
+    return f'{arr.dtype.str}:{shape}:{raw}'
+
+
+def _ndarray_from_text(str_val: str) -> NP_NDARRAY:
+    dtype_str, shape_str, raw = str_val.split(':', 2)
+    dtype = np.dtype(dtype_str)
+    if dtype.kind not in _NDARRAY_KINDS:
+        msg = f'ndarray dtype must be bool or numeric, got {dtype}'
+        raise ValueError(msg)
+    shape = tuple(int(d) for d in shape_str.split('x')) if shape_str else ()
+    data = bytearray(binascii.a2b_base64(raw + '=' * (-len(raw) % 4)))
+    return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+
+def _pack_ndarray(arr: NP_NDARRAY) -> bytes:
+    _check_ndarray(arr)
+    dtype_bytes = arr.dtype.str.encode('ascii')
+    return b''.join(
+        [
+            _NDARRAY_HEAD.pack(_TAG_NDARRAY, len(dtype_bytes)),
+            dtype_bytes,
+            _NDIM.pack(arr.ndim),
+            struct.pack(f'<{arr.ndim}I', *arr.shape),
+            _U32.pack(arr.nbytes),
+            arr.tobytes(order='C'),
+        ]
+    )
+
+
+def _ndarray_header(buf: memoryview, pos: int) -> tuple[Any, tuple[int, ...], int, int]:
+    """
+    Read the header of an ndarray packed by _pack_ndarray at buf[pos] (the tag).
+    Return (dtype, shape, position of the raw buffer, nbytes).
+    """
+    _, dtype_len = _NDARRAY_HEAD.unpack_from(buf, pos)
+    pos += _NDARRAY_HEAD.size
+    dtype = np.dtype(_read_bytes(buf, pos, dtype_len).decode('ascii'))
+    if dtype.kind not in _NDARRAY_KINDS:
+        msg = f'ndarray dtype must be bool or numeric, got {dtype}'
+        raise ValueError(msg)
+    pos += dtype_len
+    (ndim,) = _NDIM.unpack_from(buf, pos)
+    pos += _NDIM.size
+    shape = struct.unpack_from(f'<{ndim}I', buf, pos)
+    pos += 4 * ndim
+    (nbytes,) = _U32.unpack_from(buf, pos)
+    pos += _U32.size
+    if nbytes != math.prod(shape) * dtype.itemsize:
+        msg = f'ndarray of {dtype} {shape} cannot have {nbytes} bytes'
+        raise ValueError(msg)
+    if pos + nbytes > len(buf):
+        raise IndexError(pos)
+    return dtype, shape, pos, nbytes
+
+
+def _unpack_ndarray(buf: memoryview, pos: int) -> tuple[NP_NDARRAY, int]:
+    dtype, shape, pos, nbytes = _ndarray_header(buf, pos)
+    # bytearray keeps the array writable without another copy
+    data = bytearray(buf[pos : pos + nbytes])
+    return np.frombuffer(data, dtype=dtype).reshape(shape), pos + nbytes
+
+
+def _skip_ndarray(buf: memoryview, pos: int) -> int:
+    _, _, pos, nbytes = _ndarray_header(buf, pos)
+    return pos + nbytes
+
+
+if HAS_NUMPY:
+    register_type(
+        TypeCodec(
+            np.ndarray,
+            'np.ndarray',
+            _TAG_NDARRAY,
+            _ndarray_to_text,
+            _ndarray_from_text,
+            _pack_ndarray,
+            _unpack_ndarray,
+            skip=_skip_ndarray,
+        )
+    )
+
+
+# ---------- Binary fields ----------
+def _tag_codec(buf: memoryview, pos: int, idx: int, key: str) -> TypeCodec:
+    codec = TAG_CODECS.get(buf[pos])
+    if codec is None:
+        msg = f'field[{idx}] {key!r} has unknown type tag {buf[pos]}'
+        raise ValueError(msg)
+    return codec
+
+
+def _unpack_value(buf: memoryview, pos: int, idx: int, key: str) -> tuple[Numeric, int]:
+    """
+    Read the tag + value at buf[pos]. Return (value, position of the next field).
+    """
+    return _tag_codec(buf, pos, idx, key).unpack(buf, pos)
+
+
+def _skip_value(buf: memoryview, pos: int, idx: int, key: str) -> int:
+    """
+    Same as _unpack_value but only return the position of the next field.
+    """
+    codec = _tag_codec(buf, pos, idx, key)
+    if codec.size is not None:
+        return pos + codec.size
+    if codec.skip is not None:
+        return codec.skip(buf, pos)
+    _, val_len = _TAG_LEN.unpack_from(buf, pos)
+    return pos + _TAG_LEN.size + val_len
+
+
+def _unpack_fields(data: bytes | bytearray | memoryview, *, lazy: bool = False) -> dict[str, Any]:
+    """
+    Reconstruct the dict from the packed fields of the binary codec.
+    If lazy, values are not decoded and each key maps to (idx, start, end) of its tag + value.
+    """
+    buf = memoryview(data)
+    try:
+        version, count = _HEADER.unpack_from(buf, 0)
+        if version != BINARY_VERSION:
+            msg = f'unsupported binary codec version {version}, expected {BINARY_VERSION}'
+            raise ValueError(msg)
+        pos = _HEADER.size
+
+        tmp: dict[str, Any] = {}
+        for idx in range(count):
+            key_len = buf[pos]
+            key = str(buf[pos + 1 : pos + 1 + key_len], 'utf-8')
+            pos += 1 + key_len
+
+            if lazy:
+                end = _skip_value(buf, pos, idx, key)
+                tmp[key] = (idx, pos, end)
+            else:
+                tmp[key], end = _unpack_value(buf, pos, idx, key)
+            pos = end
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        msg = 'keys_list binary payload is truncated or corrupted'
+        raise ValueError(msg) from e
+
+    if pos > len(buf):
+        msg = 'keys_list binary payload is truncated or corrupted'
+        raise ValueError(msg)
+    if pos != len(buf):
+        msg = f'keys_list binary payload has {len(buf) - pos} trailing bytes'
+        raise ValueError(msg)
+    return tmp
+
+
+# ---------- Schemas ----------
+class SchemaError(ValueError):
+    """keys_list does not match the Schema of the edge"""
+
+
+# struct format and constructor of the types packed in the fixed part of a Schema
+# (constructor is None when struct already returns the type)
+_SCHEMA_FIXED: dict[type, tuple[str, Callable[[Any], Any] | None]] = {
+    int: ('q', None),
+    float: ('d', None),
+    bool: ('?', None),
+}
+if HAS_NUMPY:
+    _SCHEMA_FIXED.update({typ: (fmt, typ) for typ, _, _, fmt in _NUMPY_SCALARS})
+    _SCHEMA_FIXED[np.bool_] = ('?', np.bool_)
+
+# Schema layout (little-endian):
+#   header : version(u8) fingerprint(u32)
+#   fixed  : one struct with the fixed-size fields, in declaration order
+#   var    : type_tag(u8) value of each other field, in declaration order
+#   extra  : the keys not in the Schema, packed fields of the binary codec
+_SCHEMA_HEADER = struct.Struct('<BI')
+
+
+class Schema:
+    """
+    The fields a vertex sends on an edge, declared once as {key: type}.
+
+    Codecs and the positional layout are resolved here, so an unsupported type
+    fails at import. Values are type-checked against the exact type codec, and
+    subclasses (e.g. IntEnum for int) are accepted.
+    int is packed as int64 and float as float64.
+    """
+
+    def __init__(self, name: str, fields: Mapping[str, type]) -> None:
+        self.name = name
+        self.fields: dict[str, TypeCodec] = {}
+        for key, typ in fields.items():
+            codec = TYPE_CODECS.get(typ)
+            if codec is None:
+                msg = f'schema {name!r} field {key!r} has unsupported type {typ!r}'
+                raise TypeError(msg)
+            self.fields[key] = codec
+
+        fixed = [(key, c) for key, c in self.fields.items() if c.typ in _SCHEMA_FIXED]
+        self._fixed_keys = tuple(key for key, _ in fixed)
+        self._fixed_ctors = tuple(_SCHEMA_FIXED[c.typ][1] for _, c in fixed)
+        self._fixed = struct.Struct('<' + ''.join(_SCHEMA_FIXED[c.typ][0] for _, c in fixed))
+        self._var = tuple((key, c) for key, c in self.fields.items() if c.typ not in _SCHEMA_FIXED)
+        self._needs_ctor = any(self._fixed_ctors)
+        # Identifies the name, keys, types and order. A vertex image built with another
+        # declaration of the edge fails on the first message instead of misreading it.
+        layout = repr((name, [(key, c.name) for key, c in self.fields.items()]))
+        self.fingerprint = zlib.crc32(layout.encode())
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{key}: {c.name}' for key, c in self.fields.items())
+        return f'Schema({self.name!r}, {{{fields}}})'
+
+    def missing(self, keys: Iterable[str]) -> list[str]:
+        """Keys of the schema that are not in keys"""
+        keys = set(keys)
+        return [key for key in self.fields if key not in keys]
+
+    def check(self, key: str, value: object) -> None:
+        """Raise SchemaError if value is not of the type declared for key"""
+        codec = self.fields.get(key)
+        if codec is not None and codec_for(value) is not codec:
+            msg = f'schema {self.name!r}: {key!r} must be {codec.name}, got {type(value)!r}'
+            raise SchemaError(msg)
+
+    def pack(self, values: Mapping[str, Any]) -> bytes:
+        """
+        Header + the fields of the schema by position. values must hold every field.
+        """
+        missing = self.missing(values)
+        if missing:
+            msg = f'schema {self.name!r}: missing fields {missing}'
+            raise SchemaError(msg)
+        for key in self.fields:
+            self.check(key, values[key])
+        try:
+            out = [
+                _SCHEMA_HEADER.pack(BINARY_VERSION, self.fingerprint),
+                self._fixed.pack(*(values[key] for key in self._fixed_keys)),
+            ]
+        except struct.error as e:
+            msg = f'schema {self.name!r}: value out of range: {e}'
+            raise SchemaError(msg) from e
+        out.extend(codec.pack(values[key]) for key, codec in self._var)
+        return b''.join(out)
+
+    def unpack(self, buf: memoryview) -> tuple[dict[str, Any], int]:
+        """
+        Read what pack() wrote at the start of buf. Return (values, end position).
+        """
+        try:
+            version, fingerprint = _SCHEMA_HEADER.unpack_from(buf, 0)
+        except struct.error as e:
+            msg = 'keys_list schema payload is truncated or corrupted'
+            raise ValueError(msg) from e
+        if version != BINARY_VERSION:
+            msg = f'unsupported schema codec version {version}, expected {BINARY_VERSION}'
+            raise ValueError(msg)
+        if fingerprint != self.fingerprint:
+            other = SCHEMAS.get(fingerprint)
+            written = (
+                f'schema {other.name!r}' if other else f'an unknown schema ({fingerprint:#010x})'
+            )
+            msg = (
+                f'keys_list was written with {written}, expected {self!r}. '
+                'The vertices of this edge declare different schemas.'
+            )
+            raise SchemaError(msg)
+
+        pos = _SCHEMA_HEADER.size
+        try:
+            vals = self._fixed.unpack_from(buf, pos)
+            pos += self._fixed.size
+            if self._needs_ctor:
+                vals = (
+                    v if ctor is None else ctor(v)
+                    for ctor, v in zip(self._fixed_ctors, vals, strict=True)
+                )
+            out = dict(zip(self._fixed_keys, vals, strict=True))
+            for key, codec in self._var:
+                if buf[pos] != codec.tag:
+                    msg = f'schema {self.name!r}: {key!r} has type tag {buf[pos]}'
+                    raise SchemaError(msg)
+                out[key], pos = codec.unpack(buf, pos)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            msg = 'keys_list schema payload is truncated or corrupted'
+            raise ValueError(msg) from e
+        return out, pos
+
+
+# fingerprint -> Schema, used to read a schema payload without knowing the edge
+SCHEMAS: dict[int, Schema] = {}
+
+
+def register_schema(schema: Schema) -> Schema:
+    """Register a Schema so that its payloads can be read. Return the schema."""
+    current = SCHEMAS.get(schema.fingerprint)
+    if current is not None and current.name != schema.name:
+        msg = f'schema {schema.name!r} has the same fingerprint as {current.name!r}'
+        raise ValueError(msg)
+    SCHEMAS[schema.fingerprint] = schema
+    return schema
+
+
+def _schema_of(buf: memoryview) -> Schema:
+    """Registered Schema of a schema payload"""
+    try:
+        _, fingerprint = _SCHEMA_HEADER.unpack_from(buf, 0)
+    except struct.error as e:
+        msg = 'keys_list schema payload is truncated or corrupted'
+        raise ValueError(msg) from e
+    schema = SCHEMAS.get(fingerprint)
+    if schema is None:
+        msg = f'keys_list was written with an unknown schema ({fingerprint:#010x})'
+        raise SchemaError(msg)
+    return schema
+
+
+# Edges of the pipeline.
+# source -> filter-resize -> inference
+FRAME_SCHEMA = register_schema(
+    Schema('frame', {'frame_idx': int, 'org_height': int, 'org_width': int})
+)
+# inference -> sink. The boxes follow in either BOX_LAYOUTS, as extra keys.
+DETECTIONS_SCHEMA = register_schema(
+    Schema('detections', {**{k: c.typ for k, c in FRAME_SCHEMA.fields.items()}, 'box_len': int})
+)
+
+
+# Placeholder in VertexKeyIO._dict for an entry that is not parsed yet (lazy mode)
+_UNPARSED = object()
 
 
 class VertexKeyIO:
@@ -55,21 +727,54 @@ class VertexKeyIO:
     e.g. Message class, Datum class
 
     - Most mutating methods return Self for method chaining.
+    - Mutations only mark keys_list as stale. It is serialized once, when read.
+    - keys_list is written with either the text codec ('key=(type)value' per item)
+      or the binary codec (a single packed item). Reading detects the codec.
+    - In lazy mode, only key names are indexed on input. A value is parsed when it is
+      accessed, and entries never accessed nor changed are written back verbatim.
+      Malformed values are reported on access instead of on input.
     """
 
     # ---------- Initialization ----------
     def __init__(
         self,
         keys_list: Iterable[str] | None = None,
+        codec: str | None = None,
+        *,
+        lazy: bool = False,
+        schema: Schema | None = None,
     ) -> None:
         """
         Accept either keys_list or data, or neither (both None).
 
         - If keys_list is provided, validate and load into the dict.
+        - codec selects the output format of keys_list. If None, the codec detected
+          on input is kept (text when nothing was read yet).
+        - lazy defers parsing each value until it is accessed.
+        - schema is the Schema of the edge. keys_list is checked against it on input,
+          and it is required to write with the schema codec.
         """
+        if codec is not None and codec not in CODECS:
+            msg = f'codec must be one of {CODECS}, got {codec!r}'
+            raise ValueError(msg)
+        if codec == CODEC_SCHEMA and schema is None:
+            msg = f'codec {CODEC_SCHEMA!r} requires a schema'
+            raise ValueError(msg)
+        self._codec: str | None = codec
+        self._input_codec: str = CODEC_TEXT
+        self._lazy: bool = lazy
+        self._schema: Schema | None = schema
         self._dict: dict[str, int] = {}
-        # not operated internally, only used for io. Always synchronized with _dict
+        # lazy mode: input of the entries that are still _UNPARSED in _dict
+        # text codec: key -> (idx, item), binary codec: key -> (idx, start, end) in _raw_buf
+        self._raw: dict[str, tuple] = {}
+        self._raw_buf: memoryview | None = None
+        # lazy mode: input keys_list, written back as is until the first mutation
+        self._verbatim: list[str] | None = None
+        # not operated internally, only used for io. Synchronized with _dict when read
         self._keys_list: list[str] = []
+        # True while _keys_list is behind _dict
+        self._dirty: bool = False
 
         if keys_list is not None:
             self.set_keys_list(keys_list)
@@ -80,62 +785,304 @@ class VertexKeyIO:
         """
         Return a COPY of the current dict to prevent external mutation.
         """
+        self._parse_all()
         return self._dict.copy()
 
+    @property
+    def codec(self) -> str:
+        """Codec used to write keys_list"""
+        return self._codec or self._input_codec
+
+    @property
+    def schema(self) -> Schema | None:
+        """Schema of the edge (given, or read from a schema payload)"""
+        return self._schema
+
     @property
     def keys_list(self) -> list[str]:
         """
         Return a list like ["k=v", ...] generated from the dict.
         A fresh list is returned each call (safe to modify outside).
         """
-        self.dict_to_keys()
+        if self._dirty:
+            self.dict_to_keys()
         return list(self._keys_list)  # return copy list safely
 
     # ---------- Conversion ----------
     def dict_to_keys(self) -> Self:
-        """_dict -> _keys_list : key=(type)value"""
+        """_dict -> _keys_list : key=(type)value, or a single binary/schema item"""
+        if self._verbatim is not None and self.codec == self._input_codec:
+            self._keys_list = list(self._verbatim)
+            self._dirty = False
+            return self
+
+        if self.codec == CODEC_BINARY:
+            self._keys_list = [BINARY_MARKER + self._b64encode(self.to_bytes())]
+            self._dirty = False
+            return self
+
+        if self.codec == CODEC_SCHEMA:
+            self._keys_list = [SCHEMA_MARKER + self._b64encode(self.to_schema_bytes())]
+            self._dirty = False
+            return self
+
+        if self._raw_buf is not None:
+            self._parse_all()
         out: list[str] = []
         for key, val in self._dict.items():
-            type_name, str_val = self._dump(val)
-            out.append(f'{key}=({type_name}){str_val}')
+            if val is _UNPARSED:
+                out.append(self._raw[key][1])  # verbatim input item
+                continue
+            typ = type(val)
+            if typ is int or typ is str:
+                out.append(f'{key}=({typ.__name__}){val}')
+            elif typ is float:
+                out.append(f'{key}=(float){val!r}')
+            else:
+                prefix, dump = _text_field(key, typ)
+                out.append(prefix + dump(val))
         self._keys_list = out
+        self._dirty = False
         return self
 
     # ---------- Setters ----------
     def set_keys_list(self, keys_list: Iterable[str]) -> Self:
         """
         Parse a `key=(type)value` list and load into the internal dict.
-        Then, set _keys_list from the internal dict
+        _keys_list is set from the internal dict when it is read.
+
+        A keys_list made of a single BINARY_MARKER (SCHEMA_MARKER) item is read with
+        the binary (schema) codec.
         """
+        keys_list = list(keys_list)
+        if len(keys_list) == 1 and keys_list[0].startswith(BINARY_MARKER):
+            self.set_bytes(self._b64decode(keys_list[0], BINARY_MARKER))
+            self._verbatim = keys_list if self._lazy else None
+            return self
+        if len(keys_list) == 1 and keys_list[0].startswith(SCHEMA_MARKER):
+            self.set_schema_bytes(self._b64decode(keys_list[0], SCHEMA_MARKER))
+            self._verbatim = keys_list if self._lazy else None
+            return self
+
         tmp: dict[str, Numeric] = {}
-        for idx, item in enumerate(keys_list):
-            key, val = self._parse_item(item, idx)
-            tmp[key] = val
+        raw: dict[str, tuple] = {}
+        if self._lazy:
+            for idx, item in enumerate(keys_list):
+                # full validation of the item is done by _parse_item on access
+                key, sep, _ = item.partition('=')
+                key = key.strip()
+                if not (sep and key):
+                    msg = f"keys_list[{idx}] must be 'key=(type)value': {item!r}"
+                    raise ValueError(msg)
+                tmp[key] = _UNPARSED
+                raw[key] = (idx, item)
+        else:
+            for idx, item in enumerate(keys_list):
+                key, val = self._parse_item(item, idx)
+                tmp[key] = val
+        self._input_codec = CODEC_TEXT
         self._dict = tmp
-        return self.dict_to_keys()
+        self._raw = raw
+        self._raw_buf = None
+        self._verbatim = keys_list if self._lazy else None
+        self._dirty = True
+        self._check_schema()
+        return self
+
+    def set_bytes(self, data: bytes | bytearray | memoryview) -> Self:
+        """
+        Load the packed fields of the binary codec (without BINARY_MARKER and base64).
+        """
+        fields = _unpack_fields(data, lazy=self._lazy)
+        if self._lazy:
+            self._dict = dict.fromkeys(fields, _UNPARSED)
+            self._raw = fields
+            self._raw_buf = memoryview(data)
+        else:
+            self._dict = fields
+            self._raw = {}
+            self._raw_buf = None
+        self._input_codec = CODEC_BINARY
+        self._verbatim = None
+        self._dirty = True
+        self._check_schema()
+        return self
+
+    def set_schema(self, schema: Schema | None) -> Self:
+        """
+        Set the Schema used to write keys_list, e.g. when a vertex sends on
+        another edge than the one it reads. Fields are checked when written.
+        """
+        self._schema = schema
+        self._verbatim = None
+        self._dirty = True
+        return self
+
+    # ---------- Binary codec ----------
+    def to_bytes(self) -> bytes:
+        """
+        Pack the internal dict with the binary codec (without BINARY_MARKER and base64).
+        """
+        return self._pack_fields(self._dict)
+
+    def _pack_fields(self, keys: Collection[str]) -> bytes:
+        if len(keys) > _MAX_FIELDS:
+            msg = f'binary codec supports up to {_MAX_FIELDS} fields, got {len(keys)}'
+            raise ValueError(msg)
+
+        out: list[bytes] = [_HEADER.pack(BINARY_VERSION, len(keys))]
+        for key in keys:
+            stored = self._dict[key]
+            key_bytes = key.encode()
+            if len(key_bytes) > _MAX_KEY_BYTES:
+                msg = f'binary codec supports keys up to {_MAX_KEY_BYTES} bytes: {key!r}'
+                raise ValueError(msg)
+            out.append(_KEY_LEN.pack(len(key_bytes)))
+            out.append(key_bytes)
+            val = stored
+            if stored is _UNPARSED:
+                if self._raw_buf is not None:
+                    _, start, end = self._raw[key]
+                    out.append(self._raw_buf[start:end].tobytes())  # verbatim input value
+                    continue
+                val = self._parse_raw(key)
+            out.append(self._pack_value(val))
+        return b''.join(out)
+
+    # ---------- Schema codec ----------
+    def to_schema_bytes(self) -> bytes:
+        """
+        Pack the internal dict with the schema codec (without SCHEMA_MARKER and base64):
+        schema fields by position, then the other fields packed like the binary codec.
+        """
+        schema = self._schema
+        if schema is None:
+            msg = f'codec {CODEC_SCHEMA!r} requires a schema'
+            raise ValueError(msg)
+        values = {key: self[key] for key in schema.fields if key in self._dict}
+        extra = [key for key in self._dict if key not in schema.fields]
+        return schema.pack(values) + self._pack_fields(extra)
+
+    def set_schema_bytes(self, data: bytes | bytearray | memoryview) -> Self:
+        """
+        Load a payload of the schema codec (without SCHEMA_MARKER and base64).
+        """
+        buf = memoryview(data)
+        # without a given schema, the one the payload was written with
+        schema = self._schema or _schema_of(buf)
+        values, pos = schema.unpack(buf)
+        extra = _unpack_fields(buf[pos:], lazy=self._lazy)
+        if self._lazy:
+            self._dict = values | dict.fromkeys(extra, _UNPARSED)
+            self._raw = extra
+            self._raw_buf = buf[pos:]
+        else:
+            self._dict = values | extra
+            self._raw = {}
+            self._raw_buf = None
+        self._schema = schema
+        self._input_codec = CODEC_SCHEMA
+        self._verbatim = None
+        self._dirty = True
+        return self
+
+    def _check_schema(self) -> None:
+        """
+        Fail with SchemaError on input that misses a field of the schema or has
+        another type. Schema fields are parsed even in lazy mode.
+        """
+        schema = self._schema
+        if schema is None:
+            return
+        missing = schema.missing(self._dict)
+        if missing:
+            msg = f'keys_list misses fields of schema {schema.name!r}: {missing}'
+            raise SchemaError(msg)
+        for key in schema.fields:
+            schema.check(key, self[key])
 
     # ---------- Mutations ----------
     def add(self, key: str, value: Numeric) -> Self:
-        """Add or update an element and sync"""
-        if not isinstance(value, tuple(TYPE_TO_NAME.keys())):
-            msg = f'value must be one of {tuple(TYPE_TO_NAME.keys())}, got {type(value)!r}'
-            raise TypeError(msg)
-        self._dict[str(key)] = value
-        return self.dict_to_keys()
+        """Add or update an element (keys_list is synced when read)"""
+        self._check_value(value)
+        key = str(key)
+        if self._schema is not None:
+            self._schema.check(key, value)
+        self._raw.pop(key, None)
+        self._dict[key] = value
+        self._verbatim = None
+        self._dirty = True
+        return self
+
+    def update(self, items: Mapping[str, Numeric] | None = None, **kwargs: Numeric) -> Self:
+        """
+        Add or update many elements at once, like dict.update().
+        All values are validated before any of them is stored.
+        """
+        new_items: dict[str, Numeric] = {}
+        for source in (items or {}, kwargs):
+            for key, value in source.items():
+                self._check_value(value)
+                if self._schema is not None:
+                    self._schema.check(str(key), value)
+                new_items[str(key)] = value
+        for key in new_items:
+            self._raw.pop(key, None)
+        self._dict.update(new_items)
+        self._verbatim = None
+        self._dirty = True
+        return self
 
     def remove(self, key: str) -> Self:
-        """Remove element (ignore if absent) and sync"""
-        self._dict.pop(str(key), None)
-        return self.dict_to_keys()
+        """Remove element (ignore if absent, keys_list is synced when read)"""
+        key = str(key)
+        self._raw.pop(key, None)
+        self._dict.pop(key, None)
+        self._verbatim = None
+        self._dirty = True
+        return self
+
+    @contextmanager
+    def edit(self) -> Iterator[Self]:
+        """
+        Edit session for a group of mutations.
+
+        with vk_io.edit() as e:
+            e.add('box_len', 2)
+            e.remove('box_0_class_id')
+
+        If the block raises, every change made in the block is rolled back.
+        """
+        snapshot = self._dict.copy()
+        raw = self._raw.copy()
+        verbatim = self._verbatim
+        # keys_list read in the block encodes the changes, so it is restored as well
+        keys_list = self._keys_list
+        dirty = self._dirty
+        try:
+            yield self
+        except BaseException:
+            self._dict = snapshot
+            self._raw = raw
+            self._verbatim = verbatim
+            self._keys_list = keys_list
+            self._dirty = dirty
+            raise
 
     # ---------- Access (read-only) ----------
     def get(self, key: str, default: Numeric | None = None) -> int | None:
         """Get a value from the dict"""
-        return self._dict.get(key, default)
+        val = self._dict.get(key, default)
+        if val is _UNPARSED:
+            return self._parse_raw(key)
+        return val
 
     def __getitem__(self, key: str) -> int:
         """Allow m['x'] access (may raise KeyError)"""
-        return self._dict[key]
+        val = self._dict[key]
+        if val is _UNPARSED:
+            return self._parse_raw(key)
+        return val
 
     def __contains__(self, key: object) -> bool:  # type: ignore[override]
         """Support 'x' in m"""
@@ -147,10 +1094,12 @@ class VertexKeyIO:
 
     def values(self) -> tuple[Numeric, ...]:
         """Values as immutable tuple"""
+        self._parse_all()
         return tuple(self._dict.values())
 
     def items(self) -> tuple[tuple[str, Numeric], ...]:
         """(key, value) Items as immutable tuple of tuples"""
+        self._parse_all()
         return tuple(self._dict.items())
 
     def __len__(self) -> int:
@@ -162,6 +1111,35 @@ class VertexKeyIO:
         return iter(self._dict)
 
     # ---------- Internal utilities ----------
+    def _parse_raw(self, key: str) -> Numeric:
+        """
+        Parse an _UNPARSED entry (lazy mode) and store its value in the dict.
+        """
+        raw = self._raw[key]
+        if self._raw_buf is None:
+            idx, item = raw
+            _, val = self._parse_item(item, idx)
+        else:
+            idx, start, _ = raw
+            try:
+                val, _ = _unpack_value(self._raw_buf, start, idx, key)
+            except (struct.error, IndexError, UnicodeDecodeError) as e:
+                msg = 'keys_list binary payload is truncated or corrupted'
+                raise ValueError(msg) from e
+        del self._raw[key]
+        self._dict[key] = val
+        return val
+
+    def _parse_all(self) -> None:
+        for key in list(self._raw):
+            self._parse_raw(key)
+
+    @staticmethod
+    def _check_value(value: object) -> None:
+        codec_for(value)  # TypeError if unsupported
+        if HAS_NUMPY and isinstance(value, np.ndarray):
+            _check_ndarray(value)
+
     @staticmethod
     def _split_key_rest(item: str, idx: int) -> tuple[str, str]:
         """
@@ -180,6 +1158,16 @@ class VertexKeyIO:
         """
         Convert a single 'key=(type)value' item into (key, value).
         """
+        # prefix is up to the first ')' after '='
+        r = item.find(')', item.find('=') + 1)
+        prefix = item[: r + 1]
+        cached = _TEXT_PREFIXES.get(prefix)
+        if cached is not None:
+            str_val = item[r + 1 :]
+            if '=' not in str_val:
+                key, type_name = cached
+                return key, self._load(type_name, str_val.strip(), idx, item)
+
         key, v_str = VertexKeyIO._split_key_rest(item, idx)
         if not (v_str.startswith('(') and ')' in v_str):
             msg = f'keys_list[{idx}] must include explicit (type): {item!r}'
@@ -187,36 +1175,47 @@ class VertexKeyIO:
         r = v_str.find(')')
         type_name = v_str[1:r].strip()
         str_val = v_str[r + 1 :].strip()
-        return key, self._load(type_name, str_val, idx, item)
+        value = self._load(type_name, str_val, idx, item)
+        if len(_TEXT_PREFIXES) >= _TEXT_CACHE_SIZE:
+            del _TEXT_PREFIXES[next(iter(_TEXT_PREFIXES))]
+        _TEXT_PREFIXES[prefix] = (key, type_name)
+        return key, value
+
+    @staticmethod
+    def _b64encode(data: bytes) -> str:
+        return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+    @staticmethod
+    def _b64decode(item: str, marker: str) -> bytes:
+        try:
+            return binascii.a2b_base64(item[len(marker) :])
+        except binascii.Error as e:
+            msg = f'keys_list[0] is not valid base64 after {marker!r}'
+            raise ValueError(msg) from e
+
+    @staticmethod
+    def _pack_value(value: Numeric) -> bytes:
+        """
+        Get tag + packed value from the given value.
+        """
+        return codec_for(value).pack(value)
 
     # ---------- Dump / Load ----------
-    def _dump(self, value: Numeric) -> tuple[str, str]:
+    @staticmethod
+    def _dump(value: Numeric) -> tuple[str, str]:
         """
         Get (type_name, str_val) from the given value.
         """
-        for typ, type_name in TYPE_TO_NAME.items():
-            if isinstance(value, typ):
-                if typ is int or issubclass(typ, NP_INTEGER):
-                    return type_name, str(value)
-                if typ is float or issubclass(typ, NP_FLOATING):
-                    return type_name, repr(
-                        float(value)
-                    )  # Use repr(float(...)) for float / np.floatXX for a stable string
-                if typ is str:
-                    return type_name, value
-
-        msg = f'Unsupported value type: {type(value)!r}'
-        raise TypeError(msg)
+        codec = codec_for(value)
+        return codec.name, codec.dump(value)
 
     def _load(self, type_name: str, str_val: str, idx: int, item: str) -> Numeric:
         """
         Reconstruct a value from (type_name, str_val).
         """
-        # ctor is short for constructor.  It represents a type (class object),
-        # and calling it generates an instance of that type.
-        ctor = NAME_TO_CTOR.get(type_name)
-        if ctor is None:
-            allowed_type = ', '.join(sorted(NAME_TO_CTOR.keys()))
+        codec = NAME_CODECS.get(type_name)
+        if codec is None:
+            allowed_type = ', '.join(sorted(NAME_CODECS.keys()))
             msg = (
                 f"keys_list[{idx}] unknown type '{type_name}'. "
                 f'Allowed Type: {allowed_type}. '
@@ -224,8 +1223,148 @@ class VertexKeyIO:
             )
             raise ValueError(msg)
         try:
-            # int/float/np.floatXX can be constructed from str
-            return ctor(str_val)
+            return codec.load(str_val)
         except Exception as e:
             msg = f'keys_list[{idx}] cannot parse value for type {type_name}: {item!r}'
             raise ValueError(msg) from e
+
+
+# ---------- Batch decode ----------
+# per-box keys of BOX_LAYOUT_KEYS, e.g. 'box_0_confidence'
+_BOX_KEY = re.compile(r'box_\d+_')
+
+
+@dataclass(frozen=True)
+class KeysBatch:
+    """
+    keys_list of many messages decoded into columns.
+
+    - rows       : structured array, one row per message and one column per field
+    - boxes      : structured array, one row per detection: 'row' (index in rows)
+                   then BOX_COLUMNS. class_id is int64, or str for class names.
+    - box_offsets: detections of rows[i] are boxes[box_offsets[i] : box_offsets[i + 1]]
+    """
+
+    rows: NP_NDARRAY
+    boxes: NP_NDARRAY
+    box_offsets: NP_NDARRAY
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def boxes_of(self, idx: int) -> NP_NDARRAY:
+        """Detections of rows[idx]"""
+        return self.boxes[self.box_offsets[idx] : self.box_offsets[idx + 1]]
+
+
+def _column_dtype(codec: TypeCodec) -> Any:
+    """dtype of a rows column declared in a Schema (None: inferred by numpy)"""
+    if codec.typ is int:
+        return np.int64
+    if codec.typ is float:
+        return np.float64
+    if codec.typ is bool or issubclass(codec.typ, np.generic):
+        return codec.typ
+    return None
+
+
+def _detections_of(vk_io: VertexKeyIO) -> tuple[NP_NDARRAY, list, NP_NDARRAY]:
+    """(confidences, class_ids, coords (N, 4)) in either BOX_LAYOUTS"""
+    if BOXES_KEY in vk_io:
+        table = np.asarray(vk_io[BOXES_KEY]).reshape(-1, len(BOX_COLUMNS))
+        return table[:, 0], table[:, 1].astype(np.int64).tolist(), table[:, 2:]
+
+    box_len = vk_io.get('box_len', 0)
+    names = BOX_COLUMNS[2:]
+    confidences = np.array([vk_io[f'box_{i}_confidence'] for i in range(box_len)])
+    class_ids = [vk_io[f'box_{i}_class_id'] for i in range(box_len)]
+    coords = np.array(
+        [[vk_io[f'box_{i}_{name}'] for name in names] for i in range(box_len)]
+    ).reshape(-1, len(names))
+    return confidences, class_ids, coords
+
+
+def _batch_rows(
+    vk_ios: list[VertexKeyIO], fields: list[str] | None, schema: Schema | None
+) -> NP_NDARRAY:
+    if fields is None and schema is not None:
+        fields = list(schema.fields)
+    elif fields is None:
+        first = vk_ios[0] if vk_ios else VertexKeyIO()
+        fields = [
+            key
+            for key in first
+            if key != BOXES_KEY and not _BOX_KEY.match(key) and np.ndim(first[key]) == 0
+        ]
+
+    columns: list[NP_NDARRAY] = []
+    for key in fields:
+        try:
+            values = [vk_io[key] for vk_io in vk_ios]
+        except KeyError as e:
+            msg = f'every message of the batch must have {key!r}'
+            raise KeyError(msg) from e
+        codec = schema.fields.get(key) if schema is not None else None
+        columns.append(np.asarray(values, dtype=codec and _column_dtype(codec)))
+
+    dtype = [(key, col.dtype, col.shape[1:]) for key, col in zip(fields, columns, strict=True)]
+    rows = np.empty(len(vk_ios), dtype=dtype)
+    for key, col in zip(fields, columns, strict=True):
+        rows[key] = col
+    return rows
+
+
+def _batch_boxes(vk_ios: list[VertexKeyIO]) -> tuple[NP_NDARRAY, NP_NDARRAY]:
+    confidences, class_ids, coords, counts = [], [], [], []
+    for vk_io in vk_ios:
+        conf, cls, xyxy = _detections_of(vk_io)
+        confidences.append(conf)
+        class_ids.extend(cls)
+        coords.append(xyxy)
+        counts.append(len(cls))
+    box_offsets = np.zeros(len(vk_ios) + 1, dtype=np.int64)
+    np.cumsum(counts, out=box_offsets[1:])
+
+    class_id = np.asarray(class_ids) if class_ids else np.empty(0, dtype=np.int64)
+    boxes = np.empty(
+        int(box_offsets[-1]),
+        dtype=[
+            ('row', np.int64),
+            ('confidence', np.float32),
+            ('class_id', class_id.dtype),
+            *((name, np.float32) for name in BOX_COLUMNS[2:]),
+        ],
+    )
+    if len(boxes):
+        boxes['row'] = np.repeat(np.arange(len(vk_ios)), counts)
+        boxes['confidence'] = np.concatenate(confidences)
+        boxes['class_id'] = class_id
+        xyxy = np.concatenate(coords)
+        for col, name in enumerate(BOX_COLUMNS[2:]):
+            boxes[name] = xyxy[:, col]
+    return boxes, box_offsets
+
+
+def decode_batch(
+    keys_lists: Iterable[Iterable[str]],
+    fields: Iterable[str] | None = None,
+    *,
+    schema: Schema | None = None,
+) -> KeysBatch:
+    """
+    Decode the keys_list of many messages at once, e.g. all datums of a sink batch.
+
+    - fields are the columns of rows. If None, the fields of schema, else the scalar
+      fields of the first message that are not detections.
+    - Every message must have every field. Detections are read from either BOX_LAYOUTS
+      (no box_len and no BOXES_KEY means no detections).
+    - Messages are read in lazy mode, so keys that are not needed are not parsed.
+    """
+    if not HAS_NUMPY:
+        msg = 'decode_batch requires numpy'
+        raise RuntimeError(msg)
+
+    vk_ios = [VertexKeyIO(keys_list, lazy=True, schema=schema) for keys_list in keys_lists]
+    rows = _batch_rows(vk_ios, None if fields is None else list(fields), schema)
+    boxes, box_offsets = _batch_boxes(vk_ios)
+    return KeysBatch(rows, boxes, box_offsets)
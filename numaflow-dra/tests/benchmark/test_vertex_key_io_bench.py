@@ -0,0 +1,260 @@
+"""
+Micro-benchmarks of lib/vertex_key_io.py, checked against stored baselines.
+
+Skipped unless BENCHMARK=1, because timings are only meaningful on a quiet machine.
+
+- Times are stored in units of a calibration workload measured right before, so the
+  baselines carry over between machines. A case fails when it is slower than its
+  baseline by more than BENCHMARK_TOLERANCE (default 1.5x) in ATTEMPTS measurements.
+- Allocations are the peak traced memory of one call. A case fails when it allocates
+  more than ALLOC_TOLERANCE x its baseline (+ ALLOC_SLACK bytes).
+- BENCHMARK_UPDATE=1 runs every case and rewrites baselines.json. Do it in the same
+  commit as an intended performance change, so the new numbers are reviewed with it.
+"""
+
+import json
+import logging
+import os
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lib.vertex_key_io import (
+    BOX_COLUMNS,
+    BOX_LAYOUT_KEYS,
+    BOX_LAYOUT_PACKED,
+    BOXES_KEY,
+    CODEC_BINARY,
+    CODEC_SCHEMA,
+    CODEC_TEXT,
+    Schema,
+    VertexKeyIO,
+)
+
+BASELINES_PATH = Path(__file__).parent / 'baselines.json'
+ENABLED = os.getenv('BENCHMARK') == '1'
+UPDATE = os.getenv('BENCHMARK_UPDATE') == '1'
+TOLERANCE = float(os.getenv('BENCHMARK_TOLERANCE', '1.5'))
+ATTEMPTS = 3
+ALLOC_TOLERANCE = 1.25
+ALLOC_SLACK = 4096
+
+pytestmark = pytest.mark.skipif(not (ENABLED or UPDATE), reason='set BENCHMARK=1 to run benchmarks')
+
+CODECS = (CODEC_TEXT, CODEC_BINARY, CODEC_SCHEMA)
+FIELD_COUNTS = (3, 30, 120, 600)
+BOX_COUNTS = (1, 10, 100)
+VALUE_KINDS = {
+    'int': lambda i: i * 7919,
+    'float': lambda i: i / 7,
+    'np.float32': lambda i: np.float32(i / 7),
+    'np.int64': np.int64,
+    'str': lambda i: f'label_{i}',
+}
+
+
+_KINDS = tuple(VALUE_KINDS.values())
+VALUE_KINDS['mixed'] = lambda i: _KINDS[i % len(_KINDS)](i)
+
+
+# ---------- Payloads ----------
+def make_fields(count: int, kind: str) -> dict[str, object]:
+    make = VALUE_KINDS[kind]
+    return {f'field_{i}': make(i) for i in range(count)}
+
+
+def make_boxes(count: int, layout: str) -> dict[str, object]:
+    rng = np.random.default_rng(0)
+    table = rng.random((count, len(BOX_COLUMNS)), dtype=np.float32)
+    fields: dict[str, object] = {
+        'frame_idx': 12345,
+        'org_height': 2160,
+        'org_width': 3840,
+        'box_len': count,
+    }
+    if layout == BOX_LAYOUT_PACKED:
+        fields[BOXES_KEY] = table
+        return fields
+    for i, row in enumerate(table.tolist()):
+        for name, val in zip(BOX_COLUMNS, row, strict=True):
+            fields[f'box_{i}_{name}'] = val
+    return fields
+
+
+def make_schema(fields: dict[str, object]) -> Schema:
+    # at most the first 8 fields are declared, the others travel as extra fields
+    return Schema('bench', {key: type(val) for key, val in list(fields.items())[:8]})
+
+
+# ---------- Operations ----------
+def op_construct(keys_list: list[str], schema: Schema, _fields: dict) -> Callable[[], object]:
+    return lambda: VertexKeyIO(keys_list, schema=schema)
+
+
+def op_lazy_get(keys_list: list[str], schema: Schema, fields: dict) -> Callable[[], object]:
+    key = next(reversed(fields))
+    return lambda: VertexKeyIO(keys_list, lazy=True, schema=schema)[key]
+
+
+def op_add(_keys_list: list[str], schema: Schema, fields: dict) -> Callable[[], object]:
+    def run() -> VertexKeyIO:
+        vk_io = VertexKeyIO(schema=schema)
+        for key, val in fields.items():
+            vk_io.add(key, val)
+        return vk_io
+
+    return run
+
+
+def op_keys_list(keys_list: list[str], schema: Schema, _fields: dict) -> Callable[[], object]:
+    vk_io = VertexKeyIO(keys_list, schema=schema)
+
+    def run() -> list[str]:
+        vk_io.add('frame_idx', 1)  # mark keys_list stale
+        return vk_io.keys_list
+
+    return run
+
+
+def op_items(keys_list: list[str], schema: Schema, _fields: dict) -> Callable[[], object]:
+    return lambda: VertexKeyIO(keys_list, lazy=True, schema=schema).items()
+
+
+OPS = {
+    'construct': op_construct,
+    'lazy_get': op_lazy_get,
+    'add': op_add,
+    'keys_list': op_keys_list,
+    'items': op_items,
+}
+
+
+def make_case(op: str, codec: str, fields: dict[str, object]) -> Callable[[], object]:
+    schema = make_schema(fields)
+    src = VertexKeyIO(codec=codec, schema=schema if codec == CODEC_SCHEMA else None)
+    src.update(fields)
+    # op_keys_list re-encodes with the input codec
+    return OPS[op](src.keys_list, schema if codec == CODEC_SCHEMA else None, fields)
+
+
+# ---------- Cases ----------
+CASES: dict[str, tuple[str, str, Callable[[], dict[str, object]]]] = {}
+for _count in FIELD_COUNTS:
+    for _codec in CODECS:
+        for _op in OPS:
+            CASES[f'{_op}-{_codec}-mixed-f{_count}'] = (
+                _op,
+                _codec,
+                lambda c=_count: make_fields(c, 'mixed'),
+            )
+for _kind in VALUE_KINDS:
+    for _codec in CODECS:
+        for _op in ('construct', 'keys_list'):
+            CASES[f'{_op}-{_codec}-{_kind}-f120'] = (
+                _op,
+                _codec,
+                lambda k=_kind: make_fields(120, k),
+            )
+for _count in BOX_COUNTS:
+    for _layout in (BOX_LAYOUT_KEYS, BOX_LAYOUT_PACKED):
+        for _codec in CODECS:
+            for _op in ('construct', 'keys_list'):
+                CASES[f'{_op}-{_codec}-boxes_{_layout}-b{_count}'] = (
+                    _op,
+                    _codec,
+                    lambda c=_count, la=_layout: make_boxes(c, la),
+                )
+
+
+# ---------- Measurement ----------
+def calibration_workload() -> list:
+    # pure Python string/dict work of the same nature as the text codec
+    items = {f'key_{i}': i for i in range(1000)}
+    return [f'{key}=(int){val}'.partition('=') for key, val in items.items()]
+
+
+def _number(timer: timeit.Timer, run_time: float) -> int:
+    """Calls per run to take about run_time seconds"""
+    return max(1, int(run_time / max(timer.timeit(number=1), 1e-7)))
+
+
+def relative_time(fn: Callable[[], object], repeat: int = 9, run_time: float = 0.005) -> float:
+    """
+    Time of one call in units of calibration_workload(). Each run of fn is paired with
+    a run of the calibration right after it, so that changes of CPU speed during the
+    session cancel out, and the median of the pairs is returned.
+    """
+    timer, cal_timer = timeit.Timer(fn), timeit.Timer(calibration_workload)
+    number, cal_number = _number(timer, run_time), _number(cal_timer, run_time)
+    ratios = sorted(
+        (timer.timeit(number) / number) / (cal_timer.timeit(cal_number) / cal_number)
+        for _ in range(repeat)
+    )
+    return ratios[repeat // 2]
+
+
+def peak_alloc(fn: Callable[[], object]) -> int:
+    fn()  # warm up caches
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+@pytest.fixture(scope='module')
+def baselines():
+    cases = json.loads(BASELINES_PATH.read_text())['cases'] if BASELINES_PATH.exists() else {}
+    results: dict[str, dict[str, float]] = {}
+    yield cases, results
+    if UPDATE:
+        data = {
+            'note': 'time is in units of calibration_workload(), alloc is peak bytes',
+            'cases': dict(sorted({**cases, **results}.items())),
+        }
+        BASELINES_PATH.write_text(json.dumps(data, indent=1) + '\n')
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_benchmark(case, baselines) -> None:
+    op, codec, make_fields_ = CASES[case]
+    fn = make_case(op, codec, make_fields_())
+    cases, results = baselines
+    base = cases.get(case)
+    assert UPDATE or base is not None, f'{case}: no baseline, run with BENCHMARK_UPDATE=1'
+
+    # the best of ATTEMPTS measurements, stopping early once within tolerance
+    times: list[float] = []
+    for _ in range(ATTEMPTS):
+        times.append(relative_time(fn))
+        if not UPDATE and min(times) <= base['time'] * TOLERANCE:
+            break
+    result = {'time': round(min(times), 4), 'alloc': peak_alloc(fn)}
+    results[case] = result
+    logging.getLogger(__name__).info('%s: %s', case, result)
+    if UPDATE:
+        return
+
+    ratio = result['time'] / base['time']
+    assert ratio <= TOLERANCE, (
+        f'{case} got {ratio:.2f}x slower than baseline '
+        f'({result["time"]} vs {base["time"]} calibration units)'
+    )
+    alloc_limit = base['alloc'] * ALLOC_TOLERANCE + ALLOC_SLACK
+    assert result['alloc'] <= alloc_limit, (
+        f'{case} allocates {result["alloc"]} bytes, baseline {base["alloc"]} bytes'
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
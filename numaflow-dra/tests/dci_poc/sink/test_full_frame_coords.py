@@ -0,0 +1,49 @@
+import logging
+import sys
+
+import numpy as np
+import pytest
+from pynumaflow import setup_logging
+
+from dci_poc.vertex.sink import FrameForVideoReceiver
+from lib.vertex_key_io import BOXES_KEY, VertexKeyIO
+
+logger = setup_logging(__name__)
+
+
+def make_receiver(box: list[float], **fields) -> FrameForVideoReceiver:
+    vk_io = VertexKeyIO().update(frame_idx=0, org_height=1080, org_width=1920, box_len=1)
+    vk_io.update(**fields)
+    vk_io.add(BOXES_KEY, np.array([[0.9, 0, *box]], dtype=np.float32))
+    return FrameForVideoReceiver(logger, np.zeros((416, 416, 3), dtype=np.uint8), vk_io)
+
+
+def test_whole_frame() -> None:
+    receiver = make_receiver([0.25, 0.5, 0.5, 1.0])  # normalized
+    np.testing.assert_allclose(receiver.full_frame_coords(), [[480, 540, 960, 1080]], atol=3)
+
+
+def test_crop() -> None:
+    receiver = make_receiver(
+        [104, 208, 208, 416], crop_x=1000, crop_y=500, crop_width=832, crop_height=416
+    )
+    np.testing.assert_allclose(receiver.full_frame_coords(), [[1208, 708, 1416, 916]])
+
+
+def test_letterboxed_crop() -> None:
+    # an 832x416 crop is scaled by 0.5 to 416x208 and padded by 104 at the top
+    receiver = make_receiver(
+        [0, 104, 416, 312],
+        crop_x=1000,
+        crop_y=500,
+        crop_width=832,
+        crop_height=416,
+        pad_top=104,
+        pad_left=0,
+    )
+    np.testing.assert_allclose(receiver.full_frame_coords(), [[1000, 500, 1832, 916]])
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -10,6 +10,8 @@ from pynumaflow.sinker import SinkAsyncServer
 from tests.dci_poc.sink.utils import request_generator
 
 from dci_poc.vertex.sink import AsyncSink
+from lib.envelope import PAYLOAD_FORMATS
+from lib.vertex_key_io import BOX_LAYOUTS
 
 logger = setup_logging(__name__)
 
@@ -35,11 +37,15 @@ def sink_servicer_impl(capture_func) -> sink_pb2_grpc.SinkServicer:
     return udf
 
 
-def test_sink(capture_func, sink_stub) -> None:
+@pytest.mark.parametrize('payload_format', PAYLOAD_FORMATS)
+@pytest.mark.parametrize('box_layout', BOX_LAYOUTS)
+def test_sink(capture_func, sink_stub, box_layout, payload_format) -> None:
     generator_response = None
     try:
         generator_response = sink_stub.SinkFn(
-            request_iterator=request_generator(count=1, session=1)
+            request_iterator=request_generator(
+                count=1, session=1, box_layout=box_layout, payload_format=payload_format
+            )
         )
     except grpc.RpcError as e:
         logging.exception(e)
@@ -1,13 +1,23 @@
 import os
 
 import cv2
+import numpy as np
 from pynumaflow.proto.sinker import sink_pb2
 from tests.testing_utils import get_time_args, mock_4k_frame
 
-from lib.vertex_key_io import VertexKeyIO
+from lib.envelope import PAYLOAD_KEYS, write_payload
+from lib.vertex_key_io import (
+    BOX_LAYOUT_KEYS,
+    BOX_LAYOUT_PACKED,
+    BOXES_KEY,
+    DETECTIONS_SCHEMA,
+    VertexKeyIO,
+)
 
 
-def request_generator(count, session=1, handshake=True):
+def request_generator(
+    count, session=1, handshake=True, box_layout=BOX_LAYOUT_KEYS, payload_format=PAYLOAD_KEYS
+):
     event_time_timestamp, watermark_timestamp = get_time_args()
 
     read_idx = 0
@@ -23,23 +33,29 @@ def request_generator(count, session=1, handshake=True):
             frame = mock_4k_frame()
             resized_frame = cv2.resize(frame, (fr_output_width, fr_output_height))
             _, buf = cv2.imencode('.jpg', resized_frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
-            vk_io = VertexKeyIO()
+            vk_io = VertexKeyIO(schema=DETECTIONS_SCHEMA)
             vk_io.add('frame_idx', read_idx)
+            vk_io.add('org_height', frame.shape[0])
+            vk_io.add('org_width', frame.shape[1])
             vk_io.add('box_len', 1)
-            vk_io.add('box_0_confidence', 0.9)
-            vk_io.add('box_0_class_id', 1)
-            vk_io.add('box_0_LeftUpX', 0.3)
-            vk_io.add('box_0_LeftUpY', 0.3)
-            vk_io.add('box_0_RightDownX', 0.7)
-            vk_io.add('box_0_RightDownY', 0.7)
+            if box_layout == BOX_LAYOUT_PACKED:
+                vk_io.add(BOXES_KEY, np.array([[0.9, 1, 0.3, 0.3, 0.7, 0.7]], dtype=np.float32))
+            else:
+                vk_io.add('box_0_confidence', 0.9)
+                vk_io.add('box_0_class_id', 1)
+                vk_io.add('box_0_LeftUpX', 0.3)
+                vk_io.add('box_0_LeftUpY', 0.3)
+                vk_io.add('box_0_RightDownX', 0.7)
+                vk_io.add('box_0_RightDownY', 0.7)
 
+            keys, value = write_payload(vk_io, buf.tobytes(), payload_format)
             req = sink_pb2.SinkRequest(
                 request=sink_pb2.SinkRequest.Request(
                     id='test-id-' + str(i),
                     event_time=event_time_timestamp,
                     watermark=watermark_timestamp,
-                    value=buf.tobytes(),
-                    keys=vk_io.keys_list,
+                    value=value,
+                    keys=keys,
                 ),
             )
             read_idx += 1
@@ -0,0 +1,69 @@
+import logging
+import sys
+
+import numpy as np
+import pytest
+from pynumaflow import setup_logging
+from tests.dci_poc.source.utils import (
+    ScriptedDecoder,
+    read_frames,
+    scripted_frames,
+    stop_reader,
+    use_decoders,
+)
+
+from dci_poc.vertex.source import ENCODE_AHEAD, AsyncVideoReader, FrameBufferPool
+
+logger = setup_logging(__name__)
+
+FRAMES = 12
+
+
+def test_pool_keeps_size_buffers() -> None:
+    pool = FrameBufferPool(2)
+    assert pool.acquire() is None  # empty, the decoder allocates
+    a, b, c = (np.zeros(4) for _ in range(3))
+    for buf in (a, b, c, None):
+        pool.release(buf)
+    assert pool.acquire() is b
+    assert pool.acquire() is a
+    assert pool.acquire() is None
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+@pytest.mark.asyncio
+async def test_reader_reuses_buffers(monkeypatch, workers) -> None:
+    decoder = ScriptedDecoder(scripted_frames(FRAMES))
+    use_decoders(monkeypatch, decoder, SOURCE_ENCODE_WORKERS=str(workers))
+    reader = AsyncVideoReader(logger)
+    reader.start()
+    try:
+        # a buffer is decoded into again only once its frame is encoded
+        assert await read_frames(reader) == list(range(FRAMES))
+    finally:
+        stop_reader(reader, decoder)
+
+    assert decoder.images[0] is None
+    buffers = {id(image) for image in decoder.images if image is not None}
+    assert 1 <= len(buffers) <= ENCODE_AHEAD * workers + 2
+    if workers == 1:
+        assert all(image is decoder.images[1] for image in decoder.images[1:])
+
+
+@pytest.mark.asyncio
+async def test_no_pool_without_reuse(monkeypatch) -> None:
+    decoder = ScriptedDecoder(scripted_frames(5), reuses_image=False)
+    use_decoders(monkeypatch, decoder)
+    reader = AsyncVideoReader(logger)
+    reader.start()
+    try:
+        assert await read_frames(reader) == list(range(5))
+    finally:
+        stop_reader(reader, decoder)
+
+    assert decoder.images == [None] * 6  # 5 frames and the end of file
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,115 @@
+import logging
+import sys
+from fractions import Fraction
+
+import cv2
+import numpy as np
+import pytest
+
+from dci_poc.vertex.source import OpenCVDecoder, PyAVDecoder, VideoDecoder, frame_pts
+
+FRAMES = 10
+
+
+@pytest.fixture
+def video_file(tmp_path) -> str:
+    path = str(tmp_path / 'decoder.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def make_decoder(kind: str, video_file: str):
+    if kind == 'opencv':
+        return OpenCVDecoder(video_file)
+    pytest.importorskip('av')
+    return PyAVDecoder(video_file, threads=2)
+
+
+def read_all(decoder) -> list[int]:
+    values = []
+    while True:
+        ret, frame = decoder.read()
+        if not ret:
+            return values
+        assert frame.shape == (48, 64, 3)
+        values.append(round(float(frame.mean()) / 20))
+
+
+@pytest.mark.parametrize('kind', ['opencv', 'pyav'])
+def test_decoder_reads_and_seeks(kind, video_file) -> None:
+    decoder = make_decoder(kind, video_file)
+    assert decoder.open()
+    try:
+        assert decoder.is_opened()
+        assert decoder.frame_count() == FRAMES
+        assert decoder.fps() == pytest.approx(30)
+        assert read_all(decoder) == list(range(FRAMES))
+
+        decoder.seek(6)  # frame exact
+        assert read_all(decoder) == list(range(6, FRAMES))
+    finally:
+        decoder.release()
+    assert not decoder.is_opened()
+
+
+@pytest.mark.parametrize('kind', ['opencv', 'pyav'])
+def test_decoder_open_missing_file(kind, tmp_path) -> None:
+    decoder = make_decoder(kind, str(tmp_path / 'missing.mp4'))
+    assert not decoder.open()
+    assert not decoder.is_opened()
+
+
+def test_pyav_seek_without_frame_rate(video_file, monkeypatch) -> None:
+    decoder = make_decoder('pyav', video_file)
+    assert decoder.open()
+    try:
+        assert read_all(decoder) == list(range(FRAMES))
+        # as for a stream without average_rate or guessed_rate
+        monkeypatch.setattr('dci_poc.vertex.source.frame_pts', lambda *_: None)
+        decoder.seek(6)  # decoded from the start and counted
+        assert read_all(decoder) == list(range(6, FRAMES))
+    finally:
+        decoder.release()
+
+
+def test_pyav_read_after_decode_error(video_file) -> None:
+    av = pytest.importorskip('av')
+    decoder = make_decoder('pyav', video_file)
+    assert decoder.open()
+
+    def corrupt():
+        raise av.error.InvalidDataError(1094995529, 'Invalid data found when processing input')
+        yield
+
+    try:
+        decoder.frames = corrupt()
+        assert decoder.read() == (False, None)
+        assert not decoder.is_opened()
+        assert decoder.read() == (False, None)  # not a TypeError on the ended generator
+    finally:
+        decoder.release()
+
+
+def test_frame_pts() -> None:
+    assert frame_pts(6, Fraction(30), Fraction(1, 15360), None) == 3072
+    assert frame_pts(6, Fraction(30), Fraction(1, 15360), 512) == 3584
+    assert frame_pts(6, None, Fraction(1, 15360), 0) is None
+    assert frame_pts(6, Fraction(0), Fraction(1, 15360), 0) is None
+    assert frame_pts(6, Fraction(30), None, 0) is None
+
+
+def test_incomplete_decoder() -> None:
+    class NoSeek(VideoDecoder):
+        def open(self) -> bool:
+            return True
+
+    with pytest.raises(TypeError):
+        NoSeek('video.mp4')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,51 @@
+import logging
+import sys
+import time
+
+import cv2
+import pytest
+from pynumaflow import setup_logging
+from tests.dci_poc.source.utils import (
+    FRAME_STEP,
+    ScriptedDecoder,
+    read_frames,
+    scripted_frames,
+    stop_reader,
+    use_decoders,
+)
+
+from dci_poc.vertex.source import AsyncVideoReader
+
+logger = setup_logging(__name__)
+
+FRAMES = 12
+
+
+@pytest.mark.parametrize('workers', ['1', '3'])
+@pytest.mark.asyncio
+async def test_frames_in_capture_order(workers, monkeypatch) -> None:
+    imencode = cv2.imencode
+
+    def slow_imencode(ext, frame, params):
+        # every third frame finishes after the frames submitted behind it
+        if round(float(frame[0, 0, 0]) / FRAME_STEP) % 3 == 0:
+            time.sleep(0.02)
+        return imencode(ext, frame, params)
+
+    monkeypatch.setattr(cv2, 'imencode', slow_imencode)
+    decoder = ScriptedDecoder(scripted_frames(FRAMES))
+    use_decoders(monkeypatch, decoder, SOURCE_ENCODE_WORKERS=workers)
+    reader = AsyncVideoReader(logger)
+    reader.start()
+    try:
+        numbers = await read_frames(reader)
+    finally:
+        stop_reader(reader, decoder)
+
+    assert numbers == list(range(FRAMES))
+    assert reader.stats().captured == FRAMES
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,31 @@
+import logging
+import sys
+
+import pytest
+
+from dci_poc.vertex.source import DEFAULT_FILE_PACING, parse_pacing
+
+
+@pytest.mark.parametrize(
+    ('spec', 'fps'),
+    [
+        ('native', None),
+        ('unthrottled', 0.0),
+        ('fixed:30', 30.0),
+        ('fixed:7.5', 7.5),
+        (DEFAULT_FILE_PACING, 20.0),
+    ],
+)
+def test_parse_pacing(spec, fps) -> None:
+    assert parse_pacing(spec) == fps
+
+
+@pytest.mark.parametrize('spec', ['', 'fixed', 'fixed:', 'fixed:0', 'fixed:-1', 'fast', 'loop'])
+def test_parse_pacing_rejects(spec) -> None:
+    with pytest.raises(ValueError):
+        parse_pacing(spec)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,68 @@
+import logging
+import sys
+import threading
+
+import cv2
+import numpy as np
+import pytest
+from pynumaflow import setup_logging
+
+from dci_poc.vertex.source import AsyncVideoReader
+
+logger = setup_logging(__name__)
+
+
+@pytest.fixture
+def file_env(tmp_path, monkeypatch) -> None:
+    path = str(tmp_path / 'reader.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for i in range(5):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    monkeypatch.setenv('SOURCE_INPUT_TYPE', 'file')
+    monkeypatch.setenv('VIDEO_FILE_SRC', path)
+    monkeypatch.setenv('SOURCE_FILE_PACING', 'unthrottled')
+    monkeypatch.setenv('SOURCE_BUFFER_POLICY', 'block')
+    monkeypatch.setenv('SOURCE_ROI', '')
+
+
+@pytest.fixture
+def file_reader(file_env) -> AsyncVideoReader:  # noqa: ARG001
+    reader = AsyncVideoReader(logger)
+    yield reader
+    reader.stop()
+    reader.join(timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_file_reader_health(file_reader) -> None:
+    file_reader.start()
+    frames = 0
+    while await file_reader.get_next_frame() is not None:
+        frames += 1
+
+    assert frames == 5
+    assert file_reader.health() == {'connected': True, 'reconnects': 0, 'outage_seconds': 0.0}
+
+
+@pytest.mark.usefixtures('file_env')
+def test_segment_reader_names(monkeypatch) -> None:
+    monkeypatch.setenv('SOURCE_ENCODE_WORKERS', '2')
+    readers = [
+        AsyncVideoReader(logger, segment=(i * 2, i * 2 + 2), segment_index=i) for i in (1, 2)
+    ]
+    try:
+        assert [reader.name for reader in readers] == ['video-reader-0.1', 'video-reader-0.2']
+        names = [
+            reader.encode_pool.submit(lambda: threading.current_thread().name).result()
+            for reader in readers
+        ]
+        assert names == ['jpeg-encode-0.1_0', 'jpeg-encode-0.2_0']
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,40 @@
+import logging
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+from dci_poc.vertex.source import file_segments
+
+
+@pytest.fixture
+def video_file(tmp_path) -> str:
+    path = str(tmp_path / 'segments.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize(
+    ('shards', 'segments'),
+    [
+        (1, [(0, 10)]),
+        (3, [(0, 3), (3, 6), (6, 10)]),
+        (20, [(i, i + 1) for i in range(10)]),  # no empty segment
+    ],
+)
+def test_file_segments(video_file, shards, segments) -> None:
+    assert file_segments(video_file, shards) == segments
+
+
+def test_file_segments_unknown_file(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        file_segments(str(tmp_path / 'missing.mp4'), 2)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,90 @@
+import logging
+import sys
+
+import numpy as np
+import pytest
+from pynumaflow.sourcer import AckRequest, Offset, ReadRequest
+from tests.dci_poc.source.utils import Output
+
+from dci_poc.vertex.source import RESIZE_NONE, AsyncSourceSendFrame, FrameForInput
+
+
+class FakeReader:
+    """Stands in for AsyncVideoReader: a stream that always has a frame ready"""
+
+    stream_id = 0
+    label = '0'
+    resize_mode = RESIZE_NONE
+
+    def __init__(self, image: bytes):
+        self.image = image
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def poll_frame(self) -> FrameForInput:
+        return FrameForInput(np.zeros((48, 64, 3), dtype=np.uint8), [(0, None, self.image)])
+
+    async def wait_frame(self) -> None:
+        pass
+
+
+def make_source(monkeypatch, tmp_path, max_inflight: int, max_bytes: int = 0):
+    monkeypatch.setenv('LOG_PATH', str(tmp_path))
+    monkeypatch.setenv('VERTEX_PAYLOAD_FORMAT', 'keys')
+    monkeypatch.setenv('SOURCE_MAX_INFLIGHT', str(max_inflight))
+    monkeypatch.setenv('SOURCE_MAX_INFLIGHT_BYTES', str(max_bytes))
+    reader = FakeReader(b'jpeg')
+    monkeypatch.setattr(AsyncSourceSendFrame, '_create_readers', lambda _self: {reader: 0})
+    return AsyncSourceSendFrame()
+
+
+async def read(source: AsyncSourceSendFrame, num_records: int) -> list[int]:
+    """Offsets sent for one read request"""
+    output = Output()
+    await source.read_handler(ReadRequest(num_records=num_records, timeout_in_ms=1000), output)
+    return [int(message.offset.offset) for message in output]
+
+
+async def ack(source: AsyncSourceSendFrame, *offsets: int) -> None:
+    await source.ack_handler(
+        AckRequest(offsets=[Offset(offset=str(o).encode(), partition_id=0) for o in offsets])
+    )
+
+
+@pytest.mark.asyncio
+async def test_window_of_offsets(monkeypatch, tmp_path) -> None:
+    source = make_source(monkeypatch, tmp_path, max_inflight=3)
+
+    assert await read(source, 5) == [0, 1, 2]
+    assert await read(source, 5) == []  # window full, reads stop
+    assert list(source.to_ack) == [(0, '0'), (0, '1'), (0, '2')]
+
+    await ack(source, 0, 2)
+    assert list(source.to_ack) == [(0, '1')]
+    assert await read(source, 5) == [3, 4]
+    await ack(source, 7)  # unknown offsets are ignored
+    assert len(source.to_ack) == 3
+    assert source.inflight_bytes == 3 * len(b'jpeg')
+
+
+@pytest.mark.asyncio
+async def test_window_of_bytes(monkeypatch, tmp_path) -> None:
+    # stops once 10 bytes are in flight: 3 images of 4 bytes
+    source = make_source(monkeypatch, tmp_path, max_inflight=32, max_bytes=10)
+
+    assert await read(source, 5) == [0, 1, 2]
+    assert source.inflight_bytes == 12
+    assert await read(source, 5) == []
+
+    await ack(source, 0)
+    assert source.inflight_bytes == 8
+    assert await read(source, 5) == [3]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
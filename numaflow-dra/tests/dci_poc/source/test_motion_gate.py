@@ -0,0 +1,45 @@
+import logging
+import sys
+
+import numpy as np
+import pytest
+
+from dci_poc.vertex.source import MotionGate
+
+
+def make_frame(value: int) -> np.ndarray:
+    return np.full((2160, 3840, 3), value, dtype=np.uint8)
+
+
+def test_static_frames_are_skipped() -> None:
+    gate = MotionGate(threshold=4.0, keepalive=0)
+
+    assert gate.admit(make_frame(100))  # the first frame is the reference
+    assert not gate.admit(make_frame(101))
+    assert not gate.admit(make_frame(102))
+    assert gate.admit(make_frame(110))  # compared with the last admitted frame
+    assert (gate.admitted, gate.skipped) == (2, 2)
+
+
+def test_keepalive_admits_static_frame(monkeypatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr('dci_poc.vertex.source.time.monotonic', lambda: now[0])
+    gate = MotionGate(threshold=4.0, keepalive=1.0)
+
+    assert gate.admit(make_frame(100))
+    now[0] = 0.5
+    assert not gate.admit(make_frame(100))
+    now[0] = 1.0
+    assert gate.admit(make_frame(100))
+
+
+def test_gray_frame() -> None:
+    gate = MotionGate(threshold=4.0, keepalive=0)
+
+    assert gate.admit(np.zeros((480, 640), dtype=np.uint8))
+    assert gate.admit(np.full((480, 640), 255, dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
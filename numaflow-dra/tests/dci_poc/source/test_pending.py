@@ -0,0 +1,73 @@
+import logging
+import sys
+import time
+
+import pytest
+from pynumaflow import setup_logging
+from tests.dci_poc.source.utils import (
+    ScriptedDecoder,
+    read_frames,
+    scripted_frames,
+    stop_reader,
+    use_decoders,
+    wait_until,
+)
+
+from dci_poc.vertex.source import AsyncVideoReader
+
+logger = setup_logging(__name__)
+
+
+@pytest.mark.asyncio
+async def test_pending_file(monkeypatch) -> None:
+    decoder = ScriptedDecoder(scripted_frames(10))
+    use_decoders(monkeypatch, decoder)
+    reader = AsyncVideoReader(logger)
+    reader.start()
+    try:
+        reader.join(timeout=5)  # the whole file is buffered
+        assert reader.pending() == 10
+        assert await read_frames(reader, 4) == [0, 1, 2, 3]
+        assert reader.pending() == 6
+        await read_frames(reader)
+        assert reader.pending() == 0
+    finally:
+        stop_reader(reader, decoder)
+
+
+def test_pending_stream(monkeypatch) -> None:
+    decoder = ScriptedDecoder(scripted_frames(3), is_stream=True, fps=25.0)
+    use_decoders(monkeypatch, decoder)
+    reader = AsyncVideoReader(logger)
+    reader.start()
+    try:
+        # the capture waits for the 4th frame with 3 frames buffered
+        wait_until(lambda: reader.stats().buffered == 3 and reader.frames_read == 3)
+        # 2s at 25 fps is 50 frames, the capture is 47 behind
+        reader.opened_at = time.monotonic() - 2
+        assert reader.pending() == 3 + 47
+        # the lag is unknown during an outage
+        reader.connected = False
+        assert reader.pending() == 3
+    finally:
+        stop_reader(reader, decoder)
+
+
+@pytest.mark.parametrize('fps', [0.0, 90000.0])
+def test_pending_stream_without_fps(monkeypatch, fps) -> None:
+    decoder = ScriptedDecoder(scripted_frames(3), is_stream=True, fps=fps)
+    use_decoders(monkeypatch, decoder)
+    reader = AsyncVideoReader(logger)
+    reader.start()
+    try:
+        wait_until(lambda: reader.stats().buffered == 3 and reader.frames_read == 3)
+        assert reader.fps == 0.0
+        reader.opened_at = time.monotonic() - 2
+        assert reader.pending() == 3  # only the buffered frames
+    finally:
+        stop_reader(reader, decoder)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,79 @@
+import logging
+import random
+import sys
+from threading import Event
+
+import pytest
+from pynumaflow import setup_logging
+from tests.dci_poc.source.utils import (
+    ScriptedDecoder,
+    read_frames,
+    scripted_frames,
+    stop_reader,
+    use_decoders,
+)
+
+from dci_poc.vertex.source import AsyncVideoReader
+
+logger = setup_logging(__name__)
+
+
+class NoWaitEvent(Event):
+    """Records the timeouts waited on instead of sleeping"""
+
+    def __init__(self):
+        super().__init__()
+        self.waits: list[float] = []
+
+    def wait(self, timeout: float | None = None) -> bool:
+        self.waits.append(timeout)
+        return self.is_set()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_backoff(monkeypatch) -> None:
+    jitters = []
+
+    def uniform(a: float, b: float) -> float:
+        jitters.append((a, b))
+        return b
+
+    monkeypatch.setattr(random, 'uniform', uniform)
+    decoder = ScriptedDecoder(scripted_frames(2), is_stream=True, opens=(False, False, False))
+    use_decoders(
+        monkeypatch, decoder, SOURCE_RECONNECT_BACKOFF='0.5', SOURCE_RECONNECT_MAX_BACKOFF='1.0'
+    )
+    reader = AsyncVideoReader(logger)
+    reader.stopped = NoWaitEvent()
+    reader.start()
+    try:
+        assert await read_frames(reader, 2) == [0, 1]
+    finally:
+        stop_reader(reader, decoder)
+
+    # a wait is half of the delay plus up to the other half, the delay doubles up to 1.0
+    assert jitters == [(0, 0.25), (0, 0.5), (0, 0.5)]
+    assert reader.stopped.waits == [0.5, 1.0, 1.0]
+    assert decoder.open_calls == 4
+    assert reader.health()['reconnects'] == 0  # the first connect is not a reconnect
+
+
+@pytest.mark.asyncio
+async def test_reconnect_lost_stream(monkeypatch) -> None:
+    frames = scripted_frames(2)
+    # the stream is lost after the first frame, reopened and read on
+    decoder = ScriptedDecoder([frames[0], None, frames[1]], is_stream=True)
+    use_decoders(monkeypatch, decoder)
+    reader = AsyncVideoReader(logger, failed_read_threshold=0)
+    reader.start()
+    try:
+        assert await read_frames(reader, 2) == [0, 1]
+        assert reader.health() == {'connected': True, 'reconnects': 1, 'outage_seconds': 0.0}
+        assert decoder.open_calls == 2
+    finally:
+        stop_reader(reader, decoder)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
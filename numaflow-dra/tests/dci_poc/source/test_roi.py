@@ -0,0 +1,35 @@
+import logging
+import sys
+
+import pytest
+
+from dci_poc.vertex.source import clip_roi, parse_rois
+
+
+@pytest.mark.parametrize(
+    ('spec', 'stream_count', 'rois'),
+    [
+        ('', 2, [[], []]),
+        ('0,0,640,480', 2, [[(0, 0, 640, 480)], [(0, 0, 640, 480)]]),
+        ('0,0,640,480 640,0,320,240;', 2, [[(0, 0, 640, 480), (640, 0, 320, 240)], []]),
+    ],
+)
+def test_parse_rois(spec, stream_count, rois) -> None:
+    assert parse_rois(spec, stream_count) == rois
+
+
+@pytest.mark.parametrize('spec', ['0,0,640', '0,0,640,x', '-1,0,640,480', '0,0,0,480', ';;'])
+def test_parse_rois_rejects(spec) -> None:
+    with pytest.raises(ValueError):
+        parse_rois(spec, 2)
+
+
+def test_clip_roi() -> None:
+    assert clip_roi((100, 50, 200, 100), 480, 640) == (100, 50, 200, 100)
+    assert clip_roi((600, 400, 200, 200), 480, 640) == (600, 400, 40, 80)
+    assert clip_roi((640, 0, 10, 10), 480, 640) is None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,67 @@
+import logging
+import sys
+
+import pytest
+from pynumaflow._constants import STREAM_EOF
+from pynumaflow.sourcer import ReadRequest
+from tests.dci_poc.source.utils import (
+    Output,
+    ScriptedDecoder,
+    frame_number,
+    scripted_frames,
+    use_decoders,
+)
+
+from dci_poc.vertex.source import AsyncSourceSendFrame
+from lib.vertex_key_io import VertexKeyIO
+
+
+@pytest.mark.asyncio
+async def test_streams_take_turns(monkeypatch, tmp_path) -> None:
+    frames = scripted_frames(6)
+    use_decoders(
+        monkeypatch,
+        ScriptedDecoder(frames[:3]),
+        ScriptedDecoder(frames[3:]),
+        LOG_PATH=str(tmp_path),
+        VERTEX_PAYLOAD_FORMAT='keys',
+    )
+    source = AsyncSourceSendFrame()
+    for reader in source.async_video_readers:
+        reader.join(timeout=5)  # every frame is buffered, the streams have ended
+    assert (await source.partitions_handler()).partitions == [0, 1]
+
+    output = Output()
+    await source.read_handler(ReadRequest(num_records=10, timeout_in_ms=1000), output)
+    assert output[-1] is STREAM_EOF
+    messages = output[:-1]
+
+    keys = [VertexKeyIO(message.keys) for message in messages]
+    assert [k['stream_id'] for k in keys] == [0, 1, 0, 1, 0, 1]
+    assert [k['frame_idx'] for k in keys] == [0, 0, 1, 1, 2, 2]
+    assert [frame_number(message.payload) for message in messages] == [0, 3, 1, 4, 2, 5]
+    # each stream has a partition of its own, with offsets of its own
+    assert [(message.offset.partition_id, int(message.offset.offset)) for message in messages] == [
+        (0, 0),
+        (1, 0),
+        (0, 1),
+        (1, 1),
+        (0, 2),
+        (1, 2),
+    ]
+
+
+def test_unknown_key_codec(monkeypatch, tmp_path) -> None:
+    use_decoders(
+        monkeypatch,
+        ScriptedDecoder(scripted_frames(1)),
+        LOG_PATH=str(tmp_path),
+        VERTEX_KEY_CODEC='binray',
+    )
+    with pytest.raises(SystemExit):
+        AsyncSourceSendFrame()  # at startup, not on the first record
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
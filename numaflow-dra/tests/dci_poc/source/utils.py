@@ -1,12 +1,20 @@
+import asyncio
 import subprocess
 import time
-from threading import Timer
+from threading import Event, Timer
 
+import cv2
+import numpy as np
 from pynumaflow import setup_logging
 from pynumaflow.proto.sourcer import source_pb2
 
+from dci_poc.vertex.source import AsyncVideoReader, VideoDecoder
+
 _logger = setup_logging(__name__)
 
+# frame i of a scripted video is filled with i * FRAME_STEP, up to 12 frames
+FRAME_STEP = 20
+
 
 def request_generator(count, session=1, handshake=True):
     if handshake:
@@ -115,3 +123,143 @@ def launch_ffmpeg_and_wait_ready() -> subprocess.Popen:
                 raise ValueError(msg)
 
     return p
+
+
+def scripted_frames(count: int) -> list[np.ndarray]:
+    return [np.full((48, 64, 3), i * FRAME_STEP, dtype=np.uint8) for i in range(count)]
+
+
+def frame_number(jpeg: bytes) -> int:
+    """i of the scripted frame an encoded frame was made from"""
+    frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    return round(float(frame.mean()) / FRAME_STEP)
+
+
+class ScriptedDecoder(VideoDecoder):
+    """
+    Decoder of scripted frames for AsyncVideoReader tests. frames are read in order and
+    a None in frames is a failed read. opens are the results of the open() calls,
+    True once they run out. A stream waits for more frames like a live camera once
+    the frames run out, until end().
+    """
+
+    def __init__(
+        self,
+        frames: list[np.ndarray | None],
+        *,
+        is_stream: bool = False,
+        fps: float = 0.0,
+        opens: tuple[bool, ...] = (),
+        reuses_image: bool = True,
+    ):
+        super().__init__('scripted', is_stream=is_stream)
+        self.frames = frames
+        self.rate = fps
+        self.opens = list(opens)
+        self.reuses_image = reuses_image
+        self.pos = 0
+        self.opened = False
+        self.open_calls = 0
+        self.images: list[np.ndarray | None] = []  # image given to each read()
+        self.ended = Event()
+
+    def open(self) -> bool:
+        self.open_calls += 1
+        self.opened = self.opens.pop(0) if self.opens else True
+        return self.opened
+
+    def is_opened(self) -> bool:
+        return self.opened
+
+    def read(self, image: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        self.images.append(image)
+        if self.pos >= len(self.frames):
+            if self.is_stream:
+                self.ended.wait()
+            return False, None
+        frame = self.frames[self.pos]
+        self.pos += 1
+        if frame is None:
+            return False, None
+        if self.reuses_image and image is not None and image.shape == frame.shape:
+            image[...] = frame
+            return True, image
+        return True, frame.copy()
+
+    def seek(self, frame: int) -> None:
+        self.pos = frame
+
+    def frame_count(self) -> int:
+        return 0 if self.is_stream else len(self.frames)
+
+    def fps(self) -> float:
+        return self.rate
+
+    def release(self) -> None:
+        self.opened = False
+
+    def end(self) -> None:
+        """Let a stream waiting for frames fail its read"""
+        self.ended.set()
+
+
+def use_decoders(monkeypatch, *decoders: ScriptedDecoder, **env: str) -> None:
+    """
+    Make readers decode with decoders[stream_id], one video source per decoder.
+    env is set over settings for unthrottled, lossless reads.
+    """
+    is_stream = decoders[0].is_stream
+    srcs = ','.join(f'scripted-{i}' for i in range(len(decoders)))
+    settings = {
+        'SOURCE_INPUT_TYPE': 'stream' if is_stream else 'file',
+        'VIDEO_STREAM_SRC': srcs,
+        'VIDEO_FILE_SRC': srcs,
+        'SOURCE_FILE_PACING': 'unthrottled',
+        'SOURCE_BUFFER_POLICY': 'block',
+        'SOURCE_BUFFER_SIZE': '64',
+        'SOURCE_ENCODE_WORKERS': '1',
+        'SOURCE_ROI': '',
+        'SOURCE_RESIZE_MODE': 'none',
+        'SOURCE_MOTION_THRESHOLD': '0',
+        'SOURCE_FILE_SHARDS': '1',
+    }
+    for key, value in {**settings, **env}.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(AsyncVideoReader, '_create_decoder', lambda self: decoders[self.stream_id])
+
+
+async def read_frames(reader: AsyncVideoReader, count: int | None = None) -> list[int]:
+    """
+    Numbers of the scripted frames the reader puts, up to count or to the end of the
+    video. Fail when a frame takes over 5s.
+    """
+    numbers = []
+    while count is None or len(numbers) < count:
+        frame = await asyncio.wait_for(reader.get_next_frame(), 5)
+        if frame is None:
+            break
+        numbers.extend(frame_number(jpeg) for _, _, jpeg in frame.as_crops())
+    return numbers
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    """Poll condition() until it is true, fail after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            msg = 'condition not met in time'
+            raise TimeoutError(msg)
+        time.sleep(0.005)
+
+
+class Output(list):
+    """Collects what read_handler puts, in place of NonBlockingIterator"""
+
+    async def put(self, item) -> None:
+        self.append(item)
+
+
+def stop_reader(reader: AsyncVideoReader, decoder: ScriptedDecoder) -> None:
+    reader.stop()
+    decoder.end()
+    reader.join(timeout=5)
@@ -0,0 +1,83 @@
+import logging
+import sys
+
+import numpy as np
+import pytest
+
+from lib.envelope import (
+    PAYLOAD_ENVELOPE,
+    PAYLOAD_KEYS,
+    is_envelope,
+    pack_envelope,
+    read_payload,
+    unpack_envelope,
+    write_payload,
+)
+from lib.vertex_key_io import (
+    BOXES_KEY,
+    CODEC_BINARY,
+    CODEC_SCHEMA,
+    DETECTIONS_SCHEMA,
+    FRAME_SCHEMA,
+    VertexKeyIO,
+)
+
+IMAGE = b'\xff\xd8' + bytes(range(256)) * 4 + b'\xff\xd9'
+
+
+def make_frame(codec: str | None = None) -> VertexKeyIO:
+    return VertexKeyIO(codec=codec, schema=FRAME_SCHEMA).update(
+        frame_idx=7, org_height=2160, org_width=3840
+    )
+
+
+@pytest.mark.parametrize('codec', [None, CODEC_BINARY, CODEC_SCHEMA])
+def test_envelope_roundtrip(codec) -> None:
+    value = pack_envelope(make_frame(codec), IMAGE)
+
+    assert is_envelope(value)
+    vk_io, image = unpack_envelope(value)
+    assert vk_io.dict == make_frame().dict
+    assert image == IMAGE
+    assert isinstance(image, memoryview)
+    assert image.obj is value  # not copied
+
+
+def test_envelope_array_metadata() -> None:
+    table = np.arange(12, dtype=np.float32).reshape(2, 6)
+    src = make_frame(CODEC_SCHEMA).set_schema(DETECTIONS_SCHEMA).add('box_len', 2)
+    src.add(BOXES_KEY, table)
+
+    vk_io, _ = unpack_envelope(pack_envelope(src, IMAGE), schema=DETECTIONS_SCHEMA)
+    np.testing.assert_array_equal(vk_io[BOXES_KEY], table)
+
+
+def test_envelope_rejects_bad_input() -> None:
+    value = pack_envelope(make_frame(), IMAGE)
+
+    assert not is_envelope(IMAGE)
+    with pytest.raises(ValueError):
+        unpack_envelope(IMAGE)
+    with pytest.raises(ValueError):
+        unpack_envelope(value[:10])
+    with pytest.raises(ValueError):
+        unpack_envelope(value[:-1])
+
+
+@pytest.mark.parametrize('payload_format', [PAYLOAD_KEYS, PAYLOAD_ENVELOPE])
+def test_payload_format_is_kept(payload_format) -> None:
+    keys, value = write_payload(make_frame(), IMAGE, payload_format)
+    assert (keys == []) == (payload_format == PAYLOAD_ENVELOPE)
+
+    vk_io, image, read_format = read_payload(keys, value, schema=FRAME_SCHEMA)
+    assert read_format == payload_format
+    assert vk_io['frame_idx'] == 7
+    assert image == IMAGE
+
+    with pytest.raises(ValueError):
+        write_payload(vk_io, image, 'json')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import sys
+import threading
+
+import pytest
+
+from lib.frame_queue import POLICY_BLOCK, POLICY_KEEP, POLICY_LATEST, FrameQueue
+
+
+def test_put_keeps_latest() -> None:
+    queue = FrameQueue()
+    queue.put(1)
+    queue.put(2)
+
+    assert queue.get_nowait() == 2
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+    assert queue.stats().as_dict() == {'captured': 2, 'dropped': 1, 'served': 1, 'buffered': 0}
+
+
+def test_keep_drops_oldest() -> None:
+    queue = FrameQueue(POLICY_KEEP, 3)
+    results = [queue.put(i) for i in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert [queue.get_nowait() for _ in range(3)] == [2, 3, 4]
+    stats = queue.stats()
+    assert (stats.captured, stats.dropped, stats.served) == (5, 2, 3)
+
+
+def test_block_waits_for_room() -> None:
+    queue = FrameQueue(POLICY_BLOCK, 2)
+    producer = threading.Thread(target=lambda: [queue.put(i) for i in range(5)])
+    producer.start()
+
+    served = []
+    while len(served) < 5:
+        try:
+            served.append(queue.get_nowait())
+        except asyncio.QueueEmpty:
+            assert queue.stats().buffered <= 2
+    producer.join()
+
+    assert served == [0, 1, 2, 3, 4]
+    assert queue.stats().dropped == 0
+
+
+def test_close_wakes_blocked_put() -> None:
+    queue = FrameQueue(POLICY_BLOCK, 1)
+    queue.put(0)
+    producer = threading.Thread(target=queue.put, args=[1])
+    producer.start()
+    queue.close()
+    producer.join(timeout=1)
+
+    assert not producer.is_alive()
+    assert queue.stats().dropped == 1
+
+
+def test_invalid_policy() -> None:
+    with pytest.raises(ValueError):
+        FrameQueue('newest')
+    with pytest.raises(ValueError):
+        FrameQueue(POLICY_LATEST, 0)
+
+
+def test_close_returns_remaining_then_none() -> None:
+    queue = FrameQueue()
+    queue.put(1)
+    queue.close()
+
+    assert asyncio.run(queue.get()) == 1
+    assert asyncio.run(queue.get()) is None
+
+
+def test_get_waits_for_thread_without_blocking_loop() -> None:
+    queue = FrameQueue()
+    ticks = []
+
+    async def ticker() -> None:
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    async def main() -> object:
+        task = asyncio.create_task(ticker())
+        threading.Timer(0.1, queue.put, ['frame']).start()
+        try:
+            return await queue.get()
+        finally:
+            task.cancel()
+
+    assert asyncio.run(main()) == 'frame'
+    assert len(ticks) > 3  # loop kept running while waiting
+
+
+def test_wait_does_not_take() -> None:
+    queue = FrameQueue()
+
+    async def main() -> object:
+        threading.Timer(0.05, queue.put, ['frame']).start()
+        await queue.wait()
+        return queue.get_nowait()
+
+    assert asyncio.run(main()) == 'frame'
+
+
+def test_get_timeout() -> None:
+    queue = FrameQueue()
+
+    async def main() -> None:
+        async with asyncio.timeout(0.05):
+            await queue.get()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(main())
+
+    # a frame put after the timeout is kept for the next get
+    queue.put('frame')
+    assert asyncio.run(queue.get()) == 'frame'
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
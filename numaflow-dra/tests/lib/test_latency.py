@@ -0,0 +1,115 @@
+import logging
+import sys
+import urllib.request
+
+import pytest
+
+from lib.envelope import PAYLOAD_ENVELOPE, PAYLOAD_KEYS, read_payload, write_payload
+from lib.latency import (
+    BUCKETS,
+    CAPTURE,
+    EMIT,
+    END_TO_END,
+    LatencyHistogram,
+    LatencyRecorder,
+    serve_metrics,
+    stage_latencies,
+    stamp,
+    stamps,
+)
+from lib.vertex_key_io import CODEC_SCHEMA, DETECTIONS_SCHEMA, FRAME_SCHEMA, VertexKeyIO
+
+MS = 1_000_000  # ns
+
+
+def make_frame(codec: str | None = None) -> VertexKeyIO:
+    vk_io = VertexKeyIO(codec=codec, schema=FRAME_SCHEMA).update(
+        frame_idx=7, org_height=2160, org_width=3840
+    )
+    stamp(vk_io, CAPTURE, 1_000 * MS)
+    stamp(vk_io, EMIT, 1_005 * MS)
+    return vk_io
+
+
+@pytest.mark.parametrize('codec', [None, CODEC_SCHEMA])
+@pytest.mark.parametrize('payload_format', [PAYLOAD_KEYS, PAYLOAD_ENVELOPE])
+def test_stamps_survive_vertices(codec, payload_format) -> None:
+    keys, value = write_payload(make_frame(codec), b'jpeg', payload_format)
+    vk_io, image, _ = read_payload(keys, value, schema=FRAME_SCHEMA)
+    stamp(vk_io, 'inference_in', 1_020 * MS)
+    vk_io.set_schema(DETECTIONS_SCHEMA)
+    vk_io.add('box_len', 0)
+    stamp(vk_io, 'inference_out', 1_050 * MS)
+    keys, value = write_payload(vk_io, image, payload_format)
+
+    vk_io, _, _ = read_payload(keys, value, lazy=False, schema=DETECTIONS_SCHEMA)
+    assert [point for point, _ in stamps(vk_io)] == [
+        CAPTURE,
+        EMIT,
+        'inference_in',
+        'inference_out',
+    ]
+    assert stage_latencies(vk_io) == pytest.approx(
+        {
+            'capture-emit': 0.005,
+            'emit-inference_in': 0.015,
+            'inference_in-inference_out': 0.03,
+            END_TO_END: 0.05,
+        }
+    )
+
+
+def test_no_latency_without_two_stamps() -> None:
+    vk_io = VertexKeyIO().update(frame_idx=1)
+    assert stage_latencies(vk_io) == {}
+    stamp(vk_io, CAPTURE)
+    assert stage_latencies(vk_io) == {}
+
+
+def test_histogram() -> None:
+    histogram = LatencyHistogram(window=100)
+    assert histogram.quantiles() == {}
+    for i in range(1, 201):
+        histogram.observe(i / 1000)
+    histogram.observe(60.0)  # over the last bucket
+
+    assert histogram.count == 201
+    assert sum(histogram.counts) == 201
+    assert histogram.counts[-1] == 1
+    assert histogram.counts[BUCKETS.index(0.001)] == 1
+    # quantiles of the last 100 samples only: 0.102 .. 0.200 and 60
+    quantiles = histogram.quantiles()
+    assert quantiles[0.5] == pytest.approx(0.1515)
+    assert quantiles[0.99] > 0.2
+
+
+def test_recorder_render() -> None:
+    recorder = LatencyRecorder()
+    recorder.observe(make_frame())
+    recorder.observe(make_frame())
+
+    assert recorder.summary()['capture-emit'] == {'count': 2, 'p50': 5.0, 'p95': 5.0, 'p99': 5.0}
+    text = recorder.render()
+    assert 'frame_latency_seconds_bucket{stage="capture-emit",le="0.005"} 2' in text
+    assert 'frame_latency_seconds_bucket{stage="capture-emit",le="+Inf"} 2' in text
+    assert 'frame_latency_seconds_count{stage="end_to_end"} 2' in text
+    assert 'frame_latency_seconds_quantile{stage="capture-emit",quantile="0.99"}' in text
+
+
+def test_serve_metrics() -> None:
+    recorder = LatencyRecorder()
+    recorder.observe(make_frame())
+    server = serve_metrics(recorder, '127.0.0.1', 0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as resp:
+            assert resp.status == 200
+            assert resp.read().decode() == recorder.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))
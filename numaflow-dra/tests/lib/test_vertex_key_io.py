@@ -0,0 +1,496 @@
+import logging
+import sys
+from enum import IntEnum
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from lib import vertex_key_io
+from lib.vertex_key_io import (
+    BINARY_MARKER,
+    BOXES_KEY,
+    CODEC_BINARY,
+    CODEC_SCHEMA,
+    CODEC_TEXT,
+    DETECTIONS_SCHEMA,
+    FRAME_SCHEMA,
+    SCHEMA_MARKER,
+    Schema,
+    SchemaError,
+    TypeCodec,
+    VertexKeyIO,
+    codec_for,
+    decode_batch,
+    register_schema,
+    register_type,
+)
+
+
+def make_vk_io(codec: str | None = None) -> VertexKeyIO:
+    vk_io = VertexKeyIO(codec=codec)
+    vk_io.add('frame_idx', 3)
+    vk_io.add('org_height', 2160)
+    vk_io.add('box_0_confidence', np.float32(0.87))
+    vk_io.add('box_0_class_id', 'person')
+    vk_io.add('box_0_LeftUpX', 0.3)
+    vk_io.add('box_0_RightDownX', np.float64(0.7))
+    vk_io.add('org_width', np.int64(3840))
+    vk_io.add('big', 2**80)
+    return vk_io
+
+
+def make_detections(codec: str | None = None, box_len: int = 20) -> VertexKeyIO:
+    rng = np.random.default_rng(0)
+    vk_io = VertexKeyIO(codec=codec)
+    vk_io.add('frame_idx', 12345)
+    vk_io.add('org_height', 2160)
+    vk_io.add('org_width', 3840)
+    vk_io.add('box_len', box_len)
+    for i in range(box_len):
+        vk_io.add(f'box_{i}_confidence', np.float32(rng.random()))
+        vk_io.add(f'box_{i}_class_id', np.int64(rng.integers(80)))
+        for name in ('LeftUpX', 'LeftUpY', 'RightDownX', 'RightDownY'):
+            vk_io.add(f'box_{i}_{name}', np.float32(rng.random()))
+    return vk_io
+
+
+def test_text_codec_format() -> None:
+    vk_io = make_vk_io()
+
+    assert vk_io.codec == CODEC_TEXT
+    assert vk_io.keys_list[0] == 'frame_idx=(int)3'
+    assert vk_io.keys_list[2] == 'box_0_confidence=(np.float32)0.8700000047683716'
+
+
+def test_binary_codec_roundtrip() -> None:
+    src = make_vk_io(CODEC_BINARY)
+    keys_list = src.keys_list
+
+    assert len(keys_list) == 1
+    assert keys_list[0].startswith(BINARY_MARKER)
+
+    dst = VertexKeyIO(keys_list)
+    assert dst.codec == CODEC_BINARY
+    assert dst.items() == src.items()
+
+    # both codecs restore the same types
+    via_text = VertexKeyIO(VertexKeyIO(keys_list, codec=CODEC_TEXT).keys_list)
+    for key, val in via_text.items():
+        assert type(dst[key]) is type(val)
+
+    # pass-through keeps the codec of the input
+    assert dst.keys_list == keys_list
+
+
+def test_binary_codec_is_smaller_than_text() -> None:
+    text = make_detections(CODEC_TEXT).keys_list
+    binary = make_detections(CODEC_BINARY).keys_list
+
+    assert sum(map(len, binary)) < sum(map(len, text))
+
+
+def test_codec_conversion() -> None:
+    text = make_vk_io(CODEC_TEXT).keys_list
+
+    binary = VertexKeyIO(text, codec=CODEC_BINARY).keys_list
+    assert VertexKeyIO(binary, codec=CODEC_TEXT).keys_list == text
+
+
+def test_binary_codec_rejects_corrupted_payload() -> None:
+    keys_list = make_vk_io(CODEC_BINARY).keys_list
+    payload = VertexKeyIO(keys_list).to_bytes()
+
+    with pytest.raises(ValueError):
+        VertexKeyIO().set_bytes(payload[:-1])
+    with pytest.raises(ValueError):
+        VertexKeyIO().set_bytes(payload + b'\x00')
+    with pytest.raises(ValueError):
+        VertexKeyIO().set_bytes(b'\x63' + payload[1:])
+
+
+def test_deferred_sync() -> None:
+    vk_io = VertexKeyIO(['frame_idx=(int)0'])
+    vk_io.add('box_len', 1).add('box_0_LeftUpX', 0.5).remove('frame_idx')
+
+    assert vk_io.keys_list == ['box_len=(int)1', 'box_0_LeftUpX=(float)0.5']
+
+    vk_io.add('box_len', 2)
+    assert vk_io.keys_list == ['box_len=(int)2', 'box_0_LeftUpX=(float)0.5']
+
+
+def test_update_matches_add() -> None:
+    added = VertexKeyIO()
+    for key, val in make_vk_io().items():
+        added.add(key, val)
+
+    updated = VertexKeyIO().update(dict(make_vk_io().items()))
+    assert updated.keys_list == added.keys_list
+
+    assert VertexKeyIO().update(a=1, b='x').keys_list == ['a=(int)1', 'b=(str)x']
+
+
+def test_update_validates_before_storing() -> None:
+    vk_io = VertexKeyIO().add('a', 1)
+    with pytest.raises(TypeError):
+        vk_io.update({'b': 2, 'c': [3]})
+
+    assert vk_io.keys_list == ['a=(int)1']
+
+
+def test_edit_session_rollback() -> None:
+    vk_io = VertexKeyIO().add('a', 1)
+
+    with vk_io.edit() as e:
+        e.add('b', 2)
+    assert vk_io.keys_list == ['a=(int)1', 'b=(int)2']
+
+    with pytest.raises(RuntimeError), vk_io.edit() as e:
+        e.add('c', 3).remove('a')
+        raise RuntimeError
+    assert vk_io.keys_list == ['a=(int)1', 'b=(int)2']
+
+
+def test_edit_session_rollback_after_keys_list_read() -> None:
+    vk_io = VertexKeyIO().update(a=1)
+    assert vk_io.keys_list == ['a=(int)1']
+
+    with pytest.raises(RuntimeError), vk_io.edit() as e:
+        e.add('b', 2)
+        assert e.keys_list == ['a=(int)1', 'b=(int)2']
+        raise RuntimeError
+    assert vk_io.dict == {'a': 1}
+    assert vk_io.keys_list == ['a=(int)1']
+
+
+@pytest.mark.parametrize('codec', [CODEC_TEXT, CODEC_BINARY])
+def test_ndarray_roundtrip(codec) -> None:
+    arrays = {
+        'boxes': np.arange(120, dtype=np.float32).reshape(20, 6) / 7,
+        'empty': np.empty((0, 6), dtype=np.float32),
+        'mask': np.array([True, False, True]),
+        'scalar': np.array(3, dtype=np.uint16),
+        'strided': np.arange(10, dtype=np.int64)[::3],
+    }
+    src = VertexKeyIO(codec=codec).update(arrays)
+    dst = VertexKeyIO(src.keys_list)
+
+    for key, arr in arrays.items():
+        assert dst[key].dtype == arr.dtype
+        assert dst[key].shape == arr.shape
+        assert np.array_equal(dst[key], arr)
+        assert dst[key].flags.writeable
+
+
+def test_ndarray_rejects_object_dtype() -> None:
+    with pytest.raises(TypeError):
+        VertexKeyIO().add('boxes', np.array([object()]))
+
+
+@pytest.mark.parametrize('codec', [CODEC_TEXT, CODEC_BINARY])
+def test_lazy_matches_eager(codec) -> None:
+    keys_list = make_detections(codec).keys_list
+
+    eager = VertexKeyIO(keys_list)
+    lazy = VertexKeyIO(keys_list, lazy=True)
+
+    assert lazy.keys() == eager.keys()
+    assert lazy['frame_idx'] == eager['frame_idx']
+    assert lazy.get('box_3_LeftUpX') == eager.get('box_3_LeftUpX')
+    assert lazy.get('missing', -1) == -1
+    assert lazy.keys_list == eager.keys_list
+    assert lazy.items() == eager.items()
+
+
+@pytest.mark.parametrize('codec', [CODEC_TEXT, CODEC_BINARY])
+def test_lazy_passes_through_untouched_entries(codec) -> None:
+    src = make_detections(codec)
+    src.add('bad', 1)
+    keys_list = src.keys_list
+    if codec == CODEC_TEXT:
+        # not normalized, and not even parsable, but never read
+        keys_list[-1] = 'bad = (int)not-a-number'
+
+    lazy = VertexKeyIO(keys_list, lazy=True)
+    lazy.add('frame_idx', 1).remove('box_0_LeftUpX')
+
+    out = VertexKeyIO(lazy.keys_list, lazy=True)
+    assert out['frame_idx'] == 1
+    assert 'box_0_LeftUpX' not in out
+    assert out['box_1_LeftUpX'] == src['box_1_LeftUpX']
+    if codec == CODEC_TEXT:
+        assert lazy.keys_list[-1] == 'bad = (int)not-a-number'
+        with pytest.raises(ValueError):
+            out['bad']
+
+
+def test_lazy_codec_conversion() -> None:
+    text = make_detections(CODEC_TEXT).keys_list
+    binary = VertexKeyIO(text, codec=CODEC_BINARY, lazy=True).keys_list
+
+    assert VertexKeyIO(binary, codec=CODEC_TEXT, lazy=True).keys_list == text
+
+
+SCALARS = [
+    True,
+    np.False_,
+    np.int8(-3),
+    np.int16(-300),
+    np.int32(-70000),
+    np.uint8(255),
+    np.uint16(65535),
+    np.uint32(2**32 - 1),
+    np.uint64(2**64 - 1),
+    np.float16(0.5),
+    np.complex64(1 - 2j),
+    np.complex128(0.1 + 0.2j),
+]
+
+
+@pytest.mark.parametrize('codec', [CODEC_TEXT, CODEC_BINARY])
+@pytest.mark.parametrize('value', SCALARS, ids=lambda v: type(v).__name__)
+def test_scalar_roundtrip_keeps_exact_type(codec, value) -> None:
+    src = VertexKeyIO(codec=codec).add('v', value)
+    dst = VertexKeyIO(src.keys_list)
+
+    assert type(dst['v']) is type(value)
+    assert dst['v'] == value
+
+
+class Camera(IntEnum):
+    FRONT = 1
+
+
+class Ratio(Fraction):
+    pass
+
+
+def test_subclass_uses_base_codec() -> None:
+    vk_io = VertexKeyIO().add('camera', Camera.FRONT)
+
+    assert vk_io.keys_list == ['camera=(int)1']
+
+
+def test_register_custom_type(monkeypatch) -> None:
+    registries = (
+        'TYPE_CODECS',
+        'NAME_CODECS',
+        'TAG_CODECS',
+        'TYPE_TO_NAME',
+        'NAME_TO_CTOR',
+        '_SUBCLASS_CODECS',
+    )
+    for name in registries:
+        monkeypatch.setattr(vertex_key_io, name, dict(getattr(vertex_key_io, name)))
+
+    def pack(value: Fraction) -> bytes:
+        data = str(value).encode()
+        return bytes([100, len(data)]) + data
+
+    def unpack(buf: memoryview, pos: int) -> tuple[Fraction, int]:
+        end = pos + 2 + buf[pos + 1]
+        return Fraction(bytes(buf[pos + 2 : end]).decode()), end
+
+    def skip(buf: memoryview, pos: int) -> int:
+        return pos + 2 + buf[pos + 1]
+
+    register_type(TypeCodec(Fraction, 'Fraction', 100, str, Fraction, pack, unpack, skip=skip))
+
+    for codec in (CODEC_TEXT, CODEC_BINARY):
+        src = VertexKeyIO(codec=codec).add('ratio', Fraction(1, 3)).add('scale', Ratio(2, 3))
+        assert VertexKeyIO(src.keys_list).dict == {'ratio': Fraction(1, 3), 'scale': Fraction(2, 3)}
+        assert VertexKeyIO(src.keys_list, lazy=True)['scale'] == Fraction(2, 3)
+
+    # a tag can not be taken by another type
+    with pytest.raises(ValueError):
+        register_type(TypeCodec(Ratio, 'Ratio', 100, str, Ratio, pack, unpack, skip=skip))
+
+
+def test_unsupported_type() -> None:
+    with pytest.raises(TypeError):
+        VertexKeyIO().add('v', b'bytes')
+
+
+def make_frame(codec: str | None = None, schema: Schema = FRAME_SCHEMA) -> VertexKeyIO:
+    return VertexKeyIO(codec=codec, schema=schema).update(
+        frame_idx=7, org_height=2160, org_width=3840
+    )
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_schema_codec_roundtrip(lazy) -> None:
+    src = make_frame(CODEC_SCHEMA).set_schema(DETECTIONS_SCHEMA).add('box_len', 1)
+    src.add(BOXES_KEY, np.array([[0.9, 1, 0.3, 0.3, 0.7, 0.7]], dtype=np.float32))
+    keys_list = src.keys_list
+
+    assert len(keys_list) == 1
+    assert keys_list[0].startswith(SCHEMA_MARKER)
+
+    # the schema is found from the payload when the reader does not give one
+    dst = VertexKeyIO(keys_list, lazy=lazy)
+    assert dst.schema is DETECTIONS_SCHEMA
+    assert dst.codec == CODEC_SCHEMA
+    assert dst.keys() == src.keys()
+    assert dst['frame_idx'] == 7
+    assert dst['box_len'] == 1
+    np.testing.assert_array_equal(dst[BOXES_KEY], src[BOXES_KEY])
+    assert dst.keys_list == keys_list
+
+    # same values as the other codecs
+    via_text = VertexKeyIO(VertexKeyIO(keys_list, codec=CODEC_TEXT).keys_list)
+    assert via_text.keys() == dst.keys()
+
+
+def test_schema_codec_is_smaller_than_binary() -> None:
+    schema = make_frame(CODEC_SCHEMA).keys_list[0]
+    binary = make_frame(CODEC_BINARY).keys_list[0]
+
+    assert len(schema) < len(binary)
+
+
+def test_schema_numpy_and_variable_fields() -> None:
+    schema = Schema('test_fields', {'idx': np.uint16, 'score': np.float32, 'label': str})
+    src = VertexKeyIO(codec=CODEC_SCHEMA, schema=schema)
+    src.update(label='person', idx=np.uint16(3), score=np.float32(0.5))
+
+    dst = VertexKeyIO(src.keys_list, schema=schema)
+    assert dst.dict == {'idx': 3, 'score': 0.5, 'label': 'person'}
+    assert type(dst['idx']) is np.uint16
+    assert type(dst['score']) is np.float32
+
+
+@pytest.mark.parametrize('codec', [CODEC_TEXT, CODEC_BINARY])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_schema_rejects_missing_fields(codec, lazy) -> None:
+    keys_list = VertexKeyIO(codec=codec).add('frame_idx', 1).keys_list
+
+    with pytest.raises(SchemaError, match='org_height'):
+        VertexKeyIO(keys_list, lazy=lazy, schema=FRAME_SCHEMA)
+
+
+@pytest.mark.parametrize('codec', [CODEC_TEXT, CODEC_BINARY])
+def test_schema_rejects_wrong_type(codec) -> None:
+    keys_list = make_frame(codec, schema=None).add('org_width', 3840.0).keys_list
+
+    with pytest.raises(SchemaError, match='org_width'):
+        VertexKeyIO(keys_list, lazy=True, schema=FRAME_SCHEMA)
+    with pytest.raises(SchemaError):
+        make_frame().add('frame_idx', '7')
+    with pytest.raises(SchemaError):
+        make_frame(CODEC_SCHEMA).remove('org_width').keys_list  # noqa: B018
+
+
+def test_schema_drift() -> None:
+    keys_list = make_frame(CODEC_SCHEMA).keys_list
+
+    with pytest.raises(SchemaError, match="schema 'frame'"):
+        VertexKeyIO(keys_list, schema=DETECTIONS_SCHEMA)
+
+    # another declaration of the same edge, e.g. in an older vertex image
+    drifted = Schema('frame', {'frame_idx': int, 'org_width': int, 'org_height': int})
+    assert drifted.fingerprint != FRAME_SCHEMA.fingerprint
+    with pytest.raises(SchemaError, match='different schemas'):
+        VertexKeyIO(keys_list, schema=drifted)
+    keys_list = VertexKeyIO(codec=CODEC_SCHEMA, schema=drifted).update(make_frame().dict).keys_list
+    with pytest.raises(SchemaError, match='unknown schema'):
+        VertexKeyIO(keys_list)
+
+
+def test_schema_declaration_errors() -> None:
+    with pytest.raises(TypeError):
+        Schema('bad', {'frame_idx': bytes})
+    with pytest.raises(ValueError):
+        VertexKeyIO(codec=CODEC_SCHEMA)
+    # registering the same declaration again is a no-op
+    assert register_schema(FRAME_SCHEMA) is FRAME_SCHEMA
+
+
+def make_batch() -> list[list[str]]:
+    table = np.array([[0.9, 1, 0.1, 0.2, 0.3, 0.4], [0.8, 2, 0.5, 0.6, 0.7, 0.8]], np.float32)
+    packed = make_frame(CODEC_SCHEMA).set_schema(DETECTIONS_SCHEMA).add('box_len', 2)
+    packed.add(BOXES_KEY, table)
+    empty = make_frame(CODEC_BINARY).add('frame_idx', 8).add('box_len', 0)
+    keys = make_frame().add('frame_idx', 9).add('box_len', 1)
+    keys.update(
+        box_0_confidence=0.7,
+        box_0_class_id=3,
+        box_0_LeftUpX=0.25,
+        box_0_LeftUpY=0.5,
+        box_0_RightDownX=0.75,
+        box_0_RightDownY=1.0,
+    )
+    return [packed.keys_list, empty.keys_list, keys.keys_list]
+
+
+def test_decode_batch() -> None:
+    batch = decode_batch(make_batch(), schema=DETECTIONS_SCHEMA)
+
+    assert len(batch) == 3
+    assert batch.rows.dtype.names == tuple(DETECTIONS_SCHEMA.fields)
+    assert batch.rows['frame_idx'].dtype == np.int64
+    np.testing.assert_array_equal(batch.rows['frame_idx'], [7, 8, 9])
+    np.testing.assert_array_equal(batch.rows['box_len'], [2, 0, 1])
+
+    np.testing.assert_array_equal(batch.box_offsets, [0, 2, 2, 3])
+    np.testing.assert_array_equal(batch.boxes['row'], [0, 0, 2])
+    np.testing.assert_array_equal(batch.boxes['class_id'], [1, 2, 3])
+    np.testing.assert_allclose(batch.boxes['confidence'], [0.9, 0.8, 0.7])
+    assert len(batch.boxes_of(1)) == 0
+    np.testing.assert_allclose(batch.boxes_of(2)['RightDownY'], [1.0])
+
+    # vectorized over the whole batch
+    widths = batch.boxes['RightDownX'] - batch.boxes['LeftUpX']
+    np.testing.assert_allclose(widths, [0.2, 0.2, 0.5], rtol=1e-6)
+
+
+def test_decode_batch_fields() -> None:
+    batch = decode_batch(make_batch())
+    assert batch.rows.dtype.names == ('frame_idx', 'org_height', 'org_width', 'box_len')
+
+    batch = decode_batch(make_batch(), ['org_width'])
+    assert batch.rows.dtype.names == ('org_width',)
+
+    with pytest.raises(KeyError, match='box_0_confidence'):
+        decode_batch(make_batch(), ['box_0_confidence'])
+
+    batch = decode_batch([])
+    assert len(batch) == 0
+    assert len(batch.boxes) == 0
+
+
+def test_text_caches_follow_layout_changes() -> None:
+    # same keys with other types and order, as consecutive frames may have
+    frames = [
+        {'frame_idx': 1, 'score': 0.5, 'label': 'a'},
+        {'frame_idx': 2, 'score': np.float32(0.5), 'label': 'a'},
+        {'label': 'b', 'frame_idx': np.int64(3), 'score': 0.25},
+        {'frame_idx': 4, 'score': 0.5, 'label': 'a'},
+    ]
+    for items in frames:
+        keys_list = VertexKeyIO().update(items).keys_list
+        expected = [f'{k}=({codec_for(v).name}){codec_for(v).dump(v)}' for k, v in items.items()]
+        assert keys_list == expected
+        dst = VertexKeyIO(keys_list)
+        assert dst.dict == items
+        assert [type(v) for v in dst.values()] == [type(v) for v in items.values()]
+
+
+def test_text_prefix_cache_keeps_validation() -> None:
+    VertexKeyIO(['label=(str)ok'])
+    # a known prefix with an invalid rest is still rejected
+    with pytest.raises(ValueError):
+        VertexKeyIO(['label=(str)a=b'])
+    with pytest.raises(ValueError):
+        VertexKeyIO(['frame_idx=(int)1.5', 'frame_idx=(int)x'])
+    assert VertexKeyIO([' label = (str) ok ']).dict == {'label': 'ok'}
+    assert VertexKeyIO([' label = (str) ok ']).dict == {'label': 'ok'}
+
+
+def test_unknown_codec() -> None:
+    with pytest.raises(ValueError):
+        VertexKeyIO(codec='json')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    sys.exit(pytest.main(['-qq'], plugins=[]))